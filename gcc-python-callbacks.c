@@ -141,6 +141,9 @@ PyGcc_FinishInvokingCallback(PyGILState_STATE gstate,
         goto cleanup;
     }
 
+    /* GCC may have changed the CFG since Python last ran: */
+    PyGcc_invalidate_cfg_caches();
+
     if (cfun) {
         /* Temporarily override input_location to the top of the function: */
         gcc_set_input_location(gcc_private_make_location(cfun->function_start_locus));
@@ -41,6 +41,74 @@
       typedef const struct edge_def *const_edge;
  */
 
+/*
+  The current generation of the CFGs, for PyGccCachedSequence:
+*/
+static unsigned long cfg_generation = 1;
+
+/*
+  Called whenever control returns to Python from GCC, which may have changed
+  the CFGs in the meantime, discarding the cached sequences:
+*/
+void
+PyGcc_invalidate_cfg_caches(void)
+{
+    cfg_generation++;
+}
+
+static void
+cached_sequence_init(PyGccCachedSequence *seq)
+{
+    seq->tuple = NULL;
+    seq->generation = 0;
+}
+
+static void
+cached_sequence_clear(PyGccCachedSequence *seq)
+{
+    Py_CLEAR(seq->tuple);
+}
+
+/* Get a new reference to the cached tuple, or NULL if it isn't valid: */
+static PyObject *
+cached_sequence_get(PyGccCachedSequence *seq)
+{
+    if (seq->tuple && seq->generation == cfg_generation) {
+        Py_INCREF(seq->tuple);
+        return seq->tuple;
+    }
+    return NULL;
+}
+
+/*
+  Cache the contents of the given list (or NULL, on error) as a tuple,
+  returning a new reference to the tuple:
+*/
+static PyObject *
+cached_sequence_set(PyGccCachedSequence *seq, PyObject *list)
+    CPYCHECKER_STEALS_REFERENCE_TO_ARG(2);
+
+static PyObject *
+cached_sequence_set(PyGccCachedSequence *seq, PyObject *list)
+{
+    PyObject *tuple;
+
+    if (!list) {
+        return NULL;
+    }
+    tuple = PyList_AsTuple(list);
+    Py_DECREF(list);
+    if (!tuple) {
+        return NULL;
+    }
+
+    cached_sequence_clear(seq);
+    Py_INCREF(tuple);
+    seq->tuple = tuple;
+    seq->generation = cfg_generation;
+    return tuple;
+}
+
 union cfg_edge_or_ptr {
     gcc_cfg_edge edge;
     void *ptr;
@@ -70,7 +138,7 @@ error:
     return NULL;
 }
 
-static PyObject *edge_wrapper_cache = NULL;
+static PyGccWrapperCache edge_wrapper_cache;
 
 PyObject *
 PyGccEdge_New(gcc_cfg_edge e)
@@ -101,8 +169,19 @@ PyGccBasicBlock_repr(struct PyGccBasicBlock * self)
                                          gcc_cfg_block_get_index(self->bb));
 }
 
-PyObject *
-PyGccBasicBlock_get_preds(PyGccBasicBlock *self, void *closure)
+void
+PyGccBasicBlock_dealloc(PyObject *obj)
+{
+    PyGccBasicBlock *self = (PyGccBasicBlock *)obj;
+
+    cached_sequence_clear(&self->preds);
+    cached_sequence_clear(&self->succs);
+    cached_sequence_clear(&self->gimple);
+    PyGccWrapper_Dealloc(obj);
+}
+
+static PyObject *
+make_preds_list(PyGccBasicBlock *self)
 {
     IMPL_LIST_MAKER(gcc_cfg_block_for_each_pred_edge,
                     self->bb,
@@ -110,26 +189,58 @@ PyGccBasicBlock_get_preds(PyGccBasicBlock *self, void *closure)
 }
 
 PyObject *
-PyGccBasicBlock_get_succs(PyGccBasicBlock *self, void *closure)
+PyGccBasicBlock_get_preds(PyGccBasicBlock *self, void *closure)
+{
+    PyObject *result = cached_sequence_get(&self->preds);
+    if (result) {
+        return result;
+    }
+    return cached_sequence_set(&self->preds, make_preds_list(self));
+}
+
+static PyObject *
+make_succs_list(PyGccBasicBlock *self)
 {
     IMPL_LIST_MAKER(gcc_cfg_block_for_each_succ_edge,
                     self->bb,
                     add_edge_to_list)
 }
 
+PyObject *
+PyGccBasicBlock_get_succs(PyGccBasicBlock *self, void *closure)
+{
+    PyObject *result = cached_sequence_get(&self->succs);
+    if (result) {
+        return result;
+    }
+    return cached_sequence_set(&self->succs, make_succs_list(self));
+}
+
 IMPL_APPENDER(append_gimple_to_list,
               gcc_gimple,
               PyGccGimple_New)
 
+static PyObject *
+make_gimple_list(PyGccBasicBlock *self)
+{
+    IMPL_LIST_MAKER(gcc_cfg_block_for_each_gimple,
+                    self->bb,
+                    append_gimple_to_list)
+}
+
 PyObject *
 PyGccBasicBlock_get_gimple(PyGccBasicBlock *self, void *closure)
 {
+    PyObject *result;
+
     assert(self);
     assert(self->bb.inner);
 
-    IMPL_LIST_MAKER(gcc_cfg_block_for_each_gimple,
-                    self->bb,
-                    append_gimple_to_list)
+    result = cached_sequence_get(&self->gimple);
+    if (result) {
+        return result;
+    }
+    return cached_sequence_set(&self->gimple, make_gimple_list(self));
 }
 
 static PyObject*
@@ -169,106 +280,6 @@ PyGccBasicBlock_get_rtl(PyGccBasicBlock *self, void *closure)
 }
 
 
-/*
-  Force a 1-1 mapping between pointer values and wrapper objects
- */
-PyObject *
-PyGcc_LazilyCreateWrapper(PyObject **cache,
-				 void *ptr,
-				 PyObject *(*ctor)(void *ptr))
-{
-    PyObject *key = NULL;
-    PyObject *oldobj = NULL;
-    PyObject *newobj = NULL;
-
-    /* printf("PyGcc_LazilyCreateWrapper(&%p, %p, %p)\n", *cache, ptr, ctor); */
-
-    assert(cache);
-    /* ptr is allowed to be NULL */
-    assert(ctor);
-
-    /* The cache is lazily created: */
-    if (!*cache) {
-	*cache = PyDict_New();
-	if (!*cache) {
-	    return NULL;
-	}
-    }
-
-    key = PyLong_FromVoidPtr(ptr);
-    if (!key) {
-	return NULL;
-    }
-
-    oldobj = PyDict_GetItem(*cache, key);
-    if (oldobj) {
-	/* The cache already contains an object wrapping "ptr": reuse t */
-	/* printf("reusing %p for %p\n", oldobj, ptr); */
-	Py_INCREF(oldobj); /* it was a borrowed ref */
-	Py_DECREF(key);
-	return oldobj;
-    }
-
-    /* 
-       Not in the cache: we don't yet have a wrapper object for this pointer
-    */
-       
-    assert(NULL != key); /* we own a ref */
-    assert(NULL == oldobj);
-    assert(NULL == newobj);
-
-    /* Construct a wrapper : */
-
-    newobj = (*ctor)(ptr);
-    if (!newobj) {
-	Py_DECREF(key);
-	return NULL;
-    }
-
-    /* printf("created %p for %p\n", newobj, ptr); */
-
-    if (PyDict_SetItem(*cache, key, newobj)) {
-	Py_DECREF(newobj);
-	Py_DECREF(key);
-	return NULL;
-    }
-
-    Py_DECREF(key);
-    return newobj;
-}
-
-int
-PyGcc_insert_new_wrapper_into_cache(PyObject **cache,
-                                         void *ptr,
-                                         PyObject *obj)
-{
-    PyObject *key;
-    assert(cache);
-    assert(ptr);
-    assert(obj);
-
-    /* The cache is lazily created: */
-    if (!*cache) {
-	*cache = PyDict_New();
-	if (!*cache) {
-	    return -1;
-	}
-    }
-
-    key = PyLong_FromVoidPtr(ptr);
-    if (!key) {
-	return -1;
-    }
-
-    if (PyDict_SetItem(*cache, key, obj)) {
-	Py_DECREF(key);
-	return -1;
-    }
-
-    Py_DECREF(key);
-    return 0;
-}
-
 union cfg_block_or_ptr {
     gcc_cfg_block block;
     void *ptr;
@@ -353,6 +364,9 @@ real_make_basic_block_wrapper(void *ptr)
 #endif
 
     obj->bb = u.block;
+    cached_sequence_init(&obj->preds);
+    cached_sequence_init(&obj->succs);
+    cached_sequence_init(&obj->gimple);
 
     return (PyObject*)obj;
       
@@ -368,7 +382,7 @@ PyGcc_WrtpMarkForPyGccBasicBlock(PyGccBasicBlock *wrapper)
 }
 
 
-static PyObject *basic_block_wrapper_cache = NULL;
+static PyGccWrapperCache basic_block_wrapper_cache;
 PyObject *
 PyGccBasicBlock_New(gcc_cfg_block bb)
 {
@@ -402,14 +416,32 @@ add_block_to_list(gcc_cfg_block bb, void *user_data)
     return false;
 }
 
-PyObject *
-PyGccCfg_get_basic_blocks(PyGccCfg *self, void *closure)
+void
+PyGccCfg_dealloc(PyObject *obj)
+{
+    cached_sequence_clear(&((PyGccCfg *)obj)->basic_blocks);
+    PyGccWrapper_Dealloc(obj);
+}
+
+static PyObject *
+make_basic_blocks_list(PyGccCfg *self)
 {
     IMPL_LIST_MAKER(gcc_cfg_for_each_block,
                     self->cfg,
                     add_block_to_list)
 }
 
+PyObject *
+PyGccCfg_get_basic_blocks(PyGccCfg *self, void *closure)
+{
+    PyObject *result = cached_sequence_get(&self->basic_blocks);
+    if (result) {
+        return result;
+    }
+    return cached_sequence_set(&self->basic_blocks,
+                               make_basic_blocks_list(self));
+}
+
 extern PyTypeObject PyGccLabelDecl_TypeObj;
 
 PyObject *
@@ -452,6 +484,321 @@ PyGccCfg_get_block_for_label(PyObject *s, PyObject *args)
     return PyGccBasicBlock_New(gcc_private_make_cfg_block(bb));
 }
 
+/*
+  Support for gcc.Function.export_cfg(): build the whole CFG of a function
+  in one go, rather than requiring a round trip into C for each block,
+  statement and edge.
+*/
+struct cfg_exporter {
+    /* The non-NULL blocks within the CFG, in the order of
+       gcc.Cfg.basic_blocks: */
+    gcc_cfg_block *blocks;
+    int num_blocks;
+
+    /* Map from the index of a block to its position within "blocks"
+       (or -1): */
+    int *pos_of_index;
+    int max_index;
+
+    /* The position of the block whose edges are being exported: */
+    int src;
+
+    PyObject *edges;
+    PyObject *cfg_edges;
+};
+
+static bool
+count_block(gcc_cfg_block bb, void *user_data)
+{
+    struct cfg_exporter *exporter = (struct cfg_exporter *)user_data;
+
+    if (bb.inner) {
+        int index = gcc_cfg_block_get_index(bb);
+        if (index > exporter->max_index) {
+            exporter->max_index = index;
+        }
+        exporter->num_blocks++;
+    }
+    return false;
+}
+
+static bool
+record_block(gcc_cfg_block bb, void *user_data)
+{
+    struct cfg_exporter *exporter = (struct cfg_exporter *)user_data;
+
+    if (bb.inner) {
+        exporter->blocks[exporter->num_blocks++] = bb;
+    }
+    return false;
+}
+
+/* Get the position of the given block, or -1 if it isn't within the CFG: */
+static int
+get_block_pos(struct cfg_exporter *exporter, gcc_cfg_block bb)
+{
+    int index;
+    int pos;
+
+    if (!bb.inner) {
+        return -1;
+    }
+    index = gcc_cfg_block_get_index(bb);
+    if (index < 0 || index > exporter->max_index) {
+        return -1;
+    }
+    pos = exporter->pos_of_index[index];
+    if (pos < 0 || exporter->blocks[pos].inner != bb.inner) {
+        return -1;
+    }
+    return pos;
+}
+
+static int
+get_edge_flags(gcc_cfg_edge e)
+{
+    int flags = 0;
+
+    if (gcc_cfg_edge_is_true_value(e)) {
+        flags |= PYGCC_EDGE_TRUE_VALUE;
+    }
+    if (gcc_cfg_edge_is_false_value(e)) {
+        flags |= PYGCC_EDGE_FALSE_VALUE;
+    }
+    if (gcc_cfg_edge_is_loop_exit(e)) {
+        flags |= PYGCC_EDGE_LOOP_EXIT;
+    }
+    if (gcc_cfg_edge_get_can_fallthru(e)) {
+        flags |= PYGCC_EDGE_CAN_FALLTHRU;
+    }
+    if (gcc_cfg_edge_is_complex(e)) {
+        flags |= PYGCC_EDGE_COMPLEX;
+    }
+    if (gcc_cfg_edge_is_eh(e)) {
+        flags |= PYGCC_EDGE_EH;
+    }
+    return flags;
+}
+
+static bool
+export_edge(gcc_cfg_edge e, void *user_data)
+{
+    struct cfg_exporter *exporter = (struct cfg_exporter *)user_data;
+    PyObject *triple;
+    PyObject *edge_obj;
+
+    triple = Py_BuildValue("(iii)",
+                           exporter->src,
+                           get_block_pos(exporter, gcc_cfg_edge_get_dest(e)),
+                           get_edge_flags(e));
+    if (!triple) {
+        return true;
+    }
+    if (-1 == PyList_Append(exporter->edges, triple)) {
+        Py_DECREF(triple);
+        return true;
+    }
+    Py_DECREF(triple);
+
+    edge_obj = PyGccEdge_New(e);
+    if (!edge_obj) {
+        return true;
+    }
+    if (-1 == PyList_Append(exporter->cfg_edges, edge_obj)) {
+        Py_DECREF(edge_obj);
+        return true;
+    }
+    Py_DECREF(edge_obj);
+    return false;
+}
+
+static PyObject *
+make_int_tuple(const int *values, int n)
+{
+    PyObject *result;
+    int i;
+
+    result = PyTuple_New(n);
+    if (!result) {
+        return NULL;
+    }
+    for (i = 0; i < n; i++) {
+        PyObject *item = PyGccInt_FromLong(values[i]);
+        if (!item) {
+            Py_DECREF(result);
+            return NULL;
+        }
+        PyTuple_SET_ITEM(result, i, item);
+    }
+    return result;
+}
+
+/* Get the position as an int, or None for blocks that aren't present: */
+static PyObject *
+make_pos_or_none(int pos)
+{
+    if (pos < 0) {
+        Py_RETURN_NONE;
+    }
+    return PyGccInt_FromLong(pos);
+}
+
+/* Add the value to the dict under the given key, stealing the reference: */
+static int
+set_dict_item(PyObject *dict, const char *key, PyObject *value)
+    CPYCHECKER_STEALS_REFERENCE_TO_ARG(3);
+
+static int
+set_dict_item(PyObject *dict, const char *key, PyObject *value)
+{
+    int err;
+
+    if (!value) {
+        return -1;
+    }
+    err = PyDict_SetItemString(dict, key, value);
+    Py_DECREF(value);
+    return err;
+}
+
+/* Replace the list with a tuple of its contents, returning 0 on failure: */
+static int
+convert_to_tuple(PyObject **seq)
+{
+    PyObject *tuple;
+
+    tuple = PyList_AsTuple(*seq);
+    if (!tuple) {
+        return 0;
+    }
+    Py_DECREF(*seq);
+    *seq = tuple;
+    return 1;
+}
+
+PyObject *
+PyGcc_export_cfg(gcc_cfg cfg)
+{
+    struct cfg_exporter exporter;
+    PyObject *blocks = NULL;
+    PyObject *stmts = NULL;
+    PyObject *phis = NULL;
+    int *stmt_starts = NULL;
+    int *phi_starts = NULL;
+    PyObject *result = NULL;
+    int i;
+
+    exporter.blocks = NULL;
+    exporter.num_blocks = 0;
+    exporter.pos_of_index = NULL;
+    exporter.max_index = -1;
+    exporter.src = -1;
+    exporter.edges = NULL;
+    exporter.cfg_edges = NULL;
+
+    /* 1st pass: find the blocks: */
+    gcc_cfg_for_each_block(cfg, count_block, &exporter);
+    exporter.blocks = PyMem_New(gcc_cfg_block, exporter.num_blocks + 1);
+    exporter.pos_of_index = PyMem_New(int, exporter.max_index + 1);
+    stmt_starts = PyMem_New(int, exporter.num_blocks + 1);
+    phi_starts = PyMem_New(int, exporter.num_blocks + 1);
+    if (!exporter.blocks || !exporter.pos_of_index
+        || !stmt_starts || !phi_starts) {
+        PyErr_NoMemory();
+        goto cleanup;
+    }
+    exporter.num_blocks = 0;
+    gcc_cfg_for_each_block(cfg, record_block, &exporter);
+    for (i = 0; i <= exporter.max_index; i++) {
+        exporter.pos_of_index[i] = -1;
+    }
+    for (i = 0; i < exporter.num_blocks; i++) {
+        exporter.pos_of_index[gcc_cfg_block_get_index(exporter.blocks[i])] = i;
+    }
+
+    blocks = PyTuple_New(exporter.num_blocks);
+    stmts = PyList_New(0);
+    phis = PyList_New(0);
+    exporter.edges = PyList_New(0);
+    exporter.cfg_edges = PyList_New(0);
+    if (!blocks || !stmts || !phis
+        || !exporter.edges || !exporter.cfg_edges) {
+        goto cleanup;
+    }
+
+    /* 2nd pass: the contents of each block, and its outgoing edges: */
+    for (i = 0; i < exporter.num_blocks; i++) {
+        gcc_cfg_block bb = exporter.blocks[i];
+        PyObject *bb_obj;
+
+        bb_obj = PyGccBasicBlock_New(bb);
+        if (!bb_obj) {
+            goto cleanup;
+        }
+        PyTuple_SET_ITEM(blocks, i, bb_obj);
+
+        stmt_starts[i] = PyList_GET_SIZE(stmts);
+        if (gcc_cfg_block_for_each_gimple(bb, append_gimple_to_list, stmts)) {
+            goto cleanup;
+        }
+
+        phi_starts[i] = PyList_GET_SIZE(phis);
+        if (gcc_cfg_block_for_each_gimple_phi(bb,
+                                              append_gimple_phi_to_list,
+                                              phis)) {
+            goto cleanup;
+        }
+
+        exporter.src = i;
+        if (gcc_cfg_block_for_each_succ_edge(bb, export_edge, &exporter)) {
+            goto cleanup;
+        }
+    }
+    stmt_starts[exporter.num_blocks] = PyList_GET_SIZE(stmts);
+    phi_starts[exporter.num_blocks] = PyList_GET_SIZE(phis);
+
+    if (!convert_to_tuple(&stmts)
+        || !convert_to_tuple(&phis)
+        || !convert_to_tuple(&exporter.edges)
+        || !convert_to_tuple(&exporter.cfg_edges)) {
+        goto cleanup;
+    }
+
+    result = PyDict_New();
+    if (!result) {
+        goto cleanup;
+    }
+    if (PyDict_SetItemString(result, "blocks", blocks)
+        || set_dict_item(result, "entry",
+                         make_pos_or_none(get_block_pos(&exporter,
+                                                        gcc_cfg_get_entry(cfg))))
+        || set_dict_item(result, "exit",
+                         make_pos_or_none(get_block_pos(&exporter,
+                                                        gcc_cfg_get_exit(cfg))))
+        || PyDict_SetItemString(result, "stmts", stmts)
+        || set_dict_item(result, "stmt_starts",
+                         make_int_tuple(stmt_starts, exporter.num_blocks + 1))
+        || PyDict_SetItemString(result, "phis", phis)
+        || set_dict_item(result, "phi_starts",
+                         make_int_tuple(phi_starts, exporter.num_blocks + 1))
+        || PyDict_SetItemString(result, "edges", exporter.edges)
+        || PyDict_SetItemString(result, "cfg_edges", exporter.cfg_edges)) {
+        Py_CLEAR(result);
+    }
+
+ cleanup:
+    Py_XDECREF(blocks);
+    Py_XDECREF(stmts);
+    Py_XDECREF(phis);
+    Py_XDECREF(exporter.edges);
+    Py_XDECREF(exporter.cfg_edges);
+    PyMem_Free(exporter.blocks);
+    PyMem_Free(exporter.pos_of_index);
+    PyMem_Free(stmt_starts);
+    PyMem_Free(phi_starts);
+    return result;
+}
+
 union gcc_cfg_as_ptr {
     gcc_cfg cfg;
     void *ptr;
@@ -474,6 +821,7 @@ real_make_cfg_wrapper(void *ptr)
     }
 
     obj->cfg = u.cfg;
+    cached_sequence_init(&obj->basic_blocks);
 
     return (PyObject*)obj;
       
@@ -481,7 +829,7 @@ error:
     return NULL;
 }
 
-static PyObject *cfg_wrapper_cache = NULL;
+static PyGccWrapperCache cfg_wrapper_cache;
 PyObject *
 PyGccCfg_New(gcc_cfg cfg)
 {
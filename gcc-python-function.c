@@ -172,6 +172,18 @@ error:
     return NULL;
 }
 
+PyObject *
+PyGccFunction_export_cfg(PyObject *s, PyObject *args)
+{
+    struct PyGccFunction *self = (struct PyGccFunction *)s;
+    gcc_cfg cfg = gcc_function_get_cfg(self->fun);
+
+    if (!cfg.inner) {
+        Py_RETURN_NONE;
+    }
+    return PyGcc_export_cfg(cfg);
+}
+
 void
 PyGcc_WrtpMarkForPyGccFunction(PyGccFunction *wrapper)
 {
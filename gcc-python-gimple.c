@@ -190,17 +190,140 @@ PyGccGimple_richcompare(PyObject *o1, PyObject *o2, int op)
     return result_obj;
 }
 
+/*
+  The state of a walk over the trees of a statement, for walk_tree and
+  iter_tree
+*/
+struct gimple_tree_walk {
+    /* If the caller supplied "only", this is a table of which tree codes
+       have a wrapper class that matches it, so that nodes that don't match
+       can be skipped without entering Python; otherwise it's NULL, and every
+       node is visited: */
+    char *matches;
+
+    /* For walk_tree, the python callback to invoke on each node: */
+    struct callback_closure *closure;
+
+    /* For iter_tree, the list of nodes visited so far: */
+    PyObject *nodes;
+};
+
+/*
+  Build the table for struct gimple_tree_walk's "matches" field for the given
+  class or tuple of classes (as per isinstance), or NULL with an exception set
+*/
+static char *
+make_tree_code_filter(PyObject *only)
+{
+    char *matches;
+    int code;
+
+    matches = PyMem_New(char, PyGcc_autogenerated_num_tree_codes);
+    if (!matches) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+
+    for (code = 0; code < PyGcc_autogenerated_num_tree_codes; code++) {
+        PyGccWrapperTypeObject *tp;
+        int result = 0;
+
+        tp = PyGcc_autogenerated_tree_type_for_tree_code((enum tree_code)code,
+                                                         1);
+        if (tp) {
+            result = PyObject_IsSubclass((PyObject*)tp, only);
+            if (result == -1) {
+                PyMem_Free(matches);
+                return NULL;
+            }
+        }
+        matches[code] = result;
+    }
+
+    return matches;
+}
+
+static int
+tree_code_matches(struct gimple_tree_walk *walk, tree t)
+{
+    int code = TREE_CODE(t);
+
+    if (code >= PyGcc_autogenerated_num_tree_codes) {
+        return 0;
+    }
+    return walk->matches[code];
+}
+
+/*
+  Extract and remove the "only" keyword argument (if any) from the kwargs of
+  walk_tree/iter_tree, setting up the filter for the walk from it.
+
+  Returns the remaining kwargs (a new reference, or NULL if there aren't
+  any), setting *ok to 0 if an exception occurred.
+*/
+static PyObject *
+take_tree_code_filter(struct gimple_tree_walk *walk, PyObject *kwargs,
+                      int *ok)
+{
+    PyObject *only;
+    PyObject *remaining;
+
+    *ok = 1;
+    walk->matches = NULL;
+    if (!kwargs) {
+        return NULL;
+    }
+
+    only = PyDict_GetItemString(kwargs, "only");
+    if (!only) {
+        Py_INCREF(kwargs);
+        return kwargs;
+    }
+
+    if (only != Py_None) {
+        walk->matches = make_tree_code_filter(only);
+        if (!walk->matches) {
+            *ok = 0;
+            return NULL;
+        }
+    }
+
+    /* (copy the dict, rather than modifying the caller's): */
+    remaining = PyDict_Copy(kwargs);
+    if (!remaining) {
+        goto error;
+    }
+    if (-1 == PyDict_DelItemString(remaining, "only")) {
+        Py_DECREF(remaining);
+        goto error;
+    }
+    return remaining;
+
+ error:
+    PyMem_Free(walk->matches);
+    walk->matches = NULL;
+    *ok = 0;
+    return NULL;
+}
+
 static tree
 gimple_walk_tree_callback(tree *tree_ptr, int *walk_subtrees, void *data)
 {
     struct walk_stmt_info *wi = (struct walk_stmt_info*)data;
-    struct callback_closure *closure = (struct callback_closure *)wi->info;
+    struct gimple_tree_walk *walk = (struct gimple_tree_walk *)wi->info;
+    struct callback_closure *closure = walk->closure;
     PyObject *tree_obj = NULL;
     PyObject *args = NULL;
     PyObject *result = NULL;
 
     assert(closure);
     assert(*tree_ptr);
+
+    /* Skip nodes that don't match the filter, without entering Python: */
+    if (walk->matches && !tree_code_matches(walk, *tree_ptr)) {
+        return NULL;
+    }
+
     tree_obj = PyGccTree_New(gcc_private_make_tree(*tree_ptr));
     if (!tree_obj) {
         goto error;
@@ -234,7 +357,7 @@ gimple_walk_tree_callback(tree *tree_ptr, int *walk_subtrees, void *data)
     Py_XDECREF(tree_obj);
     Py_XDECREF(args);
     Py_XDECREF(result);
-    return NULL;
+    return *tree_ptr;
 }
 
 PyObject *
@@ -242,28 +365,48 @@ PyGccGimple_walk_tree(struct PyGccGimple * self, PyObject *args, PyObject *kwarg
 {
     PyObject *callback;
     PyObject *extraargs = NULL;
-    struct callback_closure *closure;
+    PyObject *remaining_kwargs;
+    struct gimple_tree_walk walk;
     tree result;
     struct walk_stmt_info wi;
+    int ok;
 
+    if (PyTuple_Size(args) < 1) {
+        PyErr_SetString(PyExc_TypeError,
+                        "walk_tree() requires a callback argument");
+        return NULL;
+    }
     callback = PyTuple_GetItem(args, 0);
     extraargs = PyTuple_GetSlice(args, 1, PyTuple_Size(args));
+    if (!extraargs) {
+        return NULL;
+    }
 
-    closure = PyGcc_closure_new_generic(callback, extraargs, kwargs);
-    if (!closure) {
-        Py_DECREF(callback);
+    remaining_kwargs = take_tree_code_filter(&walk, kwargs, &ok);
+    if (!ok) {
         Py_DECREF(extraargs);
         return NULL;
     }
 
+    walk.closure = PyGcc_closure_new_generic(callback, extraargs,
+                                             remaining_kwargs);
+    Py_DECREF(extraargs);
+    Py_XDECREF(remaining_kwargs);
+    if (!walk.closure) {
+        PyMem_Free(walk.matches);
+        return NULL;
+    }
+    walk.nodes = NULL;
+
     memset(&wi, 0, sizeof(wi));
-    wi.info = closure;
+    wi.info = &walk;
 
     result = walk_gimple_op (self->stmt.inner,
                              gimple_walk_tree_callback,
                              &wi);
 
-    PyGcc_closure_free(closure);
+    PyGcc_closure_free(walk.closure);
+    PyMem_Free(walk.matches);
 
     /* Propagate exceptions: */
     if (PyErr_Occurred()) {
@@ -273,6 +416,87 @@ PyGccGimple_walk_tree(struct PyGccGimple * self, PyObject *args, PyObject *kwarg
     return PyGccTree_New(gcc_private_make_tree(result));
 }
 
+static tree
+gimple_iter_tree_callback(tree *tree_ptr, int *walk_subtrees, void *data)
+{
+    struct walk_stmt_info *wi = (struct walk_stmt_info*)data;
+    struct gimple_tree_walk *walk = (struct gimple_tree_walk *)wi->info;
+    PyObject *tree_obj;
+
+    assert(walk->nodes);
+    assert(*tree_ptr);
+
+    if (walk->matches && !tree_code_matches(walk, *tree_ptr)) {
+        return NULL;
+    }
+
+    tree_obj = PyGccTree_New(gcc_private_make_tree(*tree_ptr));
+    if (!tree_obj) {
+        goto error;
+    }
+    if (-1 == PyList_Append(walk->nodes, tree_obj)) {
+        Py_DECREF(tree_obj);
+        goto error;
+    }
+    Py_DECREF(tree_obj);
+    return NULL;
+
+ error:
+    /* On an exception, terminate the traversal: */
+    *walk_subtrees = 0;
+    return *tree_ptr;
+}
+
+PyObject *
+PyGccGimple_iter_tree(struct PyGccGimple * self, PyObject *args, PyObject *kwargs)
+{
+    const char *keywords[] = {"only",
+                              NULL};
+    PyObject *only = Py_None;
+    struct gimple_tree_walk walk;
+    struct walk_stmt_info wi;
+    PyObject *result;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs,
+                                     "|O:iter_tree", (char**)keywords,
+                                     &only)) {
+        return NULL;
+    }
+
+    walk.matches = NULL;
+    walk.closure = NULL;
+    if (only != Py_None) {
+        walk.matches = make_tree_code_filter(only);
+        if (!walk.matches) {
+            return NULL;
+        }
+    }
+    walk.nodes = PyList_New(0);
+    if (!walk.nodes) {
+        PyMem_Free(walk.matches);
+        return NULL;
+    }
+
+    memset(&wi, 0, sizeof(wi));
+    wi.info = &walk;
+
+    walk_gimple_op (self->stmt.inner,
+                    gimple_iter_tree_callback,
+                    &wi);
+
+    PyMem_Free(walk.matches);
+
+    /* Propagate exceptions: */
+    if (PyErr_Occurred()) {
+        Py_DECREF(walk.nodes);
+        return NULL;
+    }
+
+    result = PyObject_GetIter(walk.nodes);
+    Py_DECREF(walk.nodes);
+    return result;
+}
+
 PyObject *
 PyGccGimple_get_rhs(struct PyGccGimple *self, void *closure)
 {
@@ -391,9 +615,10 @@ PyGccGimpleSwitch_get_labels(struct PyGccGimple *self, void *closure)
 
 
 /*
-   Ensure we have a unique PyGccGimple per gimple address (by maintaining a dict):
+   Ensure we have a unique PyGccGimple per gimple address (by maintaining a
+   PyGccWrapperCache):
 */
-static PyObject *gimple_wrapper_cache = NULL;
+static PyGccWrapperCache gimple_wrapper_cache;
 
 union gcc_gimple_or_ptr {
     gcc_gimple stmt;
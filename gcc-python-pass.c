@@ -33,14 +33,14 @@
 */
 
 /*
-   Ensure we have a unique PyGccPass per pass address (by maintaining a dict)
+   Ensure we have a unique PyGccPass per pass address (by maintaining a
+   PyGccWrapperCache)
 
-   For passes defined in Python, this dictionary maps from
-   long (struct opt_pass *) to the gcc.Pass wrapper object for that pass
-
-   The references on the right-hand-side keep these wrappers alive
+   For passes defined in Python, this maps from the (struct opt_pass *) to
+   the gcc.Pass wrapper object for that pass, and keeps these wrappers alive
+   (see PyGcc_insert_new_wrapper_into_cache)
 */
-static PyObject *pass_wrapper_cache = NULL;
+static PyGccWrapperCache pass_wrapper_cache;
 
 static bool impl_gate(function *fun)
 {
@@ -66,6 +66,9 @@ static bool impl_gate(function *fun)
     pass_obj = PyGccPass_New(current_pass);
     assert(pass_obj); /* we own a ref at this point */
 
+    /* GCC may have changed the CFG since Python last ran: */
+    PyGcc_invalidate_cfg_caches();
+
     if (!PyObject_HasAttrString(pass_obj, "gate")) {
         /* No "gate" method?  Always execute this pass: */
         Py_DECREF(pass_obj);
@@ -118,6 +121,9 @@ static unsigned int impl_execute(function *fun)
     pass_obj = PyGccPass_New(current_pass);
     assert(pass_obj); /* we own a ref at this point */
 
+    /* GCC may have changed the CFG since Python last ran: */
+    PyGcc_invalidate_cfg_caches();
+
     if (fun) {
         assert (fun == cfun);
         gcc_function cf = gcc_get_current_function();
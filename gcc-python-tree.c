@@ -1131,10 +1131,11 @@ PyGcc_WrtpMarkForPyGccTree(PyGccTree *wrapper)
 }
 
 /*
-   Ensure we have a unique PyGccTree per tree address (by maintaining a dict)
-   (what about lifetimes?)
+   Ensure we have a unique PyGccTree per tree address (by maintaining a
+   PyGccWrapperCache).  The wrappers aren't kept alive by this: once a
+   wrapper is deallocated, a later lookup of the same tree gets a new one.
 */
-static PyObject *tree_wrapper_cache = NULL;
+static PyGccWrapperCache tree_wrapper_cache;
 
 PyObject *
 PyGccTree_New(gcc_tree t)
@@ -29,6 +29,11 @@
   when it starts marking, we iterate through all our live wrapper objects,
   marking the underlying GCC objects.
 
+  Many wrappers wrap something that isn't managed by GCC's GC at all (e.g.
+  a gcc.Location, or a gcc.Pass); these have a NULL "wrtp_mark" hook, and
+  are tracked within a separate list, so that the cost of marking only
+  depends on the number of live wrappers of GC-managed objects.
+
 
   Implementation details
   ======================
@@ -63,22 +68,21 @@
   "MyPass" is this heap-allocated PyGccWrapperTypeObject:
      ob_type == &PyGccWrapperMetaType
      tp_base == &PyGccGimplePassType (the parent class: "gcc.GimplePass")
-     wrtp_mark == PyGcc_WrtpMarkForPyGccPass (inherited from tp_base via
+     wrtp_mark == NULL (inherited from tp_base via
                   PyGccWrapperMetaType.tp_new)
 
   PyGccGimplePassType is a statically-allocated PyGccWrapperTypeObject (in
   autogenerated-pass.c):
      ob_type == &PyGccWrapperMetaType
      tp_base == &PyGccPass_TypeObj (the parent class: "gcc.Pass")
-     wrtp_mark == PyGcc_WrtpMarkForPyGccPass ("manually" set up by
-                  generate-pass-c.py)
+     wrtp_mark == NULL ("manually" set up by generate-pass-c.py, since
+                  passes aren't managed by the GC)
 
   PyGccPass_TypeObj is a statically-allocated PyGccWrapperTypeObject (in
   autogenerated-pass.c):
      ob_type == &PyGccWrapperMetaType
      tp_base == NULL, but becomes &PyBaseObject_Type aka "object"
-     wrtp_mark == PyGcc_WrtpMarkForPyGccPass ("manually" set up by
-                  generate-pass-c.py)
+     wrtp_mark == NULL ("manually" set up by generate-pass-c.py)
 
   PyGccWrapperMetaType is the statically-allocated metaclass for the above
   type objects ("gcc.WrapperMeta")
@@ -124,8 +128,7 @@ PyGcc_wrapper_meta_tp_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
     base_type = (PyGccWrapperTypeObject*)((PyTypeObject*)new_type)->tp_base;
     assert(base_type);
 
-    /* Inherit wrtp_mark: */
-    assert(base_type->wrtp_mark);
+    /* Inherit wrtp_mark (which is NULL if there's nothing to mark): */
     new_type->wrtp_mark = base_type->wrtp_mark;
 
     return (PyObject*)new_type;
@@ -187,13 +190,286 @@ PyTypeObject PyGccWrapperMeta_TypeObj  = {
 #endif
 };
 
-/* Maintain a circular linked list of PyGccWrapper instances: */
+/*
+  Maintain circular linked lists of PyGccWrapper instances: one for those
+  with a wrtp_mark hook, and one for those without:
+*/
 static struct PyGccWrapper sentinel = {
     PyObject_HEAD_INIT(NULL)
     &sentinel,
     &sentinel,
 };
 
+static struct PyGccWrapper unmarked_sentinel = {
+    PyObject_HEAD_INIT(NULL)
+    &unmarked_sentinel,
+    &unmarked_sentinel,
+};
+
+/* Counters, for gcc._get_wrapper_stats(): */
+static struct {
+    /* The number of live wrappers within each list: */
+    Py_ssize_t num_marked;
+    Py_ssize_t num_unmarked;
+
+    /* The number of times GCC's GC has walked the wrappers: */
+    Py_ssize_t num_walks;
+
+    /* The number of wrappers marked, during all walks, and the last one: */
+    Py_ssize_t total_marked;
+    Py_ssize_t last_marked;
+} wrapper_stats;
+
+/*
+  PyGccWrapperCache: a 1-1 mapping between pointer values and the live
+  wrapper objects for them
+*/
+
+/* The minimum number of slots in a table that's been used: */
+#define WRAPPER_CACHE_MIN_SIZE 64
+
+/* The "obj" of a slot whose wrapper was deallocated: */
+static struct PyGccWrapper dead_wrapper;
+#define DEAD_WRAPPER (&dead_wrapper)
+
+/* All of the tables that have been used: */
+static PyGccWrapperCache *all_wrapper_caches = NULL;
+
+static size_t
+wrapper_cache_hash(void *ptr)
+{
+    /* The pointers are aligned, so discard the low bits, then mix: */
+    size_t h = (size_t)((uintptr_t)ptr >> 3);
+    h ^= h >> 16;
+    h *= (size_t)0x45d9f3bUL;
+    h ^= h >> 16;
+    return h;
+}
+
+/* Get the slot holding the live wrapper for ptr, or NULL: */
+static PyGccWrapperCacheEntry *
+wrapper_cache_find(PyGccWrapperCache *cache, void *ptr)
+{
+    size_t mask;
+    size_t i;
+
+    if (!cache->size) {
+        return NULL;
+    }
+    mask = cache->size - 1;
+    for (i = wrapper_cache_hash(ptr) & mask; ; i = (i + 1) & mask) {
+        PyGccWrapperCacheEntry *entry = &cache->entries[i];
+        if (!entry->obj) {
+            return NULL;
+        }
+        if (entry->obj != DEAD_WRAPPER && entry->ptr == ptr) {
+            return entry;
+        }
+    }
+}
+
+/*
+  Reallocate the table with room for at least "count" live wrappers,
+  dropping the dead slots:
+*/
+static int
+wrapper_cache_resize(PyGccWrapperCache *cache, size_t count)
+{
+    PyGccWrapperCacheEntry *old_entries = cache->entries;
+    size_t old_size = cache->size;
+    size_t new_size = WRAPPER_CACHE_MIN_SIZE;
+    size_t i;
+
+    /* Keep the table at most half full: */
+    while (new_size < count * 2) {
+        new_size *= 2;
+    }
+
+    cache->entries = PyMem_New(PyGccWrapperCacheEntry, new_size);
+    if (!cache->entries) {
+        cache->entries = old_entries;
+        PyErr_NoMemory();
+        return -1;
+    }
+    memset(cache->entries, 0, new_size * sizeof(PyGccWrapperCacheEntry));
+    cache->size = new_size;
+    cache->dead = 0;
+
+    for (i = 0; i < old_size; i++) {
+        PyGccWrapperCacheEntry *old_entry = &old_entries[i];
+        if (old_entry->obj && old_entry->obj != DEAD_WRAPPER) {
+            size_t mask = new_size - 1;
+            size_t j = wrapper_cache_hash(old_entry->ptr) & mask;
+            while (cache->entries[j].obj) {
+                j = (j + 1) & mask;
+            }
+            cache->entries[j] = *old_entry;
+        }
+    }
+    PyMem_Free(old_entries);
+
+    return 0;
+}
+
+/* Add a wrapper for ptr, which must not already have one within the table: */
+static int
+wrapper_cache_insert(PyGccWrapperCache *cache, void *ptr,
+                     struct PyGccWrapper *obj)
+{
+    size_t mask;
+    size_t i;
+
+    assert(!obj->wr_cache);
+
+    if (!cache->size) {
+        /* First use of this table: */
+        cache->next = all_wrapper_caches;
+        all_wrapper_caches = cache;
+    }
+
+    /* Keep the table (including the dead slots) at most 2/3 full: */
+    if ((cache->live + cache->dead + 1) * 3 > cache->size * 2) {
+        if (wrapper_cache_resize(cache, cache->live + 1)) {
+            return -1;
+        }
+    }
+
+    mask = cache->size - 1;
+    for (i = wrapper_cache_hash(ptr) & mask; ; i = (i + 1) & mask) {
+        PyGccWrapperCacheEntry *entry = &cache->entries[i];
+        if (!entry->obj || entry->obj == DEAD_WRAPPER) {
+            if (entry->obj == DEAD_WRAPPER) {
+                cache->dead--;
+            }
+            entry->ptr = ptr;
+            entry->obj = obj;
+            break;
+        }
+    }
+    cache->live++;
+
+    obj->wr_cache = cache;
+    obj->wr_cache_key = ptr;
+    return 0;
+}
+
+/* Called when a wrapper within a table is deallocated: */
+static void
+wrapper_cache_remove(struct PyGccWrapper *obj)
+{
+    PyGccWrapperCache *cache = obj->wr_cache;
+    PyGccWrapperCacheEntry *entry;
+
+    assert(cache);
+    entry = wrapper_cache_find(cache, obj->wr_cache_key);
+    if (entry && entry->obj == obj) {
+        entry->ptr = NULL;
+        entry->obj = DEAD_WRAPPER;
+        cache->live--;
+        cache->dead++;
+    }
+    obj->wr_cache = NULL;
+    obj->wr_cache_key = NULL;
+}
+
+static int
+is_wrapper(PyObject *obj)
+{
+    return PyObject_TypeCheck((PyObject*)Py_TYPE(obj),
+                              &PyGccWrapperMeta_TypeObj);
+}
+
+/*
+  Force a 1-1 mapping between pointer values and wrapper objects
+ */
+PyObject *
+PyGcc_LazilyCreateWrapper(PyGccWrapperCache *cache,
+				 void *ptr,
+				 PyObject *(*ctor)(void *ptr))
+{
+    PyGccWrapperCacheEntry *entry;
+    PyObject *newobj;
+
+    assert(cache);
+    /* ptr is allowed to be NULL */
+    assert(ctor);
+
+    entry = wrapper_cache_find(cache, ptr);
+    if (entry) {
+	/* The cache already contains an object wrapping "ptr": reuse it */
+	Py_INCREF(entry->obj);
+	return (PyObject*)entry->obj;
+    }
+
+    /* Not in the cache: construct a wrapper: */
+    newobj = (*ctor)(ptr);
+    if (!newobj) {
+	return NULL;
+    }
+
+    /* (the constructor may return something other than a wrapper,
+       e.g. None for a NULL pointer; these aren't cached): */
+    if (is_wrapper(newobj)) {
+        if (wrapper_cache_insert(cache, ptr, (struct PyGccWrapper*)newobj)) {
+            Py_DECREF(newobj);
+            return NULL;
+        }
+    }
+
+    return newobj;
+}
+
+/*
+  Add a wrapper object that was created by other means (e.g. a gcc.Pass
+  subclass instance created by a script) into the table.  Such objects are
+  kept alive for the rest of the compilation, since GCC will look them up
+  again by pointer
+*/
+int
+PyGcc_insert_new_wrapper_into_cache(PyGccWrapperCache *cache,
+                                         void *ptr,
+                                         PyObject *obj)
+{
+    assert(cache);
+    assert(ptr);
+    assert(obj);
+    assert(is_wrapper(obj));
+
+    if (wrapper_cache_insert(cache, ptr, (struct PyGccWrapper*)obj)) {
+        return -1;
+    }
+    Py_INCREF(obj);
+    return 0;
+}
+
+/*
+  Shrink any tables that consist mostly of dead slots (e.g. after a pass
+  that looked at many trees, without keeping the wrappers).  Called after
+  each pass
+*/
+void
+PyGcc_wrapper_caches_sweep(void)
+{
+    PyGccWrapperCache *cache;
+
+    for (cache = all_wrapper_caches; cache; cache = cache->next) {
+        if (cache->dead > cache->live
+            && cache->size > WRAPPER_CACHE_MIN_SIZE) {
+            if (wrapper_cache_resize(cache, cache->live)) {
+                /* (the old table is still usable) */
+                PyErr_Clear();
+            }
+        }
+    }
+}
+
+PyObject *
+PyGcc__sweep_wrapper_caches(PyObject *self, PyObject *args)
+{
+    PyGcc_wrapper_caches_sweep();
+    Py_RETURN_NONE;
+}
+
 PyGccWrapper *
 _PyGccWrapper_New(PyGccWrapperTypeObject *typeobj)
 {
@@ -215,6 +491,8 @@ _PyGccWrapper_New(PyGccWrapperTypeObject *typeobj)
 extern void
 PyGccWrapper_Track(struct PyGccWrapper *obj)
 {
+    struct PyGccWrapper *list;
+
     assert(obj);
     assert(sentinel.wr_next);
     assert(sentinel.wr_prev);
@@ -231,12 +509,25 @@ PyGccWrapper_Track(struct PyGccWrapper *obj)
       PyGccWrapper_Dealloc or subtype_dealloc
      */
 
-    /* Add to end of list, immediately before sentinel: */
-    assert(sentinel.wr_prev->wr_next == &sentinel);
-    sentinel.wr_prev->wr_next = obj;
-    obj->wr_prev = sentinel.wr_prev;
-    obj->wr_next = &sentinel;
-    sentinel.wr_prev = obj;
+    /* Not yet within a PyGccWrapperCache: */
+    obj->wr_cache = NULL;
+    obj->wr_cache_key = NULL;
+
+    /* Only wrappers of GC-managed objects need to be walked when marking: */
+    if (((PyGccWrapperTypeObject*)Py_TYPE(obj))->wrtp_mark) {
+        list = &sentinel;
+        wrapper_stats.num_marked++;
+    } else {
+        list = &unmarked_sentinel;
+        wrapper_stats.num_unmarked++;
+    }
+
+    /* Add to end of list, immediately before its sentinel: */
+    assert(list->wr_prev->wr_next == list);
+    list->wr_prev->wr_next = obj;
+    obj->wr_prev = list->wr_prev;
+    obj->wr_next = list;
+    list->wr_prev = obj;
 
     assert(obj->wr_prev);
     assert(obj->wr_next);
@@ -252,6 +543,10 @@ PyGcc_wrapper_untrack(struct PyGccWrapper *obj)
     assert(obj);
     assert(Py_REFCNT(obj) == 0);
 
+    if (obj->wr_cache) {
+        wrapper_cache_remove(obj);
+    }
+
     /*
       Remove from the linked list if it's within it
 
@@ -264,6 +559,12 @@ PyGcc_wrapper_untrack(struct PyGccWrapper *obj)
         assert(sentinel.wr_prev);
         assert(obj->wr_next);
 
+        if (((PyGccWrapperTypeObject*)Py_TYPE(obj))->wrtp_mark) {
+            wrapper_stats.num_marked--;
+        } else {
+            wrapper_stats.num_unmarked--;
+        }
+
         /* Remove from linked list: */
         obj->wr_prev->wr_next = obj->wr_next;
         obj->wr_next->wr_prev = obj->wr_prev;
@@ -291,11 +592,11 @@ my_walker(void *arg ATTRIBUTE_UNUSED)
     /*
       Callback for use by GCC's garbage collector when marking
 
-      Walk all the PyGccWrapper objects here and if they reference
-      GCC GC objects, mark the underlying GCC objects so that they
-      don't get swept
+      Walk all the PyGccWrapper objects that reference GCC GC objects,
+      marking the underlying GCC objects so that they don't get swept
     */
     struct PyGccWrapper *iter;
+    Py_ssize_t count = 0;
 
     if (debug_PyGcc_wrapper) {
         printf("  walking the live PyGccWrapper objects\n");
@@ -310,7 +611,11 @@ my_walker(void *arg ATTRIBUTE_UNUSED)
         wrtp_mark = ((PyGccWrapperTypeObject*)Py_TYPE(iter))->wrtp_mark;
         assert(wrtp_mark);
         wrtp_mark(iter);
+        count++;
     }
+    wrapper_stats.num_walks++;
+    wrapper_stats.total_marked += count;
+    wrapper_stats.last_marked = count;
     if (debug_PyGcc_wrapper) {
         printf("  finished walking the live PyGccWrapper objects\n");
     }
@@ -347,6 +652,32 @@ PyGcc__force_garbage_collection(PyObject *self, PyObject *args)
     Py_RETURN_NONE;
 }
 
+/*
+  Get a dict of counters describing the live wrappers, and the cost of
+  marking them
+*/
+PyObject *
+PyGcc__get_wrapper_stats(PyObject *self, PyObject *args)
+{
+    PyGccWrapperCache *cache;
+    Py_ssize_t cached = 0;
+    Py_ssize_t cache_slots = 0;
+
+    for (cache = all_wrapper_caches; cache; cache = cache->next) {
+        cached += cache->live;
+        cache_slots += cache->size;
+    }
+
+    return Py_BuildValue("{s:n, s:n, s:n, s:n, s:n, s:n, s:n}",
+                         "marked_wrappers", wrapper_stats.num_marked,
+                         "unmarked_wrappers", wrapper_stats.num_unmarked,
+                         "gc_walks", wrapper_stats.num_walks,
+                         "total_marked", wrapper_stats.total_marked,
+                         "last_marked", wrapper_stats.last_marked,
+                         "cached_wrappers", cached,
+                         "cache_slots", cache_slots);
+}
+
 #define MY_ASSERT(condition) \
     if (!(condition)) { \
          PyErr_SetString(PyExc_AssertionError, #condition); \
@@ -187,6 +187,29 @@ PyGccCfg_get_basic_blocks(PyGccCfg *self, void *closure);
 PyObject *
 PyGccCfg_get_block_for_label(PyObject *self, PyObject *args);
 
+void
+PyGccBasicBlock_dealloc(PyObject *obj);
+
+void
+PyGccCfg_dealloc(PyObject *obj);
+
+/*
+  The flags for each edge within the result of PyGcc_export_cfg, exposed to
+  Python as gcc.EDGE_TRUE_VALUE etc; these mirror the attributes of gcc.Edge
+  (rather than GCC's own edge flags, which vary between versions):
+*/
+enum {
+    PYGCC_EDGE_TRUE_VALUE = (1 << 0),
+    PYGCC_EDGE_FALSE_VALUE = (1 << 1),
+    PYGCC_EDGE_LOOP_EXIT = (1 << 2),
+    PYGCC_EDGE_CAN_FALLTHRU = (1 << 3),
+    PYGCC_EDGE_COMPLEX = (1 << 4),
+    PYGCC_EDGE_EH = (1 << 5)
+};
+
+PyObject *
+PyGcc_export_cfg(gcc_cfg cfg);
+
 /* autogenerated-tree.c: */
 
 /* return -1 if there isn't an enum tree_code associated with this type */
@@ -256,6 +279,9 @@ PyGccFunction_hash(struct PyGccFunction * self);
 PyObject *
 PyGccFunction_richcompare(PyObject *o1, PyObject *o2, int op);
 
+PyObject *
+PyGccFunction_export_cfg(PyObject *self, PyObject *args);
+
 PyObject *
 PyGccArrayRef_repr(PyObject *self);
 
@@ -392,6 +418,9 @@ PyGccGimple_richcompare(PyObject *o1, PyObject *o2, int op);
 PyObject *
 PyGccGimple_walk_tree(struct PyGccGimple * self, PyObject *args, PyObject *kwargs);
 
+PyObject *
+PyGccGimple_iter_tree(struct PyGccGimple * self, PyObject *args, PyObject *kwargs);
+
 PyObject *
 PyGccGimple_get_rhs(struct PyGccGimple *self, void *closure);
 
@@ -535,6 +564,12 @@ PyGcc__force_garbage_collection(PyObject *self, PyObject *args);
 PyObject *
 PyGcc__gc_selftest(PyObject *self, PyObject *args);
 
+PyObject *
+PyGcc__sweep_wrapper_caches(PyObject *self, PyObject *args);
+
+PyObject *
+PyGcc__get_wrapper_stats(PyObject *self, PyObject *args);
+
 /*
   PEP-7
 Local variables:
@@ -507,6 +507,12 @@ static PyMethodDef GccMethods[] = {
     {"_gc_selftest", PyGcc__gc_selftest, METH_NOARGS,
      "Run a garbage-collection selftest"},
 
+    {"_sweep_wrapper_caches", PyGcc__sweep_wrapper_caches, METH_NOARGS,
+     "Shrink the tables of wrapper objects that consist mostly of wrappers that have been deallocated"},
+
+    {"_get_wrapper_stats", PyGcc__get_wrapper_stats, METH_NOARGS,
+     "Get a dict of counters describing the live wrapper objects, and the cost of marking them for GCC's garbage collector"},
+
     /* Sentinel: */
     {NULL, NULL, 0, NULL}
 };
@@ -761,6 +767,19 @@ on_plugin_finish(void *gcc_data, void *user_data)
     Py_Finalize();
 }
 
+/*
+  Wired up to PLUGIN_PASS_EXECUTION:
+*/
+static void
+on_pass_execution(void *gcc_data, void *user_data)
+{
+    PyGILState_STATE gstate;
+
+    gstate = PyGILState_Ensure();
+    PyGcc_wrapper_caches_sweep();
+    PyGILState_Release(gstate);
+}
+
 extern int
 plugin_init (struct plugin_name_args *plugin_info,
              struct plugin_gcc_version *version) __attribute__((nonnull));
@@ -847,6 +866,10 @@ plugin_init (struct plugin_name_args *plugin_info,
     register_callback(plugin_info->base_name, PLUGIN_FINISH,
                       on_plugin_finish, NULL);
 
+    /* Shrink the tables of wrapper objects after each pass: */
+    register_callback(plugin_info->base_name, PLUGIN_PASS_EXECUTION,
+                      on_pass_execution, NULL);
+
     PyGcc_run_any_command();
     PyGcc_run_any_script();
 
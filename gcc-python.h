@@ -98,8 +98,46 @@ typedef struct PyGccWrapper
      */
      struct PyGccWrapper *wr_prev;
      struct PyGccWrapper *wr_next;
+
+     /*
+       The PyGccWrapperCache (if any) that this wrapper is within, and the
+       pointer it's keyed on there, so that it can remove itself when it's
+       deallocated:
+     */
+     struct PyGccWrapperCache *wr_cache;
+     void *wr_cache_key;
 } PyGccWrapper;
 
+/*
+  A table mapping from pointers to the live wrapper objects for them,
+  ensuring that there's at most one wrapper per pointer.  This is an
+  open-addressing hash table keyed directly on the pointer.
+
+  The table doesn't own references to the wrappers: a wrapper removes itself
+  from its table when it's deallocated, leaving a "dead" slot.  Dead slots are
+  dropped whenever the table is resized, and tables consisting mostly of dead
+  slots are shrunk after each pass (see PyGcc_wrapper_caches_sweep).
+
+  Instances are expected to be statically allocated, and hence zero-filled
+  when first used.
+*/
+typedef struct PyGccWrapperCacheEntry
+{
+    void *ptr;
+    struct PyGccWrapper *obj; /* NULL if the slot is empty */
+} PyGccWrapperCacheEntry;
+
+typedef struct PyGccWrapperCache
+{
+    PyGccWrapperCacheEntry *entries;
+    size_t size; /* number of slots: zero, or a power of two */
+    size_t live; /* number of slots holding a wrapper */
+    size_t dead; /* number of slots whose wrapper was deallocated */
+
+    /* Linked list of all tables that have been used, for sweeping: */
+    struct PyGccWrapperCache *next;
+} PyGccWrapperCache;
+
 /*
   PyTypeObject subclass for PyGccWrapper, adding a GC-marking callback:
  */
@@ -219,15 +257,56 @@ DECLARE_SIMPLE_WRAPPER(PyGccEdge,
 		       edge,
 		       gcc_cfg_edge, e)
 
-DECLARE_SIMPLE_WRAPPER(PyGccBasicBlock, 
-		       PyGccBasicBlock_TypeObj,
-		       basic_block,
-		       gcc_cfg_block, bb)
+/*
+  A sequence-valued attribute of a gcc.BasicBlock or gcc.Cfg, cached as a
+  tuple within the wrapper.  It's only valid whilst "generation" is the
+  current generation of the CFGs: this is advanced whenever control returns
+  to Python from GCC, which could have changed them in the meantime (see
+  PyGcc_invalidate_cfg_caches)
+*/
+typedef struct PyGccCachedSequence
+{
+    PyObject *tuple;
+    unsigned long generation;
+} PyGccCachedSequence;
+
+struct PyGccBasicBlock {
+    struct PyGccWrapper head;
+    gcc_cfg_block bb;
+
+    PyGccCachedSequence preds;
+    PyGccCachedSequence succs;
+    PyGccCachedSequence gimple;
+};
 
-DECLARE_SIMPLE_WRAPPER(PyGccCfg, 
-		       PyGccCfg_TypeObj,
-		       cfg,
-                       gcc_cfg, cfg)
+typedef struct PyGccBasicBlock PyGccBasicBlock;
+
+extern PyObject *
+PyGccBasicBlock_New(gcc_cfg_block bb);
+
+extern PyGccWrapperTypeObject PyGccBasicBlock_TypeObj
+  CPYCHECKER_TYPE_OBJECT_FOR_TYPEDEF("PyGccBasicBlock");
+
+extern void
+PyGcc_WrtpMarkForPyGccBasicBlock(PyGccBasicBlock *wrapper);
+
+struct PyGccCfg {
+    struct PyGccWrapper head;
+    gcc_cfg cfg;
+
+    PyGccCachedSequence basic_blocks;
+};
+
+typedef struct PyGccCfg PyGccCfg;
+
+extern PyObject *
+PyGccCfg_New(gcc_cfg cfg);
+
+extern PyGccWrapperTypeObject PyGccCfg_TypeObj
+  CPYCHECKER_TYPE_OBJECT_FOR_TYPEDEF("PyGccCfg");
+
+extern void
+PyGcc_WrtpMarkForPyGccCfg(PyGccCfg *wrapper);
 
 DECLARE_SIMPLE_WRAPPER(PyGccFunction, 
 		       PyGccFunction_TypeObj,
@@ -323,6 +402,9 @@ PyGcc_autogenerated_tree_type_for_tree(gcc_tree t, int borrow_ref);
 PyGccWrapperTypeObject*
 PyGcc_autogenerated_tree_type_for_tree_code(enum tree_code code, int borrow_ref);
 
+/* The number of tree codes that have a wrapper type: */
+extern const int PyGcc_autogenerated_num_tree_codes;
+
 extern PyGccWrapperTypeObject PyGccComponentRef_TypeObj;
 
 /* autogenerated-variable.c */
@@ -360,14 +442,20 @@ PyGcc_int_from_double_int(double_int di, bool is_unsigned);
 #endif
 
 PyObject *
-PyGcc_LazilyCreateWrapper(PyObject **cache,
+PyGcc_LazilyCreateWrapper(PyGccWrapperCache *cache,
 				 void *ptr,
 				 PyObject *(*ctor)(void *ptr));
 int
-PyGcc_insert_new_wrapper_into_cache(PyObject **cache,
+PyGcc_insert_new_wrapper_into_cache(PyGccWrapperCache *cache,
                                          void *ptr,
                                          PyObject *obj);
 
+void
+PyGcc_wrapper_caches_sweep(void);
+
+void
+PyGcc_invalidate_cfg_caches(void);
+
 
 /* gcc-python.c */
 int PyGcc_IsWithinEvent(enum plugin_event *out_event);
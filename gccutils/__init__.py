@@ -33,18 +33,92 @@ def get_field_by_name(typeobj, name):
         if field.name == name:
             return field
 
+class GlobalDeclIndex(object):
+    """
+    An index of the TypeDecl and VarDecl instances at global scope within the
+    translation units, by name, so that looking one up doesn't need to scan
+    through all of the declarations (which for a header as large as Python.h
+    is thousands of them).
+
+    For C++, lookups are delegated to the global namespace.
+    """
+    __slots__ = ('typedefs', 'vardecls',
+                 'cplusplus_typedefs', 'cplusplus_vardecls')
+
+    def __init__(self):
+        # Mappings from name to the first decl with that name:
+        self.typedefs = {}
+        self.vardecls = {}
+
+        # Should lookups that aren't in the above fall back to the global
+        # namespace?  (set once we see a C++ translation unit, at which point
+        # we stop indexing, matching the order of the original linear
+        # scans)
+        self.cplusplus_typedefs = False
+        self.cplusplus_vardecls = False
+
+        for u in gcc.get_translation_units():
+            if not self.cplusplus_typedefs:
+                if u.language.startswith('GNU C++'):
+                    self.cplusplus_typedefs = True
+                elif u.block:
+                    self._add_decls(u.block.vars, gcc.TypeDecl, self.typedefs)
+            if not self.cplusplus_vardecls:
+                if u.language == 'GNU C++':
+                    self.cplusplus_vardecls = True
+                else:
+                    self._add_decls(u.block.vars, gcc.VarDecl, self.vardecls)
+
+    def _add_decls(self, decls, kind, result):
+        for v in decls:
+            if isinstance(v, kind):
+                if v.name not in result:
+                    result[v.name] = v
+
+    def lookup_typedef(self, name):
+        if name in self.typedefs:
+            return self.typedefs[name]
+        if self.cplusplus_typedefs:
+            return gcc.get_global_namespace().lookup(name)
+
+    def lookup_vardecl(self, name):
+        if name in self.vardecls:
+            return self.vardecls[name]
+        if self.cplusplus_vardecls:
+            return gcc.get_global_namespace().lookup(name)
+
+# The GlobalDeclIndex for the current compilation, built on demand, and
+# discarded whenever more declarations could have been added:
+_global_decl_index = None
+
+# Have the callbacks for discarding it been registered?  (This is done when
+# it's first used, rather than on import, so that merely importing gccutils
+# doesn't add a callback for every declaration that GCC parses):
+_registered_invalidation = False
+
+def get_global_decl_index():
+    global _global_decl_index
+    global _registered_invalidation
+    if not _registered_invalidation:
+        gcc.register_callback(gcc.PLUGIN_FINISH_UNIT,
+                              invalidate_global_decl_index)
+        # PLUGIN_FINISH_DECL is only available in GCC 4.7 onwards:
+        if hasattr(gcc, 'PLUGIN_FINISH_DECL'):
+            gcc.register_callback(gcc.PLUGIN_FINISH_DECL,
+                                  invalidate_global_decl_index)
+        _registered_invalidation = True
+    if _global_decl_index is None:
+        _global_decl_index = GlobalDeclIndex()
+    return _global_decl_index
+
+def invalidate_global_decl_index(*args):
+    global _global_decl_index
+    _global_decl_index = None
+
 def get_global_typedef(name):
     # Look up a typedef in global scope by name, returning a gcc.TypeDecl,
     # or None if not found
-    for u in gcc.get_translation_units():
-        if u.language.startswith('GNU C++'):
-            gns = gcc.get_global_namespace()
-            return gns.lookup(name)
-        if u.block:
-            for v in u.block.vars:
-                if isinstance(v, gcc.TypeDecl):
-                    if v.name == name:
-                        return v
+    return get_global_decl_index().lookup_typedef(name)
 
 def get_variables_as_dict():
     result = {}
@@ -55,14 +129,7 @@ def get_variables_as_dict():
 def get_global_vardecl_by_name(name):
     # Look up a variable in global scope by name, returning a gcc.VarDecl,
     # or None if not found
-    for u in gcc.get_translation_units():
-        if u.language == 'GNU C++':
-            gns = gcc.get_global_namespace()
-            return gns.lookup(name)
-        for v in u.block.vars:
-            if isinstance(v, gcc.VarDecl):
-                if v.name == name:
-                    return v
+    return get_global_decl_index().lookup_vardecl(name)
 
 def get_nonnull_arguments(funtype):
     """
@@ -371,7 +438,7 @@ class CfgPrettyPrinter(DotPrettyPrinter):
         if isinstance(bb.phi_nodes, list):
             for stmtidx, phi in enumerate(bb.phi_nodes):
                 result += '<tr><td></td>' + self.stmt_to_html(phi, stmtidx) + '</tr>\n'
-        if isinstance(bb.gimple, list) and bb.gimple != []:
+        if isinstance(bb.gimple, (list, tuple)) and bb.gimple:
             for stmtidx, stmt in enumerate(bb.gimple):
                 if curloc != stmt.loc:
                     curloc = stmt.loc
@@ -638,13 +705,20 @@ def callgraph_to_dot():
     pp = CallgraphPrettyPrinter()
     return pp.to_dot()
 
+# Are the runtime self-checks (check_isinstance, and the verification of
+# each State by the refcount checker) enabled?  These are useful when
+# developing the checker, but are pure overhead on a working checker:
+self_checks = True
+
 def check_isinstance(obj, types):
     """
     Like:
        assert isinstance(obj, types)
     but with better error messages
+
+    This does nothing if self_checks is False.
     """
-    if not isinstance(obj, types):
+    if self_checks and not isinstance(obj, types):
         raise TypeError('%s / %r is not an instance of %s' % (obj, obj, types))
 
 def sorted_callgraph():
@@ -31,7 +31,6 @@ class StmtGraph(Graph):
                  'entry_of_bb',
                  'exit_of_bb',
                  'node_for_stmt',
-                 '__lastnode',
                  'supernode_for_stmtnode')
 
     def __init__(self, fun, split_phi_nodes, omit_complex_edges=False):
@@ -58,86 +57,92 @@ class StmtGraph(Graph):
         self.exit_of_bb = {}
         self.node_for_stmt = {}
 
-        basic_blocks = fun.cfg.basic_blocks
+        # Get the whole CFG in one call, rather than going back into C for
+        # each block, statement and edge:
+        exported = fun.export_cfg()
+        blocks = exported['blocks']
+        stmts = exported['stmts']
+        stmt_starts = exported['stmt_starts']
+        phis = exported['phis']
+        phi_starts = exported['phi_starts']
+        entry_pos = exported['entry']
+        exit_pos = exported['exit']
 
         # 1st pass: create nodes and edges within BBs:
-        for bb in basic_blocks:
-            self.__lastnode = None
-
-            def add_stmt(stmt):
-                nextnode = self.add_node(StmtNode(fun, bb, stmt))
-                self.node_for_stmt[stmt] = nextnode
-                if self.__lastnode:
-                    self.add_edge(self.__lastnode, nextnode, None)
-                else:
-                    self.entry_of_bb[bb] = nextnode
-                self.__lastnode = nextnode
-
-            if bb.phi_nodes and not split_phi_nodes:
+        for i, bb in enumerate(blocks):
+            lastnode = None
+            bbstmts = stmts[stmt_starts[i]:stmt_starts[i + 1]]
+            if split_phi_nodes:
+                bbphis = ()
+            else:
                 # If we're not splitting the phi nodes, add them to the top
                 # of each BB:
-                for stmt in bb.phi_nodes:
-                    add_stmt(stmt)
-                self.exit_of_bb[bb] = self.__lastnode
-            if bb.gimple:
-                for stmt in bb.gimple:
-                    add_stmt(stmt)
-                self.exit_of_bb[bb] = self.__lastnode
-
-            if self.__lastnode is None:
+                bbphis = phis[phi_starts[i]:phi_starts[i + 1]]
+
+            for stmts_of_kind in (bbphis, bbstmts):
+                for stmt in stmts_of_kind:
+                    nextnode = self.add_node(StmtNode(fun, bb, stmt))
+                    self.node_for_stmt[stmt] = nextnode
+                    if lastnode:
+                        self.add_edge(lastnode, nextnode, None)
+                    else:
+                        self.entry_of_bb[bb] = nextnode
+                    lastnode = nextnode
+
+            if lastnode is None:
                 # We have a BB with neither statements nor phis
                 # Create a single node for this BB:
-                if bb == fun.cfg.entry:
+                if i == entry_pos:
                     cls = EntryNode
-                elif bb == fun.cfg.exit:
+                elif i == exit_pos:
                     cls = ExitNode
                 else:
                     # gcc appears to create empty BBs for functions
                     # returning void that contain multiple "return;"
                     # statements:
                     cls = StmtNode
-                node = self.add_node(cls(fun, bb, None))
-                self.entry_of_bb[bb] = node
-                self.exit_of_bb[bb] = node
-                if bb == fun.cfg.entry:
-                    self.entry = node
-                elif bb == fun.cfg.exit:
-                    self.exit = node
-
-            assert self.entry_of_bb[bb] is not None
-            assert self.exit_of_bb[bb] is not None
+                lastnode = self.add_node(cls(fun, bb, None))
+                self.entry_of_bb[bb] = lastnode
+                if i == entry_pos:
+                    self.entry = lastnode
+                elif i == exit_pos:
+                    self.exit = lastnode
+            self.exit_of_bb[bb] = lastnode
 
         # 2nd pass: wire up the cross-BB edges:
-        for bb in basic_blocks:
-            for edge in bb.succs:
-
-                # If requested, omit "complex" edges e.g. due to
-                # exception-handling:
-                if omit_complex_edges:
-                    if edge.complex:
-                        continue
-
-                last_node = self.exit_of_bb[bb]
-                if split_phi_nodes:
-                    # add SplitPhiNode instances at the end of each edge
-                    # as a copy of each phi node, specialized for this edge
-                    if edge.dest.phi_nodes:
-                        for stmt in edge.dest.phi_nodes:
-                            split_phi = self.add_node(SplitPhiNode(fun, stmt, edge))
-                            self.add_edge(last_node,
-                                          split_phi,
-                                          edge)
-                            last_node = split_phi
-
-                # After optimization, the CFG sometimes contains edges that
-                # point to blocks that are no longer within fun.cfg.basic_blocks
-                # Skip them:
-                if edge.dest not in basic_blocks:
+        for (src, dst, flags), edge in zip(exported['edges'],
+                                           exported['cfg_edges']):
+
+            # If requested, omit "complex" edges e.g. due to
+            # exception-handling:
+            if omit_complex_edges:
+                if flags & gcc.EDGE_COMPLEX:
                     continue
 
-                self.add_edge(last_node,
-                              self.entry_of_bb[edge.dest],
-                              edge)
+            last_node = self.exit_of_bb[blocks[src]]
+            if split_phi_nodes:
+                # add SplitPhiNode instances at the end of each edge
+                # as a copy of each phi node, specialized for this edge
+                if dst >= 0:
+                    dstphis = phis[phi_starts[dst]:phi_starts[dst + 1]]
+                else:
+                    dstphis = edge.dest.phi_nodes
+                for stmt in dstphis:
+                    split_phi = self.add_node(SplitPhiNode(fun, stmt, edge))
+                    self.add_edge(last_node,
+                                  split_phi,
+                                  edge)
+                    last_node = split_phi
+
+            # After optimization, the CFG sometimes contains edges that
+            # point to blocks that are no longer within fun.cfg.basic_blocks
+            # (export_cfg gives these a dst of -1).  Skip them:
+            if dst < 0:
+                continue
+
+            self.add_edge(last_node,
+                          self.entry_of_bb[blocks[dst]],
+                          edge)
 
         # 3rd pass: set up caselabelexprs for edges within switch statements
         # There doesn't seem to be any direct association between edges in a
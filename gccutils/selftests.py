@@ -21,6 +21,13 @@
 # the plugin we're typically effectively being run as a callback from gcc
 # (either literally, or as a gcc.Pass)
 
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import gcc
+
 def assertEqual(lhs, rhs):
     if lhs != rhs:
         raise ValueError('non-equal values: %r != %r' % (lhs, rhs))
@@ -28,3 +35,71 @@ def assertEqual(lhs, rhs):
 def assertEndsWith(s, suffix):
     if not s.endswith(suffix):
         raise ValueError('%r does not end with %r' % (s, suffix))
+
+def run_on_pass(passname, callback):
+    """
+    Call callback with the gcc.Function (or None, for a whole-program pass)
+    each time the pass with the given name is executed
+    """
+    def on_pass_execution(optpass, fun):
+        if optpass.name == passname:
+            callback(fun)
+    gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION, on_pass_execution)
+
+def run_on_each_function(callback, passname='*warn_function_return'):
+    """
+    Call callback with each gcc.Function in turn, as the given pass is
+    executed on it (by default, that which the refcount checker runs before,
+    at which point the CFG is available, but not yet in SSA form)
+    """
+    def on_function(fun):
+        if fun:
+            callback(fun)
+    run_on_pass(passname, on_function)
+
+def run_on_whole_unit(callback):
+    """
+    Call callback (with no arguments) once every function within the
+    translation unit has been seen by the per-function passes
+    """
+    run_on_pass('*free_lang_data', lambda fun: callback())
+
+@contextmanager
+def temporary_directory():
+    """
+    Context manager giving the path of a new directory, which is deleted
+    (with its contents) afterwards
+    """
+    path = tempfile.mkdtemp()
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path)
+
+@contextmanager
+def environment_variable(name, value):
+    """
+    Context manager setting an environment variable, restoring its old value
+    (or lack of one) afterwards
+    """
+    old = os.environ.get(name)
+    os.environ[name] = value
+    try:
+        yield
+    finally:
+        if old is None:
+            del os.environ[name]
+        else:
+            os.environ[name] = old
+
+@contextmanager
+def removing_file(filename):
+    """
+    Context manager deleting the given file (if it exists) afterwards, for
+    tests of code that writes files alongside the output
+    """
+    try:
+        yield filename
+    finally:
+        if os.path.exists(filename):
+            os.unlink(filename)
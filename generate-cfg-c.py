@@ -93,15 +93,15 @@ def generate_basic_block():
                                    [PyGetSetDef('preds',
                                                 'PyGccBasicBlock_get_preds',
                                                 None,
-                                                'The list of predecessor gcc.Edge instances leading into this block'),
+                                                'The tuple of predecessor gcc.Edge instances leading into this block'),
                                     PyGetSetDef('succs',
                                                 'PyGccBasicBlock_get_succs',
                                                 None,
-                                                'The list of successor gcc.Edge instances leading out of this block'),
+                                                'The tuple of successor gcc.Edge instances leading out of this block'),
                                     PyGetSetDef('gimple',
                                                 'PyGccBasicBlock_get_gimple',
                                                 None,
-                                                'The list of gcc.Gimple instructions, if appropriate for this pass, or None'),
+                                                'The tuple of gcc.Gimple instructions, if appropriate for this pass, or None'),
                                     PyGetSetDef('phi_nodes',
                                                 'PyGccBasicBlock_get_phi_nodes',
                                                 None,
@@ -122,7 +122,7 @@ def generate_basic_block():
     pytype = PyGccWrapperTypeObject(identifier = 'PyGccBasicBlock_TypeObj',
                           localname = 'BasicBlock',
                           tp_name = 'gcc.BasicBlock',
-                          tp_dealloc = 'PyGccWrapper_Dealloc',
+                          tp_dealloc = 'PyGccBasicBlock_dealloc',
                           struct_name = 'PyGccBasicBlock',
                           tp_new = 'PyType_GenericNew',
                           tp_repr = '(reprfunc)PyGccBasicBlock_repr',
@@ -146,7 +146,7 @@ def generate_cfg():
                                    [PyGetSetDef('basic_blocks',
                                                 'PyGccCfg_get_basic_blocks',
                                                 None,
-                                                'The list of gcc.BasicBlock instances in this graph'),
+                                                'The tuple of gcc.BasicBlock instances in this graph'),
                                     PyGetSetDef('entry',
                                                 cu.add_simple_getter('PyGccCfg_get_entry',
                                                                      'PyGccCfg',
@@ -164,7 +164,7 @@ def generate_cfg():
     pytype = PyGccWrapperTypeObject(identifier = 'PyGccCfg_TypeObj',
                           localname = 'Cfg',
                           tp_name = 'gcc.Cfg',
-                          tp_dealloc = 'PyGccWrapper_Dealloc',
+                          tp_dealloc = 'PyGccCfg_dealloc',
                           struct_name = 'PyGccCfg',
                           tp_new = 'PyType_GenericNew',
                           #tp_repr = '(reprfunc)PyGccCfg_repr',
@@ -185,6 +185,12 @@ def generate_cfg():
 
 generate_cfg()
 
+# The flags used by gcc.Function.export_cfg():
+for flag in ('TRUE_VALUE', 'FALSE_VALUE', 'LOOP_EXIT', 'CAN_FALLTHRU',
+             'COMPLEX', 'EH'):
+    modinit_postinit += ('    PyModule_AddIntConstant(m, "EDGE_%s", PYGCC_EDGE_%s);\n'
+                         % (flag, flag))
+
 cu.add_defn("""
 int autogenerated_cfg_init_types(void)
 {
@@ -71,6 +71,14 @@ def generate_function():
                                   'Location of the end of the function')
     cu.add_defn(getsettable.c_defn())
 
+    methods = PyMethodTable('PyGccFunction_methods', [])
+    methods.add_method('export_cfg',
+                       'PyGccFunction_export_cfg',
+                       'METH_NOARGS',
+                       "Get the whole of the control flow graph of this function in one call,"
+                       " as a dict of tuples (or None for early passes)")
+    cu.add_defn(methods.c_defn())
+
     pytype = PyGccWrapperTypeObject(identifier = 'PyGccFunction_TypeObj',
                           localname = 'Function',
                           tp_name = 'gcc.Function',
@@ -82,6 +90,7 @@ def generate_function():
                           tp_hash = '(hashfunc)PyGccFunction_hash',
                           tp_richcompare = 'PyGccFunction_richcompare',
                           tp_getset = getsettable.identifier,
+                          tp_methods = methods.identifier,
                                     )
     cu.add_defn(pytype.c_defn())
     modinit_preinit += pytype.c_invoke_type_ready()
@@ -238,6 +238,10 @@ PyGccGimple_get_block(struct PyGccGimple *self, void *closure)
                        '(PyCFunction)PyGccGimple_walk_tree',
                        'METH_VARARGS | METH_KEYWORDS',
                        "Visit all gcc.Tree nodes associated with this statement")
+    methods.add_method('iter_tree',
+                       '(PyCFunction)PyGccGimple_iter_tree',
+                       'METH_VARARGS | METH_KEYWORDS',
+                       "Get an iterator over all gcc.Tree nodes associated with this statement")
     cu.add_defn(methods.c_defn())
     pytype.tp_methods = methods.identifier
 
@@ -122,7 +122,8 @@ PyGccLocation_get_finish(struct PyGccLocation *self, void *closure)
                           tp_str = '(reprfunc)PyGccLocation_str',
                           tp_methods = methods.identifier,
                           tp_richcompare = 'PyGccLocation_richcompare',
-                          tp_dealloc = 'PyGccWrapper_Dealloc')
+                          tp_dealloc = 'PyGccWrapper_Dealloc',
+                          wraps_gc_object = False)
     cu.add_defn(pytype.c_defn())
     modinit_preinit += pytype.c_invoke_type_ready()
     modinit_postinit += pytype.c_invoke_add_to_module()
@@ -159,7 +160,8 @@ def generate_rich_location():
                           #tp_str = '(reprfunc)PyGccRichLocation_str',
                           tp_methods = methods.identifier,
                           #tp_richcompare = 'PyGccRichLocation_richcompare',
-                          tp_dealloc = 'PyGccWrapper_Dealloc')
+                          tp_dealloc = 'PyGccWrapper_Dealloc',
+                          wraps_gc_object = False)
     cu.add_defn(pytype.c_defn())
     modinit_preinit += pytype.c_invoke_type_ready()
     modinit_postinit += pytype.c_invoke_add_to_module()
@@ -78,6 +78,7 @@ def generate_option():
                           tp_repr = '(reprfunc)PyGccOption_repr',
                           #tp_str = '(reprfunc)PyGccOption_str',
                           #tp_richcompare = 'PyGccOption_richcompare'
+                          wraps_gc_object = False,
                           )
     cu.add_defn(pytype.c_defn())
     modinit_preinit += pytype.c_invoke_type_ready()
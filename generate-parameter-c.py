@@ -86,6 +86,7 @@ def generate_param():
                           tp_getset = getsettable.identifier,
                           #tp_repr = '(reprfunc)PyGccParameter_repr',
                           #tp_str = '(reprfunc)PyGccParameter_str',
+                          wraps_gc_object = False,
                           )
     cu.add_defn(pytype.c_defn())
     modinit_preinit += pytype.c_invoke_type_ready()
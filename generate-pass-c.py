@@ -99,6 +99,7 @@ def generate_pass():
                           tp_str = '(reprfunc)PyGccPass_repr',
                           tp_methods = methods.identifier,
                           tp_flags = '(Py_TPFLAGS_DEFAULT|Py_TPFLAGS_BASETYPE)',
+                          wraps_gc_object = False,
                           )
     cu.add_defn(pytype.c_defn())
     modinit_preinit += pytype.c_invoke_type_ready()
@@ -121,7 +122,8 @@ def generate_pass_subclasses():
                               tp_new = 'PyType_GenericNew',
                               tp_init = 'PyGcc%s_init' % cc,
                               tp_base = '&PyGccPass_TypeObj',
-                              tp_flags = '(Py_TPFLAGS_DEFAULT|Py_TPFLAGS_BASETYPE)'
+                              tp_flags = '(Py_TPFLAGS_DEFAULT|Py_TPFLAGS_BASETYPE)',
+                              wraps_gc_object = False,
                               )
         cu.add_defn(pytype.c_defn())
         modinit_preinit += pytype.c_invoke_type_ready()
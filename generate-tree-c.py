@@ -646,6 +646,10 @@ def generate_tree_code_classes():
     for tree_type in tree_types:
         cu.add_defn('    &PyGcc%s_TypeObj, /* %s */\n' % (tree_type.camel_cased_string(), tree_type.SYM))
     cu.add_defn('};\n\n')
+    # (this can be less than MAX_TREE_CODES, since that also counts
+    # LAST_AND_UNUSED_TREE_CODE):
+    cu.add_defn('const int PyGcc_autogenerated_num_tree_codes =\n'
+                '    sizeof(pytype_for_tree_code) / sizeof(pytype_for_tree_code[0]);\n\n')
 
     cu.add_defn('\n/* Map from PyGccWrapperTypeObject* to GCC tree codes*/\n')
     cu.add_defn('int \n')
@@ -667,7 +671,7 @@ PyGcc_autogenerated_tree_type_for_tree_code(enum tree_code code, int borrow_ref)
     PyGccWrapperTypeObject *result;
 
     assert(code >= 0);
-    assert(code < MAX_TREE_CODES);
+    assert(code < PyGcc_autogenerated_num_tree_codes);
 
     result = pytype_for_tree_code[code];
 
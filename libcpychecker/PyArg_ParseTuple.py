@@ -150,6 +150,14 @@ class TypeCheckResultType(AwkwardType):
                            self.base_type):
             return True
 
+        # So is a pointer to a pointer to the struct for the PyTypeObject
+        # (using the cached classification of the pointer type):
+        typeobject = self.typecheck.typeobject
+        if typeobject:
+            tc = classify_type(actual_type.dereference)
+            if tc.typeobject_name == typeobject.name:
+                return True
+
         other_type = self.typecheck.get_other_type()
         if other_type:
             if compatible_type(actual_type,
@@ -18,6 +18,7 @@
 from __future__ import print_function
 import sys
 import gcc
+import gccutils
 from libcpychecker.formatstrings import check_pyargs
 from libcpychecker.utils import log
 from libcpychecker.refcounts import check_refcounts, get_traces
@@ -41,8 +42,21 @@ class CpyCheckerGimplePass(gcc.GimplePass):
                  only_on_python_code=True,
                  maxtrans=256,
                  dump_json=False,
-                 verbose=False):
+                 verbose=False,
+                 merge_states=False,
+                 interprocedural=False,
+                 jobs=1,
+                 cache=False,
+                 self_checks=True,
+                 stats=False,
+                 stats_memory=False,
+                 time_budget=None,
+                 memory_budget=None,
+                 total_time_budget=None,
+                 bundle_reports=False):
         gcc.GimplePass.__init__(self, 'cpychecker-gimple')
+        # The runtime self-checks of the checker are global:
+        gccutils.self_checks = bool(self_checks)
         self.dump_traces = dump_traces
         self.show_traces = show_traces
         self.verify_pyargs = verify_pyargs
@@ -64,6 +78,30 @@ class CpyCheckerGimplePass(gcc.GimplePass):
         self.only_on_python_code = only_on_python_code
         self.maxtrans = maxtrans
         self.dump_json = dump_json
+        self.merge_states = merge_states
+        self.interprocedural = interprocedural
+        self.cache = cache
+        self.stats = stats
+        self.stats_memory = stats_memory
+        self.time_budget = time_budget
+        self.memory_budget = memory_budget
+        self.total_time_budget = total_time_budget
+        self.bundle_reports = bundle_reports
+        # Checking functions in parallel requires all of them up-front, and
+        # the summaries of callees must be available before their callers
+        # are checked, so it isn't compatible with interprocedural mode.
+        # Traces dumped to stdout by multiple processes would get jumbled:
+        if interprocedural or dump_traces or show_traces:
+            self.jobs = 1
+        else:
+            self.jobs = jobs
+
+        # When checking interprocedurally or in parallel, the refcount checker
+        # is deferred until the IPA pass, so that callees can be checked
+        # before their callers, or so that all of the functions can be handed
+        # to the worker processes at once.  A list of the gcc.Function
+        # instances to be checked:
+        self.deferred_functions = []
 
     def execute(self, fun):
         if fun:
@@ -79,7 +117,10 @@ class CpyCheckerGimplePass(gcc.GimplePass):
 
             # The refcount code is too buggy for now to be on by default:
             if self.verify_refcounting:
-                if 0:
+                if self.interprocedural or self.jobs > 1:
+                    # (see check_deferred_functions)
+                    self.deferred_functions.append(fun)
+                elif 0:
                     # Profiled version:
                     import cProfile
                     prof_filename = '%s.%s.refcount-profile' % (gcc.get_dump_base_name(),
@@ -94,11 +135,56 @@ class CpyCheckerGimplePass(gcc.GimplePass):
                     # Normal mode (without profiler):
                     self._check_refcounts(fun)
 
+    def _get_check_refcounts_kwargs(self):
+        return dict(dump_traces=self.dump_traces,
+                    show_traces=self.show_traces,
+                    show_possible_null_derefs=self.show_possible_null_derefs,
+                    maxtrans=self.maxtrans,
+                    dump_json=self.dump_json,
+                    merge_states=self.merge_states,
+                    interprocedural=self.interprocedural,
+                    cache=self.cache,
+                    stats=self.stats,
+                    stats_memory=self.stats_memory,
+                    time_budget=self.time_budget,
+                    memory_budget=self.memory_budget,
+                    total_time_budget=self.total_time_budget,
+                    bundle_reports=self.bundle_reports)
+
     def _check_refcounts(self, fun):
-        check_refcounts(fun, self.dump_traces, self.show_traces,
-                        self.show_possible_null_derefs,
-                        maxtrans=self.maxtrans,
-                        dump_json=self.dump_json)
+        check_refcounts(fun, **self._get_check_refcounts_kwargs())
+
+    def check_deferred_functions(self):
+        """
+        Run the refcount checker on the functions deferred by execute().
+
+        When checking interprocedurally, this is done callees before callers,
+        so that the summary of each function is available when checking the
+        functions that call it.  Otherwise, the functions are checked by a
+        pool of worker processes, with the diagnostics emitted in the order in
+        which the functions were seen.
+        """
+        if not self.interprocedural:
+            from libcpychecker.parallel import check_refcounts_in_parallel
+            check_refcounts_in_parallel(self.deferred_functions, self.jobs,
+                                        **self._get_check_refcounts_kwargs())
+            self.deferred_functions = []
+            return
+
+        from gccutils import sorted_callgraph
+        remaining = dict([(fun.decl, fun)
+                          for fun in self.deferred_functions])
+        # (sorted_callgraph puts callers before their callees):
+        for node in reversed(sorted_callgraph()):
+            fun = remaining.pop(node.decl, None)
+            if fun:
+                self._check_refcounts(fun)
+        # Any functions that the sort didn't reach (e.g. within a cycle of
+        # calls), in their original order:
+        for fun in self.deferred_functions:
+            if fun.decl in remaining:
+                self._check_refcounts(fun)
+        self.deferred_functions = []
 
 
 class CpyCheckerIpaPass(gcc.SimpleIpaPass):
@@ -106,11 +192,14 @@ class CpyCheckerIpaPass(gcc.SimpleIpaPass):
     The custom pass that implements the whole-program part of
     our extra compile-time checks
     """
-    def __init__(self):
+    def __init__(self, gimple_ps=None):
         gcc.SimpleIpaPass.__init__(self, 'cpychecker-ipa')
+        self.gimple_ps = gimple_ps
 
     def execute(self):
         check_initializers()
+        if self.gimple_ps:
+            self.gimple_ps.check_deferred_functions()
 
 def main(**kwargs):
     # Register our custom attributes:
@@ -131,5 +220,5 @@ def main(**kwargs):
         # SSA version:
         gimple_ps.register_after('ssa')
 
-    ipa_ps = CpyCheckerIpaPass()
+    ipa_ps = CpyCheckerIpaPass(gimple_ps)
     ipa_ps.register_before('*free_lang_data')
@@ -19,18 +19,29 @@ import gcc
 import gccutils
 import re
 import sys
-from six import StringIO, integer_types
+import time
+from bisect import bisect_right
+from six import StringIO, integer_types, add_metaclass
 
 from gccutils import get_src_for_loc, get_nonnull_arguments, check_isinstance
 from gccutils.graph.stmtgraph import StmtGraph, StmtNode
 
 from collections import OrderedDict
-from libcpychecker.utils import log, logging_enabled
+from libcpychecker.persistent import PersistentMap
+from libcpychecker.utils import get_logger, Lazy
 from libcpychecker.types import *
 from libcpychecker.diagnostics import location_as_json, type_as_json
 
+log = get_logger('absinterp')
+
 debug_comparisons = 0
 
+# A callable taking a function name, and returning its interprocedural
+# FunctionSummary (or None).  This is set by libcpychecker.summaries when it
+# is first imported (it can't be imported from here, since it imports this
+# module):
+get_function_summary = None
+
 numeric_types = integer_types + (float, )
 
 # I found myself regularly getting State and Transition instances confused.  To
@@ -172,6 +183,52 @@ class FnMeta(object):
 # Various kinds of r-value:
 ############################################################################
 
+# Hash-consing of the immutable kinds of r-value.
+#
+# The analysis creates vast numbers of identical values (e.g. the NULL
+# pointer constant of a given type at a given location, each time a trace
+# passes through the same statement), and each State holds references to
+# them.  For classes using the InternedValueType metaclass, constructing a
+# value that's equal to a previously-constructed one gives back the earlier
+# instance, without running __init__ again.
+#
+# This is only valid for values that are never modified after construction,
+# and whose identity doesn't matter.  UnknownValue and WithinRange are
+# deliberately *not* interned: SplitValue.split locates the value being split
+# by identity, so two distinct unknowns that happen to have the same type and
+# location must remain distinct objects.
+
+_interned_values = {}
+
+class InternedValueType(type):
+    """
+    Metaclass for AbstractValue subclasses that are hash-consed: each class
+    supplies a get_intern_key classmethod taking the constructor arguments
+    """
+    def __call__(cls, *args, **kwargs):
+        try:
+            key = (cls, cls.get_intern_key(*args, **kwargs))
+            return _interned_values[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable arguments (or bad arguments, which __init__ will
+            # complain about):
+            return type.__call__(cls, *args, **kwargs)
+        result = type.__call__(cls, *args, **kwargs)
+        _interned_values[key] = result
+        return result
+
+def clear_interned_values(*args):
+    """
+    Discard all interned values, so that they can be garbage-collected
+    (existing references to them remain valid)
+    """
+    _interned_values.clear()
+
+gcc.register_callback(gcc.PLUGIN_FINISH_UNIT,
+                      clear_interned_values)
+
 class AbstractValue(object):
     """
     Base class, representing some subset of possible values out of the full
@@ -187,6 +244,21 @@ class AbstractValue(object):
         self.gcctype = gcctype
         self.loc = loc
 
+    def copy_from_split(self):
+        """
+        Get a copy of this value, marked as having come from a SplitValue
+
+        (The value may be interned, and hence shared, so it mustn't be marked
+        in-place)
+        """
+        result = object.__new__(self.__class__)
+        for cls in self.__class__.__mro__:
+            for attr in getattr(cls, '__slots__', ()):
+                if hasattr(self, attr):
+                    setattr(result, attr, getattr(self, attr))
+        result.fromsplit = True
+        return result
+
     def __str__(self):
         if self.gcctype:
             result = '%s' % self.gcctype
@@ -293,10 +365,28 @@ class AbstractValue(object):
         raise NotImplementedError('%s.union(%s, %s)'
                                   % (self.__class__.__name__, v_other))
 
+    def get_merge_key(self):
+        """
+        Get a hashable key for use when merging states (see StateMerger):
+        two values with equal keys can be combined using union()
+
+        By default, a value can only be merged with itself
+        """
+        return self
+
+    def is_equivalent(self, v_other):
+        """
+        Does v_other describe exactly the same set of values as this one?
+        (used when merging states, to detect that one state subsumes another)
+        """
+        return self is v_other
+
 class EmptySet(AbstractValue):
     """
     The empty set: there are no possible values for this variable (yet).
     """
+    __slots__ = ()
+
     def union(self, v_other):
         check_isinstance(v_other, AbstractValue)
         return v_other
@@ -305,6 +395,8 @@ class UnknownValue(AbstractValue):
     """
     A value that we know nothing about: it could be any of the possible values
     """
+    __slots__ = ()
+
     @classmethod
     def make(cls, gcctype, loc):
         """
@@ -411,12 +503,18 @@ def eval_binop(exprcode, a, b, rhsvalue):
     return result
 
 
+@add_metaclass(InternedValueType)
 class ConcreteValue(AbstractValue):
     """
     A known, specific value (e.g. 0)
     """
     __slots__ = ('value', )
 
+    @classmethod
+    def get_intern_key(cls, gcctype, loc, value):
+        # (1 and 1.0 compare equal, but are different values)
+        return (gcctype, loc, type(value), value)
+
     def __init__(self, gcctype, loc, value):
         check_isinstance(gcctype, gcc.Type)
         if loc:
@@ -665,6 +763,21 @@ class ConcreteValue(AbstractValue):
         raise NotImplementedError('%s.union(%s)'
                                   % (self.__class__.__name__, v_other))
 
+    def get_merge_key(self):
+        if isinstance(self.gcctype, gcc.IntegerType):
+            # Integers can be merged into a WithinRange:
+            return ('integer', self.gcctype)
+        if isinstance(self.gcctype, gcc.PointerType):
+            # Pointer constants (e.g. NULL) only merge with the same value:
+            return ('pointer', self.value)
+        return self
+
+    def is_equivalent(self, v_other):
+        if isinstance(v_other, ConcreteValue):
+            return (self.value == v_other.value
+                    and self.gcctype == v_other.gcctype)
+        return False
+
 def value_to_str(value):
     """
     Display large integers/longs in hexadecimal, since it's easier
@@ -895,10 +1008,27 @@ class WithinRange(AbstractValue):
         raise NotImplementedError('%s.union(%s)'
                                   % (self.__class__.__name__, v_other))
 
+    def get_merge_key(self):
+        if isinstance(self.gcctype, gcc.IntegerType):
+            return ('integer', self.gcctype)
+        return self
+
+    def is_equivalent(self, v_other):
+        if isinstance(v_other, WithinRange):
+            return (self.minvalue == v_other.minvalue
+                    and self.maxvalue == v_other.maxvalue
+                    and self.gcctype == v_other.gcctype)
+        return False
+
+@add_metaclass(InternedValueType)
 class PointerToRegion(AbstractValue):
     """A non-NULL pointer value, pointing at a specific Region"""
     __slots__ = ('region', )
 
+    @classmethod
+    def get_intern_key(cls, gcctype, loc, region):
+        return (gcctype, loc, region)
+
     def __init__(self, gcctype, loc, region):
         AbstractValue.__init__(self, gcctype, loc)
         check_isinstance(region, Region)
@@ -939,11 +1069,29 @@ class PointerToRegion(AbstractValue):
         # Defer to base class:
         AbstractValue.eval_unary_op(self, exprcode, gcctype, loc)
 
+    def union(self, v_other):
+        check_isinstance(v_other, AbstractValue)
+        if isinstance(v_other, PointerToRegion):
+            if self.region == v_other.region:
+                return self
+        raise NotImplementedError('%s.union(%s)'
+                                  % (self.__class__.__name__, v_other))
+
+    def get_merge_key(self):
+        return ('pointer', self.region)
+
+    def is_equivalent(self, v_other):
+        if isinstance(v_other, PointerToRegion):
+            return self.region == v_other.region
+        return False
+
 class DeallocatedMemory(AbstractValue):
     """
     A 'poisoned' r-value: this memory has been deallocated, so the r-value
     is meaningless.
     """
+    __slots__ = ()
+
     def __str__(self):
         if self.loc:
             return 'memory deallocated at %s' % self.loc
@@ -958,6 +1106,8 @@ class UninitializedData(AbstractValue):
     A 'poisoned' r-value: this memory has not yet been written to, so the
     r-value is meaningless.
     """
+    __slots__ = ()
+
     def __str__(self):
         if self.loc:
             return 'uninitialized data at %s' % self.loc
@@ -1168,6 +1318,8 @@ class RegionForGlobal(Region):
         return str(self.vardecl)
 
 class RegionOnStack(Region):
+    __slots__ = ()
+
     def __repr__(self):
         return 'RegionOnStack(%r)' % self.name
 
@@ -1187,7 +1339,7 @@ class RegionForLocal(RegionOnStack):
 class RegionForStaticLocal(RegionForGlobal):
     # "static" locals work more like globals.  In particular, they're not on
     # the stack
-    pass
+    __slots__ = ()
 
 class RegionOnHeap(Region):
     """
@@ -1222,11 +1374,96 @@ class RegionForStringConstant(Region):
         return str(repr(self.text))
 
 class ArrayElementRegion(Region):
-    __slots__ = ('index', )
+    """
+    Represents some of the elements of an array region.
+
+    If 'index' is an integer, the region covers the run of indices
+    index..lastindex (inclusive); usually that is a single element, but
+    a run written with a single value (see State.set_array_range) can be
+    arbitrarily long.  Otherwise 'index' is an AbstractValue (for an array
+    indexed by a non-constant value), and lastindex is None
+    """
+    __slots__ = ('index', 'lastindex', )
 
-    def __init__(self, name, parent, index):
+    def __init__(self, name, parent, index, lastindex=None):
         Region.__init__(self, name, parent)
         self.index = index
+        if lastindex is None and isinstance(index, integer_types):
+            lastindex = index
+        self.lastindex = lastindex
+
+class ArrayContents(object):
+    """
+    The contents of an array region within one State, as an interval map
+    from runs of concrete indices to the ArrayElementRegion for each run.
+
+    The value of a run is the value of its region within the State, so that
+    a run of elements sharing a value costs one region and one value, however
+    long the run is.  Runs are split when part of one is written to, and
+    adjacent runs with equivalent values are coalesced by range writes (see
+    State._array_region and State.set_array_range).
+
+    'regions' is a tuple of the runs, ordered by index and not overlapping,
+    and 'starts' the corresponding tuple of their first indices, so that the
+    run for an index can be found by bisection.  Instances are immutable, so
+    that a copied State can share them.
+    """
+    __slots__ = ('starts', 'regions', )
+
+    def __init__(self, regions=()):
+        self.regions = tuple(regions)
+        self.starts = tuple([region.index for region in self.regions])
+
+    def __len__(self):
+        return len(self.regions)
+
+    def __repr__(self):
+        return 'ArrayContents(%r)' % (self.regions, )
+
+    def find(self, index):
+        """
+        Get the run covering the given index, or None
+        """
+        i = bisect_right(self.starts, index) - 1
+        if i >= 0 and self.regions[i].lastindex >= index:
+            return self.regions[i]
+        return None
+
+    def get_overlapping(self, minvalue, maxvalue):
+        """
+        Get the (lo, hi) slice of the runs that overlap the range
+        minvalue..maxvalue (inclusive); if there are none, lo == hi is the
+        position at which a run for the range would be inserted
+        """
+        lo = bisect_right(self.starts, minvalue) - 1
+        if lo < 0 or self.regions[lo].lastindex < minvalue:
+            lo += 1
+        hi = bisect_right(self.starts, maxvalue)
+        return lo, hi
+
+    def get_covering(self, minvalue, maxvalue):
+        """
+        Get the list of runs covering the range minvalue..maxvalue
+        (inclusive), ordered by index, or None if some index within the range
+        isn't covered by any run
+        """
+        lo, hi = self.get_overlapping(minvalue, maxvalue)
+        expected = minvalue
+        for region in self.regions[lo:hi]:
+            if region.index > expected:
+                return None
+            expected = region.lastindex + 1
+        if expected <= maxvalue:
+            return None
+        return list(self.regions[lo:hi])
+
+    def replace(self, lo, hi, regions):
+        """
+        Get a copy with the runs in the slice lo:hi replaced by the given
+        runs
+        """
+        return ArrayContents(self.regions[:lo] + tuple(regions)
+                             + self.regions[hi:])
 
 class MissingValue(Exception):
     """
@@ -1262,13 +1499,13 @@ class SplitValue(Exception):
         result = []
         for altvalue, desc in zip(self.altvalues, self.descriptions):
             log(' creating state for split where %s is %s', self.value, altvalue)
-            altvalue.fromsplit = True
+            altvalue = altvalue.copy_from_split()
 
             newstate = state.copy()
             newstate.fromsplit = True
-            for r in newstate.value_for_region:
+            for r, value in list(newstate.value_for_region.unordered_items()):
                 # Replace instances of the value itself:
-                if newstate.value_for_region[r] is self.value:
+                if value is self.value:
                     log('  replacing value for region %s with %s', r, altvalue)
                     newstate.value_for_region[r] = altvalue
             result.append(Transition(state,
@@ -1277,6 +1514,35 @@ class SplitValue(Exception):
         return result
 
 
+class FacetType(type):
+    """
+    Metaclass for Facet, building the registry of function handlers for each
+    Facet subclass as it is defined.
+
+    Each class's "_impl_handlers" is a dict mapping from the name of a C
+    function to the function that handles calls to it, both from the "impl_"
+    methods of the class and its bases, and from register_impl()
+    """
+    def __init__(cls, name, bases, dct):
+        type.__init__(cls, name, bases, dct)
+        # Handlers registered directly on this class:
+        cls._own_impl_handlers = {}
+        for attrname, value in dct.items():
+            if attrname.startswith('impl_'):
+                cls._own_impl_handlers[attrname[5:]] = value
+        cls._rebuild_impl_handlers()
+
+    def _rebuild_impl_handlers(cls):
+        # Merge in the handlers of the bases, with the more-derived classes
+        # taking priority, as per method resolution:
+        handlers = {}
+        for klass in reversed(cls.__mro__):
+            handlers.update(getattr(klass, '_own_impl_handlers', {}))
+        cls._impl_handlers = handlers
+        for subclass in cls.__subclasses__():
+            subclass._rebuild_impl_handlers()
+
+@add_metaclass(FacetType)
 class Facet(object):
     """
     A facet of state, relating to a particular API (e.g. libc, cpython, etc)
@@ -1288,9 +1554,43 @@ class Facet(object):
     functions within the API, describing all possible transitions from the
     current state to new states (e.g. success, failure, etc), creating
     appropriate new States with appropriate new Facet subclass instances.
+
+    Handlers for further functions can be added to an existing Facet
+    subclass (without subclassing it) using register_impl()
     """
     __slots__ = ('state', )
 
+    @classmethod
+    def register_impl(cls, fnname, handler=None):
+        """
+        Register a handler for calls to the C function with the given name,
+        for this class and its subclasses.  The handler has the same form as
+        an "impl_" method:
+           def handler(facet, stmt, v_arg0, v_arg1, *args):
+        returning a list of Transition instances.
+
+        Can also be used as a decorator:
+           @CPython.register_impl('foo')
+           def handle_foo(facet, stmt, v_arg0):
+               ...
+        """
+        if handler is None:
+            def decorator(handler):
+                cls.register_impl(fnname, handler)
+                return handler
+            return decorator
+        cls._own_impl_handlers[fnname] = handler
+        cls._rebuild_impl_handlers()
+        return handler
+
+    @classmethod
+    def get_impl(cls, fnname):
+        """
+        Get the handler for calls to the C function with the given name, or
+        None
+        """
+        return cls._impl_handlers.get(fnname)
+
     def __init__(self, state):
         check_isinstance(state, State)
         self.state = state
@@ -1299,6 +1599,15 @@ class Facet(object):
         # Concrete subclasses should implement this.
         raise NotImplementedError
 
+    def get_merge_key(self):
+        """
+        Get a hashable key for this facet, for use when merging states (see
+        StateMerger): states are only merged if their facets have equal keys.
+
+        Subclasses with state of their own should override this.
+        """
+        return self.__class__
+
 class State(object):
     """
     A Location with memory state, and zero or more additional "facets" of
@@ -1327,36 +1636,60 @@ class State(object):
     # We can't use the __slots__ optimization here, as we're adding additional
     # per-facet attributes
 
+    # The total number of State instances created (for libcpychecker.stats):
+    num_created = 0
+
     def __init__(self, stmtgraph, stmtnode, lastgccloc,
                  facets, region_for_var=None, value_for_region=None,
-                 return_rvalue=None, has_returned=False, not_returning=False):
+                 return_rvalue=None, has_returned=False, not_returning=False,
+                 global_regions=None, array_contents=None):
         check_isinstance(stmtgraph, StmtGraph)
         check_isinstance(stmtnode, StmtNode)
         check_isinstance(facets, dict)
+        State.num_created += 1
         self.stmtgraph = stmtgraph
         self.fun = stmtgraph.fun
         self.stmtnode = stmtnode
         self.lastgccloc = lastgccloc
         self.facets = facets
 
+        # The stores are PersistentMap instances, so that copying a State
+        # shares them with the original, and each transition only pays for
+        # the entries it changes.
+
         # Mapping from VarDecl.name to Region:
         if region_for_var:
-            check_isinstance(region_for_var, OrderedDict)
+            check_isinstance(region_for_var, PersistentMap)
             self.region_for_var = region_for_var
         else:
-            self.region_for_var = OrderedDict()
+            self.region_for_var = PersistentMap()
 
         # Mapping from Region to AbstractValue:
         if value_for_region:
-            check_isinstance(value_for_region, OrderedDict)
+            check_isinstance(value_for_region, PersistentMap)
             self.value_for_region = value_for_region
         else:
-            self.value_for_region = OrderedDict()
+            self.value_for_region = PersistentMap()
+
+        # Mapping from the Region for an array to the ArrayContents giving the
+        # runs of its elements within this state:
+        if array_contents:
+            check_isinstance(array_contents, PersistentMap)
+            self.array_contents = array_contents
+        else:
+            self.array_contents = PersistentMap()
 
         self.return_rvalue = return_rvalue
         self.has_returned = has_returned
         self.not_returning = not_returning
 
+        # Mapping from VarDecl to RegionForGlobal, shared by all of the States
+        # for a function, so that each global has the same Region on every
+        # path (which StateMerger relies on):
+        if global_regions is None:
+            global_regions = {}
+        self.global_regions = global_regions
+
     def __str__(self):
         return ('loc: %s region_for_var:%s value_for_region:%s'
                 % (self.stmtnode,
@@ -1394,7 +1727,7 @@ class State(object):
         return result
 
     def log(self, logger):
-        if not logging_enabled:
+        if hasattr(logger, 'is_enabled') and not logger.is_enabled():
             return
         # Display data in tabular form:
         logger('%s', self.as_str_table())
@@ -1417,7 +1750,9 @@ class State(object):
                       self.value_for_region.copy(),
                       self.return_rvalue,
                       self.has_returned,
-                      self.not_returning)
+                      self.not_returning,
+                      self.global_regions,
+                      self.array_contents.copy())
         # Make a copy of each facet into the new state:
         for key in self.facets:
             facetcls = self.facets[key]
@@ -1429,12 +1764,60 @@ class State(object):
     def verify(self):
         """
         Perform self-tests to ensure sanity of this State
+        (unless disabled via gccutils.self_checks)
         """
-        for k in self.value_for_region:
+        if not gccutils.self_checks:
+            return
+        # (the order doesn't matter, so avoid sorting the store):
+        for k, v in self.value_for_region.unordered_items():
             check_isinstance(k, Region)
-            if not isinstance(self.value_for_region[k], AbstractValue):
+            if not isinstance(v, AbstractValue):
                 raise TypeError('value for region %r is not an AbstractValue: %r'
-                                % (k, self.value_for_region[k]))
+                                % (k, v))
+
+    def get_merge_key(self):
+        """
+        Get a hashable key summarizing this State, for use by StateMerger.
+
+        States with equal keys have the same variables and regions, the same
+        facet keys, and values that can be merged region-by-region
+        """
+        values = frozenset([(region, value.get_merge_key())
+                            for region, value
+                            in self.value_for_region.unordered_items()])
+        facets = tuple([(key, getattr(self, key).get_merge_key())
+                        for key in sorted(self.facets)])
+        return (self.has_returned,
+                self.not_returning,
+                frozenset([key for key, region
+                           in self.region_for_var.unordered_items()]),
+                values,
+                facets)
+
+    def union(self, other):
+        """
+        Merge another State with an equal merge key into this one.
+
+        Return self if this State already covers all of the values of the
+        other, or a new State covering both of them.  Raise
+        NotImplementedError if some pair of values can't be merged.
+        """
+        check_isinstance(other, State)
+        s_new = None
+        for region, v_self in self.value_for_region.unordered_items():
+            v_other = other.value_for_region[region]
+            if v_self is v_other:
+                continue
+            v_new = v_self.union(v_other)
+            check_isinstance(v_new, AbstractValue)
+            if v_new.is_equivalent(v_self):
+                continue
+            if s_new is None:
+                s_new = self.copy()
+            s_new.value_for_region[region] = v_new
+        if s_new is None:
+            return self
+        return s_new
 
     def eval_lvalue(self, expr, loc):
         """
@@ -1572,18 +1955,35 @@ class State(object):
         check_isinstance(dest_region, Region)
         self.value_for_region[dest_region] = value
 
+        # Storing to a whole array (e.g. zero-initializing it with "= {}")
+        # also overwrites the values of any of its elements:
+        if isinstance(lhs.type, gcc.ArrayType) and isinstance(value, ConcreteValue):
+            r_range = lhs.type.range
+            if r_range is not None and r_range.max_value is not None:
+                v_element = value.extract_from_parent(None,
+                                                      lhs.type.dereference,
+                                                      loc)
+                self.set_array_range(dest_region,
+                                     r_range.min_value.constant,
+                                     r_range.max_value.constant,
+                                     v_element)
+
     def var_region(self, var):
         check_isinstance(var, (gcc.VarDecl, gcc.ParmDecl, gcc.ResultDecl, gcc.FunctionDecl))
         if var not in self.region_for_var:
             # Presumably a reference to a global variable:
             log('adding region for global var: %r', var)
-            region = RegionForGlobal(var)
+            if var in self.global_regions:
+                region = self.global_regions[var]
+            else:
+                region = RegionForGlobal(var)
+                self.global_regions[var] = region
             # it is its own region:
             self.region_for_var[var] = region
 
             # Initialize the refcount of global PyObject instances
             # e.g. _Py_NoneStruct to 0 i.e. we don't own any references to them
-            if str(var.type) == 'struct PyObject':
+            if classify_type(var.type).is_pyobject:
                 from libcpychecker.refcounts import RefcountValue
                 ob_refcnt = self.make_field_region(region, 'ob_refcnt') # FIXME: this should be a memref and fieldref
                 self.value_for_region[ob_refcnt] = RefcountValue.borrowed_ref(None, region)
@@ -1646,6 +2046,15 @@ class State(object):
         check_isinstance(index, (integer_types, UnknownValue, ConcreteValue, WithinRange))
         if isinstance(index, ConcreteValue):
             index = index.value
+        if isinstance(index, integer_types):
+            # Give the element a run of its own within this state, so that
+            # writing to it doesn't affect the rest of any run it was in:
+            contents, lo, hi = self._split_array_runs(parent, index, index)
+            if lo < hi:
+                return contents.regions[lo]
+            region = self._make_run_region(parent, index, index)
+            self.array_contents[parent] = contents.replace(lo, hi, [region])
+            return region
         if index in parent.fields:
             log('reusing')
             return parent.fields[index]
@@ -1656,6 +2065,103 @@ class State(object):
         self.region_for_var[region] = region
         return region
 
+    def _make_run_region(self, parent, minvalue, maxvalue):
+        # Get the region for the run of elements minvalue..maxvalue
+        # (inclusive) of the array region 'parent', reusing it if it already
+        # exists (the regions are shared between states, like those for
+        # fields; which runs are in use is tracked per-state)
+        if minvalue == maxvalue:
+            key = minvalue
+            name = '%s[%s]' % (parent.name, minvalue)
+        else:
+            key = (minvalue, maxvalue)
+            name = '%s[%s..%s]' % (parent.name, minvalue, maxvalue)
+        if key in parent.fields:
+            log('reusing')
+            return parent.fields[key]
+        log('not reusing')
+        region = ArrayElementRegion(name, parent, minvalue, maxvalue)
+        parent.fields[key] = region
+        # it is its own region:
+        self.region_for_var[region] = region
+        return region
+
+    def _split_array_runs(self, parent, minvalue, maxvalue):
+        """
+        Split any runs of the array region 'parent' that straddle either end
+        of the range minvalue..maxvalue (inclusive), so that every run is
+        wholly within or wholly outside of the range; the pieces of a run
+        inherit its value.
+
+        Return the ArrayContents, and the (lo, hi) slice of its runs that lie
+        within the range
+        """
+        contents = self.array_contents.get(parent, None)
+        if contents is None:
+            contents = ArrayContents()
+        lo, hi = contents.get_overlapping(minvalue, maxvalue)
+        if lo == hi or (contents.regions[lo].index >= minvalue
+                        and contents.regions[hi - 1].lastindex <= maxvalue):
+            return contents, lo, hi
+        pieces = []
+        for region in contents.regions[lo:hi]:
+            bounds = [(max(region.index, minvalue),
+                       min(region.lastindex, maxvalue))]
+            if region.index < minvalue:
+                bounds.insert(0, (region.index, minvalue - 1))
+            if region.lastindex > maxvalue:
+                bounds.append((maxvalue + 1, region.lastindex))
+            if len(bounds) == 1:
+                pieces.append(region)
+                continue
+            value = self.value_for_region.pop(region, None)
+            for start, end in bounds:
+                r_piece = self._make_run_region(parent, start, end)
+                if value is not None:
+                    self.value_for_region[r_piece] = value
+                pieces.append(r_piece)
+        contents = contents.replace(lo, hi, pieces)
+        self.array_contents[parent] = contents
+        lo, hi = contents.get_overlapping(minvalue, maxvalue)
+        return contents, lo, hi
+
+    def set_array_range(self, parent, minvalue, maxvalue, value):
+        """
+        Set every element of the array region 'parent' within the range of
+        indices minvalue..maxvalue (inclusive) to the given value, which
+        describes each element individually (e.g. a ConcreteValue).
+
+        The range becomes a single run, whatever its length, coalesced with
+        the runs on either side if they have an equivalent value
+        """
+        check_isinstance(parent, Region)
+        check_isinstance(minvalue, integer_types)
+        check_isinstance(maxvalue, integer_types)
+        check_isinstance(value, AbstractValue)
+        assert minvalue <= maxvalue
+        contents, lo, hi = self._split_array_runs(parent, minvalue, maxvalue)
+        for region in contents.regions[lo:hi]:
+            self.value_for_region.pop(region, None)
+        if lo > 0:
+            r_prev = contents.regions[lo - 1]
+            v_prev = self.value_for_region.get(r_prev, None)
+            if (r_prev.lastindex == minvalue - 1
+                and v_prev is not None and v_prev.is_equivalent(value)):
+                del self.value_for_region[r_prev]
+                minvalue = r_prev.index
+                lo -= 1
+        if hi < len(contents):
+            r_next = contents.regions[hi]
+            v_next = self.value_for_region.get(r_next, None)
+            if (r_next.index == maxvalue + 1
+                and v_next is not None and v_next.is_equivalent(value)):
+                del self.value_for_region[r_next]
+                maxvalue = r_next.lastindex
+                hi += 1
+        region = self._make_run_region(parent, minvalue, maxvalue)
+        self.value_for_region[region] = value
+        self.array_contents[parent] = contents.replace(lo, hi, [region])
+
     def get_field_region(self, cr, loc): #target, field):
         check_isinstance(cr, gcc.ComponentRef)
         if loc:
@@ -1717,23 +2223,25 @@ class State(object):
         check_isinstance(r_array, Region)
         check_isinstance(v_range, WithinRange)
 
-        v_result = EmptySet(gcctype, loc)
+        # Look up the runs of indices, rather than scanning over the range
+        # (which could be large, and/or outside the bounds of the array):
+        contents = self.array_contents.get(r_array, None)
+        if contents is None:
+            return None
+        runs = contents.get_covering(v_range.minvalue, v_range.maxvalue)
+        if runs is None:
+            # We have an uninitialized element:
+            return None
 
-        # (This loop should rapidly fail when the range is large and/or outside
-        # the bounds of the array)
-        for index in range(v_range.minvalue,
-                           v_range.maxvalue + 1):
-            # print 'index: %i' % index
-            if index not in r_array.fields:
-                # We have an uninitialized element:
+        v_result = EmptySet(gcctype, loc)
+        for r_run in runs:
+            # (the element may have been indexed without being written to):
+            if r_run not in self.value_for_region:
                 return None
-            r_at_index = r_array.fields[index]
-            # print 'r_at_index: %s' % r_at_index
-            check_isinstance(r_at_index, Region)
-            v_at_index = self.value_for_region[r_at_index]
-            # print 'v_at_index: %s' % v_at_index
-            check_isinstance(v_at_index, AbstractValue)
-            v_result = v_result.union(v_at_index)
+            v_run = self.value_for_region[r_run]
+            # print 'v_run: %s' % v_run
+            check_isinstance(v_run, AbstractValue)
+            v_result = v_result.union(v_run)
             # print 'v_result: %s' % v_result
 
         # Every subregion within the given range is initialized:
@@ -1745,6 +2253,15 @@ class State(object):
         if region in self.value_for_region:
             return self.value_for_region[region]
 
+        # An element that has since been overwritten by a range write (e.g.
+        # via a pointer taken before it) has the value of the run covering it:
+        if isinstance(region, ArrayElementRegion) and region.lastindex is not None:
+            contents = self.array_contents.get(region.parent, None)
+            if contents is not None:
+                r_run = contents.find(region.index)
+                if r_run is not None and r_run in self.value_for_region:
+                    return self.value_for_region[r_run]
+
         # Not found; try default value from parent region:
         if region.parent:
             try:
@@ -1960,7 +2477,7 @@ class State(object):
         # don't allow this.  Use the end of the function for this case.
         stmt = self.stmtnode.get_stmt()
         if stmt:
-            log('%s' % self.stmtnode.get_stmt().loc)
+            log('%s', self.stmtnode.get_stmt().loc)
             # grrr... not all statements have a non-NULL location
             gccloc = self.stmtnode.get_stmt().loc
             if gccloc is None:
@@ -2038,6 +2555,7 @@ class State(object):
         for k, v in region.fields.items():
             if v in self.value_for_region:
                 del self.value_for_region[v]
+        self.array_contents.pop(region, None)
         # Set the default value for the whole region to be "DeallocatedMemory"
         self.region_for_var[region] = region
         self.value_for_region[region] = DeallocatedMemory(None, stmt.loc)
@@ -2058,7 +2576,7 @@ class State(object):
 
     def _get_transitions_for_stmt(self, stmt):
         log('_get_transitions_for_stmt: %r %s', stmt, stmt)
-        log('dir(stmt): %s', dir(stmt))
+        log('dir(stmt): %s', Lazy(dir, stmt))
         if stmt.loc:
             gcc.set_location(stmt.loc)
         if isinstance(stmt, gcc.GimpleCall):
@@ -2176,7 +2694,7 @@ class State(object):
     def _get_transitions_for_GimpleCall(self, stmt):
         log('stmt.lhs: %s %r', stmt.lhs, stmt.lhs)
         log('stmt.fn: %s %r', stmt.fn, stmt.fn)
-        log('dir(stmt.fn): %s', dir(stmt.fn))
+        log('dir(stmt.fn): %s', Lazy(dir, stmt.fn))
         if hasattr(stmt.fn, 'operand'):
             log('stmt.fn.operand: %s', stmt.fn.operand)
         returntype = stmt.fn.type.dereference.type
@@ -2210,11 +2728,12 @@ class State(object):
                     raise PassingPointerToDeallocatedMemory(i, 'function', stmt, rvalue)
 
         if isinstance(stmt.fn.operand, gcc.FunctionDecl):
-            log('dir(stmt.fn.operand): %s', dir(stmt.fn.operand))
+            log('dir(stmt.fn.operand): %s', Lazy(dir, stmt.fn.operand))
             log('stmt.fn.operand.name: %r', stmt.fn.operand.name)
             fnname = stmt.fn.operand.name
 
             # Hand off to impl_* methods of facets, where these methods exist
+            # (or to handlers registered via Facet.register_impl).
             # In each case, the method should have the form:
             #   def impl_foo(self, stmt, v_arg0, v_arg1, *args):
             # for a C function named "foo" i.e. it takes "self", plus the
@@ -2222,20 +2741,27 @@ class State(object):
             # for the evaluated arguments (which for some functions will
             # involve varargs, like above).
             # They should return a list of Transition instances.
-            methname = 'impl_%s' % fnname
+            # Each Facet subclass has a dict of these, keyed by function name
+            # (see FacetType):
             for key in self.facets:
                 facet = getattr(self, key)
-                if hasattr(facet, methname):
-                    meth = getattr(facet, 'impl_%s' % fnname)
-
-                    # Call the facet's method:
-                    return meth(stmt, *args)
+                handler = facet._impl_handlers.get(fnname)
+                if handler:
+                    # Call the facet's handler:
+                    return handler(facet, stmt, *args)
 
             #from libcpychecker.c_stdio import c_stdio_functions, handle_c_stdio_function
 
             #if fnname in c_stdio_functions:
             #    return handle_c_stdio_function(self, fnname, stmt)
 
+            # Functions defined within this translation unit, that have
+            # already been checked, with interprocedural summaries enabled:
+            if get_function_summary and hasattr(self, 'cpython'):
+                summary = get_function_summary(fnname)
+                if summary:
+                    return summary.get_transitions(self, stmt, args)
+
             if 0:
                 # For extending coverage of the Python API:
                 # Detect and complain about Python API entrypoints that
@@ -2246,7 +2772,7 @@ class State(object):
             # Unknown function returning (PyObject*):
             from libcpychecker.refcounts import type_is_pyobjptr_subclass
             if type_is_pyobjptr_subclass(stmt.fn.operand.type.type):
-                log('Invocation of unknown function returning PyObject * (or subclass): %r' % fnname)
+                log('Invocation of unknown function returning PyObject * (or subclass): %r', fnname)
 
                 fnmeta = FnMeta(name=fnname)
 
@@ -2705,16 +3231,19 @@ class Trace(object):
         self.transitions = []
         self.err = None
 
-        # A list of (src gcc.StmtNode, dest gcc.StmtNode) pairs
-        self.paths_taken = []
+        # A mapping from (src gcc.BasicBlock, dest gcc.BasicBlock) pairs to
+        # the number of times that the trace has followed that edge.
+        # It's a PersistentMap so that copies of the trace can share it:
+        self.paths_taken = PersistentMap()
 
     def add(self, transition):
         check_isinstance(transition, Transition)
         self.states.append(transition.dest)
         self.transitions.append(transition)
         if transition.src.stmtnode.bb != transition.dest.stmtnode.bb:
-            self.paths_taken.append( (transition.src.stmtnode.bb,
-                                      transition.dest.stmtnode.bb) )
+            pathedge = (transition.src.stmtnode.bb,
+                        transition.dest.stmtnode.bb)
+            self.paths_taken[pathedge] = self.paths_taken.get(pathedge, 0) + 1
         return self
 
     def add_error(self, err):
@@ -2725,7 +3254,7 @@ class Trace(object):
         t.states = self.states[:]
         t.transitions = self.transitions[:]
         t.err = self.err # FIXME: should this be a copy?
-        t.paths_taken = self.paths_taken[:]
+        t.paths_taken = self.paths_taken.copy()
         return t
 
     def log(self, logger, name):
@@ -2739,6 +3268,19 @@ class Trace(object):
     def get_last_stmt(self):
         return self.states[-1].stmtnode.get_stmt()
 
+    def get_common_prefix_length(self, other):
+        """
+        Get the number of transitions at the start of this trace that are
+        shared with the other trace (explore_traces gives the traces through
+        a common prefix the same Transition instances)
+        """
+        count = 0
+        for t_self, t_other in zip(self.transitions, other.transitions):
+            if t_self is not t_other:
+                break
+            count += 1
+        return count
+
     def return_value(self):
         return self.states[-1].return_rvalue
 
@@ -2769,7 +3311,8 @@ class Trace(object):
         src_bb = endtransition.src.stmtnode.bb
         dest_bb = endtransition.dest.stmtnode.bb
         if src_bb != dest_bb:
-            if (src_bb, dest_bb) in self.paths_taken[0:-1]:
+            # (the count includes the tail transition itself)
+            if self.paths_taken.get((src_bb, dest_bb), 0) > 1:
                 return True
 
     def get_all_var_region_pairs(self):
@@ -2779,7 +3322,7 @@ class Trace(object):
         """
         result = set()
         for s_iter in self.states:
-            for var_iter, r_iter in s_iter.region_for_var.items():
+            for var_iter, r_iter in s_iter.region_for_var.unordered_items():
                 pair = (var_iter, r_iter)
                 result.add(pair)
         return result
@@ -2911,17 +3454,109 @@ class TooComplicated(Exception):
     that the list itself is incomplete: it's not the full list of all
     possible traces.
     """
-    def __init__(self, complete_traces):
+    def __init__(self, complete_traces, reason=None):
         check_isinstance(complete_traces, list)
         self.complete_traces = complete_traces
+        # A description of the limit that was hit (or None for the number of
+        # transitions), for use in diagnostics e.g. "the time budget":
+        self.reason = reason
+        # The TraceNode whose transitions were being explored when the limit
+        # was hit (set by explore_traces):
+        self.interrupted_at = None
+
+    def get_trace_order_key(self):
+        """
+        Get a key function for sorting the traces that were completed before
+        the limit was hit.
+
+        explore_traces yields them in depth-first order, but a recursive
+        traversal of the state tree that's interrupted gathers them from the
+        innermost call outwards, so that the traces that diverge from the
+        path being explored at the deepest point come first.  Sorting (stably)
+        by this key gives that order, so that the partial results (and which
+        trace represents each group of duplicate reports) don't depend on how
+        the traversal is implemented.
+        """
+        if self.interrupted_at:
+            path = self.interrupted_at.to_trace()
+        else:
+            path = Trace()
+        def get_key(trace):
+            if trace is None:
+                return 0
+            return -trace.get_common_prefix_length(path)
+        return get_key
+
+def get_memory_usage():
+    """
+    Get the resident set size of this process, in bytes
+    """
+    try:
+        # (Linux only): the second field is the RSS, in pages
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _pagesize
+    except (IOError, OSError):
+        # Fall back to the peak RSS (in kilobytes on Linux, but in bytes on
+        # Mac OS X):
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            return maxrss
+        return maxrss * 1024
+
+try:
+    import resource
+    _pagesize = resource.getpagesize()
+except ImportError:
+    _pagesize = 4096
 
 class Limits:
     """
     Resource limits, to avoid an analysis going out of control
+
+    maxtrans: the maximum number of transitions to explore
+
+    time_budget: if not None, the wall-clock time (in seconds) that the
+    analysis may take
+
+    memory_budget: if not None, how far (in bytes) the memory usage of the
+    process may grow during the analysis
+
+    Exceeding maxtrans stops the analysis immediately.  The budgets degrade
+    it gracefully: once half of either budget has been used, the analysis
+    switches to a cheaper mode (merging similar states, as per the
+    merge_states option of explore_traces), and only once the whole of a
+    budget has been used does it stop.  In each case, the traces that have
+    already been completed are kept.
     """
-    def __init__(self, maxtrans):
+    # Checking the clock and the memory usage have a cost, so only do so
+    # every this many transitions:
+    CHECK_INTERVAL = 32
+
+    def __init__(self, maxtrans, time_budget=None, memory_budget=None):
         self.maxtrans = maxtrans
         self.trans_seen = 0
+        self.time_budget = time_budget
+        self.memory_budget = memory_budget
+        self.start_time = time.time()
+        if memory_budget is not None:
+            self.start_memory = get_memory_usage()
+        else:
+            self.start_memory = None
+
+        # Set to True once half of a budget has been used:
+        self.degraded = False
+
+        # Set to a description of the budget once one has been used up:
+        self.budget_exceeded = None
+
+        # The number of paths that explore_traces abandoned on detecting a
+        # loop (so that, like when a limit is hit, not every path through the
+        # function is covered by the traces):
+        self.loops_dropped = 0
+
+    def has_budgets(self):
+        return self.time_budget is not None or self.memory_budget is not None
 
     def on_transition(self, transition, result):
         """
@@ -2933,115 +3568,353 @@ class Limits:
         self.trans_seen += 1
         if self.trans_seen > self.maxtrans:
             raise TooComplicated(result)
+        if self.trans_seen % self.CHECK_INTERVAL == 0 or self.trans_seen == 1:
+            if self.has_budgets():
+                self.check_budgets(result)
+
+    def check_budgets(self, result):
+        """
+        Update self.degraded, raising TooComplicated if a budget has been
+        used up
+        """
+        used = []
+        if self.time_budget is not None:
+            used.append(('the time budget',
+                         (time.time() - self.start_time), self.time_budget))
+        if self.memory_budget is not None:
+            used.append(('the memory budget',
+                         (get_memory_usage() - self.start_memory),
+                         self.memory_budget))
+        for desc, amount, budget in used:
+            if amount >= budget:
+                self.budget_exceeded = desc
+                raise TooComplicated(result, desc)
+            if amount * 2 >= budget:
+                if not self.degraded:
+                    log('used half of %s; switching to merging states', desc)
+                self.degraded = True
+
+    def is_exhausted(self):
+        """
+        Did the analysis stop before exploring every trace?
+        """
+        return (self.trans_seen > self.maxtrans
+                or self.budget_exceeded is not None)
+
+class TraceNode(object):
+    """
+    A step within a trace that is still being explored: the Transition that
+    led to it, linked to the TraceNode for the prefix of the trace before it.
 
-def iter_traces(stmtgraph, facets, prefix=None, limits=None, depth=0):
+    Sibling traces share the nodes for their common prefix, rather than each
+    having its own copy of the lists of states and transitions; a Trace
+    instance is only built once a path through the function is complete.
     """
-    Traverse the tree of traces of program state, returning a list
-    of Trace instances.
+    __slots__ = ('parent', 'transition', 'state', 'pathedge', 'paths_taken')
+
+    def __init__(self, parent, transition, state=None):
+        if parent:
+            check_isinstance(parent, TraceNode)
+        self.parent = parent
+        self.transition = transition
+        if transition:
+            check_isinstance(transition, Transition)
+            self.state = transition.dest
+            # The (src, dest) pair of gcc.BasicBlock, if this transition
+            # moved between blocks, for use in detecting loops:
+            src_bb = transition.src.stmtnode.bb
+            dest_bb = transition.dest.stmtnode.bb
+            if src_bb != dest_bb:
+                self.pathedge = (src_bb, dest_bb)
+                # The counts of edges followed so far (as per
+                # Trace.paths_taken), shared with the parent via the
+                # PersistentMap, so that this is O(1) in the length of the
+                # prefix:
+                self.paths_taken = parent.paths_taken.copy()
+                self.paths_taken[self.pathedge] = \
+                    self.paths_taken.get(self.pathedge, 0) + 1
+            else:
+                self.pathedge = None
+                self.paths_taken = parent.paths_taken
+        else:
+            # The root of the tree, holding the initial state:
+            check_isinstance(state, State)
+            self.state = state
+            self.pathedge = None
+            self.paths_taken = PersistentMap()
+
+    def iter_transitions(self):
+        """
+        Yield the transitions leading to this node, from the most recent
+        backwards
+        """
+        node = self
+        while node.transition:
+            yield node.transition
+            node = node.parent
+
+    def to_trace(self):
+        """
+        Build a Trace for the path from the root to this node
+        """
+        trace = Trace()
+        transitions = list(self.iter_transitions())
+        transitions.reverse()
+        for transition in transitions:
+            trace.add(transition)
+        return trace
+
+    def has_looped(self):
+        """
+        Is the transition leading to this node a path we've followed before?
+        (see Trace.has_looped)
+        """
+        endstate = self.state
+        if hasattr(endstate, 'fromsplit'):
+            # We have a state that was created from a SplitValue.  It will have
+            # the same location as the state before it (before the split).
+            # Don't treat it as a loop:
+            return False
+        if endstate.not_returning:
+            # The handler not "exit" etc leads to a transition that has a
+            # repeated location:
+            return False
+        if self.pathedge is None:
+            return False
+        # (the count includes the transition leading to this node)
+        return self.paths_taken.get(self.pathedge) > 1
+
+class StateMerger(object):
+    """
+    Optional merging of States at join points within the StmtGraph, to avoid
+    the number of traces growing exponentially with the number of branches
+    and calls within a function.
+
+    For each join point, we record one representative State for each merge
+    key seen there (see State.get_merge_key).  When another path reaches the
+    join point with the same key, either:
+      - the existing State already covers it, in which case the path is
+        subsumed, and there's no need to explore it any further, or
+      - we merge the two, widening the values (e.g. two ConcreteValue
+        become a WithinRange), and explore onwards from the merged State,
+        which replaces the old one as the representative.
+
+    Paths through a function thus only multiply with the number of distinct
+    abstract states, rather than with the number of routes through it.
+    """
+    def __init__(self):
+        # Mapping from id(StmtNode) to a dict, mapping from merge keys to
+        # the State representing all of the paths with that key so far.
+        # (StmtNode instances without a gcc.Gimple compare equal to each other,
+        # so we can't use them directly as keys)
+        self.states_at_node = {}
+        self.num_subsumed = 0
+        self.num_merged = 0
+
+    def is_merge_point(self, stmtnode):
+        # A node with more than one predecessor:
+        if len(stmtnode.preds) > 1:
+            return True
+        # The node after a function call, where the various outcomes of the
+        # call (success, failure, etc) rejoin:
+        for edge in stmtnode.preds:
+            if isinstance(edge.srcnode.get_stmt(), gcc.GimpleCall):
+                return True
+        return False
+
+    def merge(self, state):
+        """
+        Return None if the State is subsumed by a State already seen, or the
+        State to explore onwards from: either the input, or a merged State
+        """
+        check_isinstance(state, State)
+        if not self.is_merge_point(state.stmtnode):
+            return state
+        key = state.get_merge_key()
+        table = self.states_at_node.setdefault(id(state.stmtnode), {})
+        s_old = table.get(key)
+        if s_old is None:
+            table[key] = state
+            return state
+        try:
+            s_merged = s_old.union(state)
+        except NotImplementedError:
+            # Don't know how to merge these; explore the new path separately:
+            return state
+        if s_merged is s_old:
+            log('state subsumed by one already seen at %s', state.stmtnode)
+            self.num_subsumed += 1
+            return None
+        log('merging state with one already seen at %s', state.stmtnode)
+        self.num_merged += 1
+        table[key] = s_merged
+        return s_merged
+
+def explore_traces(stmtgraph, facets, limits=None, merge_states=False,
+                   stats=None):
+    """
+    Traverse the tree of traces of program state, yielding Trace instances
+    as each one is completed.
 
     For now, don't include any traces that contain loops, as a primitive
     way of ensuring termination of the analysis
 
-    This is recursive, setting up a depth-first traversal of the state tree.
-    If it's interrupted by a TooComplicated exception, we should at least
-    capture an incomplete list of paths down to some of the bottoms of the
-    tree.
+    This is a depth-first traversal of the state tree, using an explicit
+    stack of TraceNode instances rather than recursion, so that deep
+    functions don't hit Python's recursion limit, and only the frontier of
+    the tree needs to be held in memory.  The traces are yielded in the same
+    order as a recursive depth-first traversal would find them.
+
+    If the limits are exceeded, a TooComplicated exception is raised; all of
+    the complete traces will already have been yielded, and so its
+    complete_traces list will be empty (see its get_trace_order_key for
+    ordering the traces that were yielded).
+
+    If merge_states is True, states reaching a join point are merged with
+    similar states that reached it earlier (see StateMerger), so that fewer
+    traces are generated, at the cost of some precision in the values.  This
+    is also switched on part-way through if the limits become "degraded"
+    (see Limits)
+
+    If stats is a libcpychecker.stats.FunctionStats, the time taken at each
+    kind of statement is recorded into it
     """
     fun = stmtgraph.fun
-    log('iter_traces(%r, %r, %r)', fun, facets, prefix)
-    if prefix is None:
-        prefix = Trace()
-        curstate = State(stmtgraph,
-                         stmtgraph.get_entry_nodes()[0],
-                         None,
-                         facets,
-                         None, None, None)
-        #Resources())
-        curstate.init_for_function(fun)
-        for key in facets:
-            facet_cls = facets[key]
-            f_new = facet_cls(curstate, fun=fun)
-            setattr(curstate, key, f_new)
-            f_new.init_for_function(fun)
+    log('explore_traces(%r, %r)', fun, facets)
+    curstate = State(stmtgraph,
+                     stmtgraph.get_entry_nodes()[0],
+                     None,
+                     facets,
+                     None, None, None)
+    curstate.init_for_function(fun)
+    for key in facets:
+        facet_cls = facets[key]
+        f_new = facet_cls(curstate, fun=fun)
+        setattr(curstate, key, f_new)
+        f_new.init_for_function(fun)
+
+    if merge_states:
+        merger = StateMerger()
     else:
-        check_isinstance(prefix, Trace)
-        curstate = prefix.states[-1]
+        merger = None
 
-        if curstate.has_returned:
-            # This state has returned a value (and hence terminated):
-            return [prefix]
+    stack = [TraceNode(None, None, curstate)]
+    while stack:
+        node = stack.pop()
+        curstate = node.state
 
-        if curstate.not_returning:
-            # This state has called "exit" or similar, and thus this
-            # trace should terminate:
-            return [prefix]
+        if node.transition:
+            check_isinstance(node.transition, Transition)
+            curstate.verify()
 
-        # Stop interpreting when you see a loop, to ensure termination:
-        if prefix.has_looped():
-            log('loop detected; stopping iteration')
-            if 0:
-                gcc.inform(curstate.get_gcc_loc(fun),
-                           'loop detected; stopping iteration')
-            # Don't return the prefix so far: it is not a complete trace
-            return []
-
-    # We need the prevstate in order to handle Phi nodes
-    if len(prefix.states) > 1:
-        prevstate = prefix.states[-2]
-    else:
-        prevstate = None
+            # Potentially raise a TooComplicated exception:
+            if limits:
+                try:
+                    limits.on_transition(node.transition, [])
+                except TooComplicated:
+                    err = sys.exc_info()[1]
+                    err.interrupted_at = node.parent
+                    raise
+
+                # Switch to the cheaper mode once the limits say so:
+                if limits.degraded and merger is None:
+                    merger = StateMerger()
+
+            if curstate.has_returned:
+                # This state has returned a value (and hence terminated):
+                yield node.to_trace()
+                continue
 
-    prefix.log(log, 'PREFIX')
-    log('  %s:%s', fun.decl.name, curstate.stmtnode)
-    try:
-        transitions = curstate.get_transitions()
-        check_isinstance(transitions, list)
-    except PredictedError:
-        # We're at a terminating state:
-        err = sys.exc_info()[1]
-        err.loc = prefix.get_last_stmt().loc
-        trace_with_err = prefix.copy()
-        trace_with_err.add_error(err)
-        trace_with_err.log(log, 'FINISHED TRACE WITH ERROR: %s' % err)
-        return [trace_with_err]
-    except SplitValue:
-        # Split the state up, splitting into parallel worlds with different
-        # values for the given value
-        # FIXME: this doesn't work; it thinks it's a loop :(
-        err = sys.exc_info()[1]
-        transitions = err.split(curstate)
-        check_isinstance(transitions, list)
+            if curstate.not_returning:
+                # This state has called "exit" or similar, and thus this
+                # trace should terminate:
+                yield node.to_trace()
+                continue
+
+            # Stop interpreting when you see a loop, to ensure termination:
+            if node.has_looped():
+                log('loop detected; stopping iteration')
+                # Don't yield the prefix so far: it is not a complete trace
+                if limits:
+                    limits.loops_dropped += 1
+                continue
 
-    log('transitions: %s', transitions)
+            # Merge states arriving at a join point (but not those created by
+            # a SplitValue, which are at the same location as their source):
+            if merger and node.transition.src.stmtnode is not curstate.stmtnode:
+                s_merged = merger.merge(curstate)
+                if s_merged is None:
+                    # Subsumed by a path already explored:
+                    continue
+                if s_merged is not curstate:
+                    node = TraceNode(node, Transition(curstate, s_merged, None))
+                    curstate = s_merged
+
+        if log.is_enabled():
+            node.to_trace().log(log, 'PREFIX')
+        log('  %s:%s', fun.decl.name, curstate.stmtnode)
+        if stats:
+            start_wall = time.time()
+        try:
+            try:
+                transitions = curstate.get_transitions()
+            finally:
+                if stats:
+                    stats.on_stmt(curstate.stmtnode, start_wall)
+            check_isinstance(transitions, list)
+        except PredictedError:
+            # We're at a terminating state:
+            err = sys.exc_info()[1]
+            err.loc = curstate.stmtnode.get_stmt().loc
+            trace_with_err = node.to_trace()
+            trace_with_err.add_error(err)
+            if log.is_enabled():
+                trace_with_err.log(log, 'FINISHED TRACE WITH ERROR: %s' % err)
+            yield trace_with_err
+            continue
+        except SplitValue:
+            # Split the state up, splitting into parallel worlds with different
+            # values for the given value
+            err = sys.exc_info()[1]
+            transitions = err.split(curstate)
+            check_isinstance(transitions, list)
 
-    if len(transitions) > 0:
-        result = []
-        for transition in transitions:
-            check_isinstance(transition, Transition)
-            transition.dest.verify()
+        log('transitions: %s', transitions)
 
-            # Potentially raise a TooComplicated exception:
-            if limits:
-                limits.on_transition(transition, result)
+        if transitions:
+            # Push in reverse order, so that the first transition is the
+            # first to be explored:
+            for transition in reversed(transitions):
+                stack.append(TraceNode(node, transition))
+        else:
+            # We're at a terminating state:
+            trace = node.to_trace()
+            if log.is_enabled():
+                trace.log(log, 'FINISHED TRACE')
+            yield trace
 
-            newprefix = prefix.copy().add(transition)
+def iter_traces(stmtgraph, facets, limits=None, merge_states=False,
+                stats=None):
+    """
+    Traverse the tree of traces of program state, returning a list
+    of Trace instances (see explore_traces for a streaming version of this)
 
-            # Recurse
-            # This gives us a depth-first traversal of the state tree
-            try:
-                for trace in iter_traces(stmtgraph, facets, newprefix, limits,
-                                         depth + 1):
-                    result.append(trace)
-            except TooComplicated:
-                err = sys.exc_info()[1]
-                traces = err.complete_traces
-                traces += result
-                raise TooComplicated(traces)
-        return result
-    else:
-        # We're at a terminating state:
-        prefix.log(log, 'FINISHED TRACE')
-        return [prefix]
+    If it's interrupted by a TooComplicated exception, we should at least
+    capture an incomplete list of paths down to some of the bottoms of the
+    tree.
+    """
+    result = []
+    try:
+        for trace in explore_traces(stmtgraph, facets, limits, merge_states,
+                                    stats):
+            result.append(trace)
+    except TooComplicated:
+        err = sys.exc_info()[1]
+        result.sort(key=err.get_trace_order_key())
+        newerr = TooComplicated(result, err.reason)
+        newerr.interrupted_at = err.interrupted_at
+        raise newerr
+    return result
 
 class StateGraph:
     """
@@ -0,0 +1,302 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+"""
+An on-disk cache of the results of the refcount checker, so that unchanged
+functions don't need to be re-analyzed when a file is recompiled.
+
+Entries are keyed by a hash of everything that the results of checking a
+function can depend on:
+
+  - the statements and control flow of the function (walking its StmtGraph),
+    together with the types and locations involved
+
+  - the layouts of those types: the fields of structs, and what typedefs
+    refer to (since these can change within a header without changing the
+    names of the types)
+
+  - the source lines of the function (which are quoted within the
+    diagnostics)
+
+  - the attributes recorded on the functions that it might call
+
+  - the source code of the checker itself (including the HTML report
+    generator), and the options it was run with
+
+  - the dump base name of the compilation, since the names of the report
+    files (and the diagnostics that mention them) are based on it
+
+Each entry holds the diagnostics captured from the run (as recorded by
+CapturedDiagnostics), along with the contents of any report files that were
+written out, and the data for any report added to the bundle for the
+translation unit (see reportbundle.py), so that all of these can be replayed
+on a subsequent hit.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import gcc
+from gccutils import check_isinstance
+from gccutils.graph.stmtgraph import StmtGraph
+
+# Bump this if the format of the entries changes:
+CACHE_FORMAT_VERSION = 2
+
+def get_cache_dir():
+    """
+    Get the default location of the cache, following the XDG Base Directory
+    Specification
+    """
+    base = os.environ.get('XDG_CACHE_HOME')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'cpychecker')
+
+_checker_version = None
+
+def get_checker_version():
+    """
+    Get a hash of the source code of the checker, so that cache entries
+    created by one version of the checker aren't used by another
+    """
+    global _checker_version
+    if _checker_version is None:
+        h = hashlib.sha1()
+        h.update(('%i %s' % (CACHE_FORMAT_VERSION, gcc.GCC_VERSION))
+                 .encode('utf-8'))
+        import libcpychecker
+        import libcpychecker_html
+        import gccutils
+        for pkg in (libcpychecker, libcpychecker_html, gccutils):
+            for dirpath, dirnames, filenames in os.walk(os.path.dirname(pkg.__file__)):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    # (the HTML reports also embed the stylesheets, scripts,
+                    # and list of API entrypoints):
+                    if filename.endswith(('.py', '.css', '.js', '.txt')):
+                        with open(os.path.join(dirpath, filename), 'rb') as f:
+                            h.update(f.read())
+        _checker_version = h.hexdigest()
+    return _checker_version
+
+def _describe_stmt(stmt, note_type):
+    """
+    Get a list of strings describing the given gcc.Gimple, including the
+    types of each of its operands (which are also passed to note_type)
+    """
+    result = [stmt.__class__.__name__, str(stmt)]
+    if stmt.loc:
+        result.append('%i:%i' % (stmt.loc.line, stmt.loc.column))
+    def add_type(node):
+        if hasattr(node, 'type'):
+            result.append(str(node.type))
+            note_type(node.type)
+    stmt.walk_tree(add_type)
+    return result
+
+def _describe_stmtnode(stmtnode, note_type):
+    if stmtnode.stmt:
+        return _describe_stmt(stmtnode.stmt, note_type)
+    else:
+        return [stmtnode.__class__.__name__]
+
+def _describe_type_layout(t):
+    """
+    Get a list of strings describing what the given gcc.Type is, rather than
+    just its name: its kind, size and signedness, and for a struct, the name
+    and type of each of its fields.  For a typedef, this describes the type
+    that it refers to
+    """
+    result = [t.__class__.__name__]
+    try:
+        result.append(str(t.sizeof))
+    except TypeError:
+        # (incomplete types don't have a size)
+        pass
+    if isinstance(t, gcc.IntegerType):
+        result.append(str(t.unsigned))
+    if isinstance(t, gcc.RecordType):
+        for field in t.fields:
+            result.append('%s %s' % (field.name, field.type))
+    return result
+
+def _describe_stmtedge(edge):
+    result = []
+    if edge.cfgedge:
+        result.append('%s %s' % (edge.cfgedge.true_value,
+                                 edge.cfgedge.false_value))
+    for cle in sorted([str(cle) for cle in edge.caselabelexprs]):
+        result.append(cle)
+    return result
+
+def get_function_key(fun, stmtgraph=None, **options):
+    """
+    Get the cache key (a hex string) for checking the given gcc.Function
+    with the given options
+    """
+    check_isinstance(fun, gcc.Function)
+    from libcpychecker.attributes import fnnames_returning_borrowed_refs, \
+        fnnames_setting_exception, \
+        fnnames_setting_exception_on_negative_result, \
+        stolen_refs_by_fnname
+    from libcpychecker.types import get_PyObject, is_py3k, is_debug_build
+
+    h = hashlib.sha1()
+    def add(*parts):
+        for part in parts:
+            h.update(str(part).encode('utf-8'))
+            h.update(b'\0')
+
+    # The types used by the function (and those that they point to), in the
+    # order in which we first see them, so that their layouts can be added:
+    types = []
+    seen_types = set()
+    def note_type(t):
+        while t is not None and t not in seen_types:
+            seen_types.add(t)
+            types.append(t)
+            if not isinstance(t, (gcc.PointerType, gcc.ArrayType)):
+                break
+            t = t.dereference
+
+    add(get_checker_version())
+    for name in sorted(options):
+        add(name, options[name])
+
+    # The report files are named after the dump base name:
+    add(gcc.get_dump_base_name())
+
+    # The function itself:
+    add(fun.decl.name, fun.start.file, fun.decl.type)
+    note_type(fun.decl.type.type)
+    for parm in fun.decl.arguments or []:
+        add(parm.name, parm.type)
+        note_type(parm.type)
+    for local in fun.local_decls or []:
+        add(local.name, local.type, local.static)
+        note_type(local.type)
+
+    # Its statements and control flow.  The nodes of a StmtGraph are
+    # unordered, but the edges are numbered in the order in which they were
+    # built (following the order of the basic blocks), so use that order,
+    # numbering the nodes as we first see them:
+    if stmtgraph is None:
+        stmtgraph = StmtGraph(fun, False, omit_complex_edges=True)
+    nodeidx = {}
+    def add_node(node):
+        if id(node) not in nodeidx:
+            nodeidx[id(node)] = len(nodeidx)
+            add('node', *_describe_stmtnode(node, note_type))
+        return nodeidx[id(node)]
+    add_node(stmtgraph.entry)
+    for edge in sorted(stmtgraph.edges, key=lambda edge: edge.sortidx):
+        src = add_node(edge.srcnode)
+        dst = add_node(edge.dstnode)
+        add('edge', src, dst, *_describe_stmtedge(edge))
+
+    # The layouts of the types:
+    for t in types:
+        add('type', t, *_describe_type_layout(t))
+
+    # The source lines quoted by the diagnostics:
+    try:
+        with open(fun.start.file) as f:
+            lines = f.readlines()
+        add(*lines[fun.decl.location.line - 1:fun.end.line])
+    except IOError:
+        pass
+
+    # What we know about the other functions and types:
+    add(sorted(fnnames_returning_borrowed_refs),
+        sorted(fnnames_setting_exception),
+        sorted(fnnames_setting_exception_on_negative_result),
+        sorted([(fnname, sorted(indices))
+                for fnname, indices in stolen_refs_by_fnname.items()]))
+    if get_PyObject():
+        add(is_py3k(), is_debug_build())
+
+    return h.hexdigest()
+
+class ResultCache(object):
+    """
+    The on-disk cache, within the given directory (or the default location)
+    """
+    def __init__(self, path=None):
+        if path is None:
+            path = get_cache_dir()
+        self.path = path
+
+    def _get_filename(self, key):
+        return os.path.join(self.path, key[:2], '%s.json' % key)
+
+    def lookup(self, key):
+        """
+        Get a (records, files, bundle) triple for the given key, or None if
+        there's no usable entry, where "records" is a list of diagnostics as
+        captured by CapturedDiagnostics, "files" is a list of (filename, text)
+        pairs, and "bundle" is the data added to the report bundle (or None)
+        """
+        try:
+            with open(self._get_filename(key)) as f:
+                js = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if js.get('version') != CACHE_FORMAT_VERSION:
+            return None
+        records = [(kind, tuple(loc), msg)
+                   for kind, loc, msg in js['diagnostics']]
+        files = [(filename, text)
+                 for filename, text in js['files']]
+        return records, files, js.get('bundle')
+
+    def store(self, key, records, files, bundle=None):
+        """
+        Store an entry, failing silently if the cache can't be written to
+        """
+        js = dict(version=CACHE_FORMAT_VERSION,
+                  diagnostics=records,
+                  files=files,
+                  bundle=bundle)
+        filename = self._get_filename(key)
+        try:
+            dirname = os.path.dirname(filename)
+            if not os.path.isdir(dirname):
+                try:
+                    os.makedirs(dirname)
+                except OSError:
+                    # (another compilation may have just created it)
+                    if not os.path.isdir(dirname):
+                        raise
+            # Write to a temporary file, and then rename it into place, so
+            # that concurrent compilations never see a partially-written
+            # entry:
+            fd, tmpname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(js, f)
+                os.rename(tmpname, filename)
+            except:
+                # Don't leave the temporary file behind:
+                try:
+                    os.unlink(tmpname)
+                except OSError:
+                    pass
+                raise
+        except (IOError, OSError):
+            pass
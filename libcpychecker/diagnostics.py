@@ -28,6 +28,114 @@ from gccutils import get_src_for_loc, check_isinstance
 from libcpychecker.visualizations import HtmlRenderer
 from libcpychecker.utils import log
 
+# Where diagnostics go.  If None, they are emitted directly via GCC's
+# diagnostic interface, otherwise they're appended to the given
+# CapturedDiagnostics instance, to be replayed later (e.g. within the parent
+# of a worker process)
+_capture = None
+
+class CapturedDiagnostics(object):
+    """
+    Context manager for capturing diagnostics as plain data, rather than
+    emitting them.
+
+    Each record is a (kind, (filename, line, column), msg) tuple, where kind
+    is 'warning' or 'inform'; this can be pickled, and so can be sent from a
+    worker process back to its parent, where it can be passed to
+    replay_diagnostics()
+
+    If passthrough is true, the diagnostics are also passed on to wherever
+    they would have gone without this capture
+    """
+    def __init__(self, passthrough=False):
+        self.records = []
+        self.passthrough = passthrough
+        self._prev = None
+
+    def __enter__(self):
+        global _capture
+        self._prev = _capture
+        _capture = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _capture
+        _capture = self._prev
+
+    def add(self, kind, loc, msg):
+        self.records.append((kind, (loc.file, loc.line, loc.column), msg))
+        if self.passthrough:
+            _emit(self._prev, kind, loc, msg)
+
+def _emit(capture, kind, loc, msg):
+    if capture is not None:
+        capture.add(kind, loc, msg)
+    elif kind == 'warning':
+        gcc.warning(loc, msg)
+    else:
+        gcc.inform(loc, msg)
+
+def emit_warning(loc, msg):
+    _emit(_capture, 'warning', loc, msg)
+
+def emit_inform(loc, msg):
+    _emit(_capture, 'inform', loc, msg)
+
+def get_locations_by_key(fun):
+    """
+    Get a dict mapping from (filename, line, column) to the gcc.Location
+    instances within the given gcc.Function
+    """
+    result = {}
+    def add(loc):
+        if loc:
+            key = (loc.file, loc.line, loc.column)
+            if key not in result:
+                result[key] = loc
+    add(fun.start)
+    add(fun.end)
+    add(fun.decl.location)
+    for bb in fun.cfg.basic_blocks:
+        if bb.gimple:
+            for stmt in bb.gimple:
+                add(stmt.loc)
+    return result
+
+def replay_diagnostics(fun, records):
+    """
+    Emit the diagnostics captured by a CapturedDiagnostics instance, for the
+    given gcc.Function
+    """
+    locations = get_locations_by_key(fun)
+    for kind, key, msg in records:
+        loc = _get_location_for_key(fun, locations, tuple(key))
+        if loc is None:
+            # Every location we report on ought to be that of a statement
+            # within the function; if it isn't, report at the end of the
+            # function, but keep the original position within the message,
+            # rather than claiming that it's on the wrong line:
+            loc = fun.end
+            msg = '%s:%i:%i: %s' % (key[0], key[1], key[2], msg)
+        _emit(_capture, kind, loc, msg)
+
+def _get_location_for_key(fun, locations, key):
+    """
+    Get a gcc.Location for the given (filename, line, column) key, or None
+    """
+    if key in locations:
+        return locations[key]
+    # Otherwise, rebuild it from another location on the same line, if this
+    # version of the plugin is able to:
+    filename, line, column = key
+    for other in locations.values():
+        if other.file == filename and other.line == line:
+            if hasattr(other, 'offset_column'):
+                loc = other.offset_column(column - other.column)
+                if (loc.file, loc.line, loc.column) == key:
+                    locations[key] = loc
+                    return loc
+    return None
+
 class Annotator:
     """
     A collection of hooks for use when describing a trace (either as text,
@@ -99,23 +207,84 @@ class Reporter:
     instances, and only fully flushing one of them within each equivalence
     class
     """
-    def __init__(self):
+    def __init__(self, suppress_duplicates=False):
         self.reports = []
         self._got_warnings = False
 
+        # If suppress_duplicates is true, then make_warning() checks for an
+        # earlier equivalent warning before building a new Report, and if
+        # there is one, simply counts the new one against it (returning a
+        # SuppressedReport), avoiding the cost of describing its trace.
+        # A mapping from duplicate key to the first Report with that key:
+        self.suppress_duplicates = suppress_duplicates
+        self._first_report_by_key = {}
+
+        # A mapping from duplicate key to the list of reports with that key
+        # that sort_reports could still choose to build in full: the first
+        # Report, followed by SuppressedReport instances (see
+        # _add_candidate):
+        self._candidates_by_key = {}
+
     def make_warning(self, fun, loc, msg):
         assert isinstance(fun, gcc.Function)
         assert isinstance(loc, gcc.Location)
 
         self._got_warnings = True
 
+        if self.suppress_duplicates:
+            key = get_duplicate_key(fun, loc, msg)
+            first = self._first_report_by_key.get(key)
+            if first:
+                first.num_suppressed += 1
+                suppressed = SuppressedReport(fun, loc, msg)
+                self._add_candidate(key, suppressed)
+                return suppressed
+
         w = Report(fun, loc, msg)
         self.reports.append(w)
+        if self.suppress_duplicates:
+            self._first_report_by_key[key] = w
+            self._candidates_by_key[key] = [w]
 
         w.add_warning(loc, msg)
 
         return w
 
+    def _add_candidate(self, key, report):
+        """
+        Add a SuppressedReport to the candidates for the given key, discarding
+        (along with their traces) those that sort_reports can no longer choose
+
+        The traces arrive in depth-first order, and sort_reports prefers the
+        one that diverges from the path being explored when the limits were
+        hit at the deepest point (see TooComplicated.get_trace_order_key).
+        Wherever that turns out to be, an earlier candidate that diverges from
+        the latest trace at least as deeply as a later one will be preferred
+        to it, so the later one can be dropped.  The depths of the candidates
+        that remain strictly increase, so there are never more of them than
+        there are transitions in the latest trace, however many duplicates
+        there are.
+        """
+        candidates = self._candidates_by_key[key]
+        latest = candidates[-1]
+        if latest.trace is not None:
+            def get_depth(candidate):
+                if candidate.trace is None:
+                    return 0
+                return candidate.trace.get_common_prefix_length(latest.trace)
+            kept = [candidates[0]]
+            best_depth = get_depth(candidates[0])
+            for candidate in candidates[1:-1]:
+                depth = get_depth(candidate)
+                if depth > best_depth:
+                    kept.append(candidate)
+                    best_depth = depth
+            if latest is not candidates[0]:
+                kept.append(latest)
+            candidates = kept
+        candidates.append(report)
+        self._candidates_by_key[key] = candidates
+
     def make_debug_dump(self, fun, loc, msg):
         assert isinstance(fun, gcc.Function)
         assert isinstance(loc, gcc.Location)
@@ -159,27 +328,65 @@ class Reporter:
         with open(filename, 'w') as f:
             f.write(html)
 
-    def remove_duplicates(self):
+    def remove_duplicates(self, get_key=None):
         """
         Try to organize Report instances into equivalence classes, and only
         keep the first Report within each class
+
+        get_key: an optional callable, taking a Report and returning a
+        hashable value, to be used instead of Report.get_duplicate_key() to
+        decide which reports are equivalent
         """
-        for report in self.reports[:]:
-            # The report might have been removed during the iteration:
-            if report.is_duplicate:
-                continue
-            for candidate in self.reports[:]:
-                if report != candidate and not report.is_duplicate:
-                    if candidate.is_duplicate_of(report):
-                        report.add_duplicate(candidate)
-                        self.reports.remove(candidate)
+        if get_key is None:
+            get_key = lambda report: report.get_duplicate_key()
+
+        # Group the reports in a single pass, keeping the first report
+        # within each equivalence class (and the order of those reports):
+        first_by_key = {}
+        reports = []
+        for report in self.reports:
+            key = get_key(report)
+            first = first_by_key.get(key)
+            if first is None:
+                first_by_key[key] = report
+                reports.append(report)
+            else:
+                first.add_duplicate(report)
+        self.reports = reports
 
         # Add a note to each report that survived about any duplicates:
         for report in self.reports:
-            if report.duplicates:
+            num_similar = len(report.duplicates) + report.num_suppressed
+            if num_similar:
                 report.add_note(report.loc,
                                 ('found %i similar trace(s) to this'
-                                 % len(report.duplicates)))
+                                 % num_similar))
+
+    def sort_reports(self, get_key):
+        """
+        Stably sort the reports, using get_key, a callable taking a Trace
+        (or None) and returning a value to sort by.
+
+        If duplicates are being suppressed, then within each equivalence
+        class, the report whose trace sorts first becomes the one that is
+        built in full (as if it had been made first)
+        """
+        if self.suppress_duplicates:
+            index_by_id = dict([(id(report), i)
+                                for i, report in enumerate(self.reports)])
+            for key, candidates in self._candidates_by_key.items():
+                first = candidates[0]
+                # (min() gives the earliest of any that sort equally):
+                best = min(candidates,
+                           key=lambda report: get_key(report.trace))
+                if best is first:
+                    continue
+                w = best.build()
+                w.num_suppressed = first.num_suppressed
+                self.reports[index_by_id[id(first)]] = w
+                self._first_report_by_key[key] = w
+                self._candidates_by_key[key] = [w]
+        self.reports.sort(key=lambda report: get_key(report.trace))
 
     def flush(self):
         for r in self.reports:
@@ -198,11 +405,11 @@ class SavedDiagnostic:
 
 class SavedWarning(SavedDiagnostic):
     def flush(self):
-        gcc.warning(self.loc, self.msg)
+        emit_warning(self.loc, self.msg)
 
 class SavedInform(SavedDiagnostic):
     def flush(self):
-        gcc.inform(self.loc, self.msg)
+        emit_inform(self.loc, self.msg)
 
 class Report:
     """
@@ -220,6 +427,9 @@ class Report:
         # De-duplication handling:
         self.is_duplicate = False
         self.duplicates = [] # list of Report
+        # The number of equivalent reports that were never built (see
+        # Reporter.suppress_duplicates):
+        self.num_suppressed = 0
 
     def add_warning(self, loc, msg):
         # Add a gcc.warning() to the buffer of GCC diagnostics
@@ -253,20 +463,20 @@ class Report:
     def get_annotator_for_trace(self, trace):
         return self._annotators.get(trace)
 
-    def is_duplicate_of(self, other):
-        check_isinstance(other, Report)
+    def get_duplicate_key(self):
+        """
+        Get a hashable value, such that reports with equal keys are
+        considered to be duplicates of each other.
 
-        # Simplistic equivalence classes for now:
-        # the same function, source location, and message; everything
-        # else can be different
-        if self.fun != other.fun:
-            return False
-        if self.loc != other.loc:
-            return False
-        if self.msg != other.msg:
-            return False
+        Simplistic equivalence classes for now: the same function, source
+        location, and message; everything else can be different.  Subclasses
+        can override this to use stronger keys
+        """
+        return get_duplicate_key(self.fun, self.loc, self.msg)
 
-        return True
+    def is_duplicate_of(self, other):
+        check_isinstance(other, Report)
+        return self.get_duplicate_key() == other.get_duplicate_key()
 
     def add_duplicate(self, other):
         assert not self.is_duplicate
@@ -293,6 +503,50 @@ class Report:
         return result
 
 
+class SuppressedReport(Report):
+    """
+    Stands in for a Report that duplicates an earlier one.  Rather than
+    describing its trace, it merely records what's added to it, so that it
+    can be built in full later if need be (see Reporter.sort_reports)
+    """
+    def __init__(self, fun, loc, msg):
+        Report.__init__(self, fun, loc, msg)
+        # A list of (method name, args) pairs:
+        self._calls = []
+
+    def add_warning(self, loc, msg):
+        self._calls.append(('add_warning', (loc, msg)))
+
+    def add_inform(self, loc, msg):
+        self._calls.append(('add_inform', (loc, msg)))
+
+    def add_trace(self, trace, annotator=None):
+        self.trace = trace
+        self._calls.append(('add_trace', (trace, annotator)))
+
+    def add_note(self, loc, msg):
+        self._calls.append(('add_note', (loc, msg)))
+        return Note(loc, msg)
+
+    def build(self):
+        """
+        Build the full Report that this stands in for
+        """
+        w = Report(self.fun, self.loc, self.msg)
+        w.add_warning(self.loc, self.msg)
+        for methname, args in self._calls:
+            getattr(w, methname)(*args)
+        return w
+
+def get_duplicate_key(fun, loc, msg):
+    """
+    Get the default key for de-duplicating reports (see
+    Report.get_duplicate_key)
+    """
+    # (gcc.Location instances compare equal by file, line and column,
+    # but hash by their underlying location_t, so use the former):
+    return (fun, (loc.file, loc.line, loc.column), msg)
+
 class Note:
     """
     A note within a self
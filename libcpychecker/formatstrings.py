@@ -473,7 +473,7 @@ def check_pyargs(fun):
 
     if fun.cfg:
         for bb in fun.cfg.basic_blocks:
-            if isinstance(bb.gimple, list):
+            if isinstance(bb.gimple, (list, tuple)):
                 for stmt in bb.gimple:
                     if stmt.loc:
                         gcc.set_location(stmt.loc)
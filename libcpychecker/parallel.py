@@ -0,0 +1,118 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+"""
+Running the refcount checker on several functions at once, using a pool of
+worker processes
+
+The checker works directly on GCC's own representation of the code, via the
+gcc.* wrapper objects, none of which can be pickled.  Rather than sending
+the functions to the workers, we fork the workers once every function in the
+translation unit has been seen; each worker inherits a copy-on-write
+snapshot of the whole of GCC's state, and only needs to be told the index of
+the function to check.
+
+The workers send back the diagnostics as plain data (as captured by
+CapturedDiagnostics), and the parent then emits them, one function at a
+time, in the order in which the functions were given.  Hence the output
+doesn't depend on which worker finished first.  Likewise for the data for
+the report bundle (see reportbundle.py), which is written out by the parent
+at the end of the translation unit.
+"""
+
+import multiprocessing
+import sys
+import traceback
+
+import gcc
+
+from libcpychecker.diagnostics import CapturedDiagnostics, replay_diagnostics
+from libcpychecker.refcounts import check_refcounts
+from libcpychecker.reportbundle import add_to_bundle, take_bundled_reports
+
+# The functions to be checked, and the keyword arguments for
+# check_refcounts.  These are set up in the parent before the workers are
+# forked, and are inherited by them:
+_functions = []
+_kwargs = {}
+
+def _check_function(idx):
+    """
+    Run within a worker process: check the function with the given index
+    within _functions, returning a (records, bundled, error) triple, where
+    "records" is the list of diagnostics, "bundled" is the list of data added
+    to the report bundle, and "error" is the text of any traceback (or None)
+    """
+    with CapturedDiagnostics() as captured:
+        try:
+            check_refcounts(_functions[idx], **_kwargs)
+            error = None
+        except:
+            # Report the problem in the parent, rather than losing the
+            # results of every other function:
+            error = traceback.format_exc()
+    return captured.records, take_bundled_reports(), error
+
+def _make_pool(jobs):
+    # We rely on the workers inheriting GCC's state, so they must be forked:
+    if hasattr(multiprocessing, 'get_context'):
+        return multiprocessing.get_context('fork').Pool(jobs)
+    else:
+        return multiprocessing.Pool(jobs)
+
+def check_refcounts_in_parallel(functions, jobs, **kwargs):
+    """
+    Run check_refcounts on each of the given gcc.Function instances, using
+    up to "jobs" worker processes, emitting the diagnostics for each function
+    in turn, in the order given
+    """
+    global _functions
+    global _kwargs
+
+    if jobs < 2 or len(functions) < 2:
+        for fun in functions:
+            check_refcounts(fun, **kwargs)
+        return
+
+    if kwargs.get('stats'):
+        # Create the file before forking, so that the workers all append to
+        # it:
+        from libcpychecker.stats import start_stats_file
+        start_stats_file()
+
+    _functions = list(functions)
+    _kwargs = kwargs
+    pool = _make_pool(min(jobs, len(_functions)))
+    try:
+        # (functions vary greatly in how long they take to check, so hand them
+        # out one at a time):
+        results = pool.map(_check_function, range(len(_functions)),
+                           chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+        _functions = []
+        _kwargs = {}
+
+    for fun, (records, bundled, error) in zip(functions, results):
+        replay_diagnostics(fun, records)
+        for data, dump_json in bundled:
+            add_to_bundle(data, dump_json)
+        if error:
+            sys.stderr.write(error)
+            gcc.error(fun.start,
+                      ('unhandled Python exception within the refcount checker for %s'
+                       % fun.decl.name))
@@ -0,0 +1,380 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+"""
+A persistent mapping, for use as the stores within absinterp.State
+
+Every transition within the abstract interpreter clones its source State and
+then modifies a handful of entries in the clone.  Copying a whole dict for
+each transition makes the cost of a transition proportional to the size of
+the state, rather than to the size of the change.
+
+PersistentMap is a hash array mapped trie (HAMT): copy() is O(1), sharing
+the whole trie with the original, and writes copy only the path from the
+root to the affected leaf (O(log32 n) nodes).  Nodes created since the last
+copy() are owned by the map that created them, and are updated in-place, so
+that a burst of writes to a freshly-copied map doesn't repeatedly copy the
+same path.
+
+Iteration follows the insertion order of the keys, as per OrderedDict:
+overwriting an existing key keeps its position, deleting it and adding it
+again moves it to the end.  Ordering the entries needs a sort, so the
+ordered snapshot is cached until the next write; callers that don't care about
+the order (such as the self-checks and the state merging, which run for every
+State) should use unordered_items() instead.
+"""
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+
+# Python's hash() values are at most 64 bits wide (after masking); once we
+# run out of hash bits, keys with identical hashes go into a _CollisionNode:
+_HASH_MASK = (1 << 64) - 1
+_MAX_SHIFT = 64
+
+def _popcount(x):
+    return bin(x).count('1')
+
+class _Entry(object):
+    """
+    A leaf within the trie: a (key, value) pair, plus the hash of the key
+    and the insertion sequence number (for iteration order)
+    """
+    __slots__ = ('key', 'hash', 'seq', 'value')
+
+    def __init__(self, key, hash_, seq, value):
+        self.key = key
+        self.hash = hash_
+        self.seq = seq
+        self.value = value
+
+class _BitmapNode(object):
+    """
+    An interior node, holding up to 32 children (each either an _Entry or a
+    subnode), packed into a list, indexed by the bits of the bitmap
+    """
+    __slots__ = ('bitmap', 'children', 'edit')
+
+    def __init__(self, bitmap, children, edit):
+        self.bitmap = bitmap
+        self.children = children
+        self.edit = edit
+
+    def editable(self, edit):
+        if self.edit is edit:
+            return self
+        return _BitmapNode(self.bitmap, self.children[:], edit)
+
+    def find(self, key, hash_, shift):
+        bit = 1 << ((hash_ >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return None
+        child = self.children[_popcount(self.bitmap & (bit - 1))]
+        if isinstance(child, _Entry):
+            if child.hash == hash_ and child.key == key:
+                return child
+            return None
+        return child.find(key, hash_, shift + _BITS)
+
+    def assoc(self, entry, shift, edit):
+        """
+        Return a node with the entry added (or replacing an existing entry
+        with the same key), together with a boolean: did we add a new key?
+        """
+        bit = 1 << ((entry.hash >> shift) & _MASK)
+        idx = _popcount(self.bitmap & (bit - 1))
+        if not self.bitmap & bit:
+            node = self.editable(edit)
+            node.children.insert(idx, entry)
+            node.bitmap |= bit
+            return node, True
+        child = self.children[idx]
+        if isinstance(child, _Entry):
+            if child.hash == entry.hash and child.key == entry.key:
+                newchild = entry
+                added = False
+            else:
+                newchild = _make_node(child, entry, shift + _BITS, edit)
+                added = True
+        else:
+            newchild, added = child.assoc(entry, shift + _BITS, edit)
+            if newchild is child:
+                return self, added
+        node = self.editable(edit)
+        node.children[idx] = newchild
+        return node, added
+
+    def dissoc(self, key, hash_, shift, edit):
+        """
+        Return a node without the given key (or None if the node is now
+        empty), or self if the key isn't present
+        """
+        bit = 1 << ((hash_ >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return self
+        idx = _popcount(self.bitmap & (bit - 1))
+        child = self.children[idx]
+        if isinstance(child, _Entry):
+            if not (child.hash == hash_ and child.key == key):
+                return self
+            newchild = None
+        else:
+            newchild = child.dissoc(key, hash_, shift + _BITS, edit)
+            if newchild is child:
+                return self
+        if newchild is None:
+            if self.bitmap == bit:
+                return None
+            node = self.editable(edit)
+            del node.children[idx]
+            node.bitmap &= ~bit
+            return node
+        node = self.editable(edit)
+        node.children[idx] = newchild
+        return node
+
+    def iter_entries(self):
+        for child in self.children:
+            if isinstance(child, _Entry):
+                yield child
+            else:
+                for entry in child.iter_entries():
+                    yield entry
+
+class _CollisionNode(object):
+    """
+    A node for keys whose hashes are identical in all 64 bits
+    """
+    __slots__ = ('hash', 'entries', 'edit')
+
+    def __init__(self, hash_, entries, edit):
+        self.hash = hash_
+        self.entries = entries
+        self.edit = edit
+
+    def editable(self, edit):
+        if self.edit is edit:
+            return self
+        return _CollisionNode(self.hash, self.entries[:], edit)
+
+    def find(self, key, hash_, shift):
+        for entry in self.entries:
+            if entry.key == key:
+                return entry
+        return None
+
+    def assoc(self, entry, shift, edit):
+        for idx, existing in enumerate(self.entries):
+            if existing.key == entry.key:
+                node = self.editable(edit)
+                node.entries[idx] = entry
+                return node, False
+        node = self.editable(edit)
+        node.entries.append(entry)
+        return node, True
+
+    def dissoc(self, key, hash_, shift, edit):
+        for idx, existing in enumerate(self.entries):
+            if existing.key == key:
+                if len(self.entries) == 1:
+                    return None
+                node = self.editable(edit)
+                del node.entries[idx]
+                return node
+        return self
+
+    def iter_entries(self):
+        return iter(self.entries)
+
+def _make_node(e1, e2, shift, edit):
+    """
+    Build the smallest subtree holding two entries with different keys
+    """
+    if shift >= _MAX_SHIFT:
+        return _CollisionNode(e1.hash, [e1, e2], edit)
+    frag1 = (e1.hash >> shift) & _MASK
+    frag2 = (e2.hash >> shift) & _MASK
+    if frag1 == frag2:
+        return _BitmapNode(1 << frag1,
+                           [_make_node(e1, e2, shift + _BITS, edit)],
+                           edit)
+    if frag1 < frag2:
+        children = [e1, e2]
+    else:
+        children = [e2, e1]
+    return _BitmapNode((1 << frag1) | (1 << frag2), children, edit)
+
+class _EditToken(object):
+    """
+    Identifies the map that is allowed to update nodes in-place
+    """
+    __slots__ = ()
+
+class PersistentMap(object):
+    """
+    A mapping with an O(1) copy(), intended as a drop-in replacement for the
+    OrderedDict instances previously used for State.region_for_var and
+    State.value_for_region
+    """
+    __slots__ = ('_root', '_count', '_nextseq', '_edit', '_ordered')
+
+    def __init__(self, items=None):
+        self._root = None
+        self._count = 0
+        self._nextseq = 0
+        self._edit = _EditToken()
+        self._ordered = None
+        if items is not None:
+            if hasattr(items, 'items'):
+                items = items.items()
+            for key, value in items:
+                self[key] = value
+
+    def copy(self):
+        result = PersistentMap.__new__(PersistentMap)
+        result._root = self._root
+        result._count = self._count
+        result._nextseq = self._nextseq
+        result._ordered = self._ordered
+        result._edit = _EditToken()
+        # All existing nodes are now shared, so neither map may modify them
+        # in-place from now on:
+        self._edit = _EditToken()
+        return result
+
+    def __copy__(self):
+        return self.copy()
+
+    def _find(self, key):
+        if self._root is None:
+            return None
+        return self._root.find(key, hash(key) & _HASH_MASK, 0)
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+    __nonzero__ = __bool__
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __getitem__(self, key):
+        entry = self._find(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry.value
+
+    def get(self, key, default=None):
+        entry = self._find(key)
+        if entry is None:
+            return default
+        return entry.value
+
+    def __setitem__(self, key, value):
+        hash_ = hash(key) & _HASH_MASK
+        existing = self._find(key)
+        if existing is not None:
+            if existing.value is value:
+                return
+            seq = existing.seq
+        else:
+            seq = self._nextseq
+            self._nextseq += 1
+        entry = _Entry(key, hash_, seq, value)
+        if self._root is None:
+            self._root = _BitmapNode(1 << (hash_ & _MASK), [entry], self._edit)
+            added = True
+        else:
+            self._root, added = self._root.assoc(entry, 0, self._edit)
+        if added:
+            self._count += 1
+        self._ordered = None
+
+    def __delitem__(self, key):
+        if self._find(key) is None:
+            raise KeyError(key)
+        self._root = self._root.dissoc(key, hash(key) & _HASH_MASK, 0,
+                                       self._edit)
+        self._count -= 1
+        self._ordered = None
+
+    def pop(self, key, *default):
+        entry = self._find(key)
+        if entry is None:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        del self[key]
+        return entry.value
+
+    def _entries(self):
+        # A snapshot of the entries in insertion order, cached until the next
+        # modification.  Being a snapshot, it's safe to modify the map whilst
+        # iterating over it (SplitValue.split relies on this)
+        if self._ordered is None:
+            if self._root is None:
+                self._ordered = []
+            else:
+                self._ordered = sorted(self._root.iter_entries(),
+                                       key=lambda entry: entry.seq)
+        return self._ordered
+
+    def __iter__(self):
+        return iter([entry.key for entry in self._entries()])
+
+    def unordered_items(self):
+        """
+        Iterate over the (key, value) pairs in no particular order, without
+        sorting them into insertion order.  Unlike items(), this isn't a
+        snapshot: the map mustn't be modified during the iteration
+        """
+        if self._root is None:
+            return
+        for entry in self._root.iter_entries():
+            yield entry.key, entry.value
+
+    def keys(self):
+        return [entry.key for entry in self._entries()]
+
+    def values(self):
+        return [entry.value for entry in self._entries()]
+
+    def items(self):
+        return [(entry.key, entry.value) for entry in self._entries()]
+
+    def __eq__(self, other):
+        if isinstance(other, PersistentMap):
+            if self._root is other._root:
+                return True
+        if not hasattr(other, 'items') or len(self) != len(other):
+            return False
+        for key, value in self.unordered_items():
+            if key not in other or other[key] != value:
+                return False
+        return True
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return ('PersistentMap([%s])'
+                % ', '.join(['(%r, %r)' % (key, value)
+                             for key, value in self.items()]))
@@ -21,7 +21,9 @@
 # for a description of how such code is meant to be written
 
 import sys
+import time
 import gcc
+from six import add_metaclass
 
 from gccutils import cfg_to_dot, invoke_dot, get_src_for_loc, check_isinstance
 
@@ -29,17 +31,20 @@ from libcpychecker.absinterp import *
 from libcpychecker.attributes import fnnames_returning_borrowed_refs, \
     stolen_refs_by_fnname, fnnames_setting_exception, \
     fnnames_setting_exception_on_negative_result
-from libcpychecker.diagnostics import Reporter, Annotator, Note
+from libcpychecker.diagnostics import Reporter, Annotator, Note, \
+    CapturedDiagnostics, emit_warning, emit_inform, replay_diagnostics
 from libcpychecker.PyArg_ParseTuple import PyArgParseFmt, FormatStringWarning,\
     TypeCheckCheckerType, TypeCheckResultType, \
     ConverterCallbackType, ConverterResultType
 from libcpychecker.Py_BuildValue import PyBuildValueFmt, ObjectFormatUnit, \
     CodeSO, CodeN
-from libcpychecker.types import is_py3k, is_debug_build, get_PyObjectPtr, \
-    get_Py_ssize_t
-from libcpychecker.utils import log
+from libcpychecker.types import is_py3k, get_PyObjectPtr, \
+    get_Py_ssize_t, classify_type
+from libcpychecker.utils import get_logger, Lazy
 from libcpychecker import compat
 
+log = get_logger('refcounts')
+
 def stmt_is_assignment_to_count(stmt):
     if hasattr(stmt, 'lhs'):
         if stmt.lhs:
@@ -52,60 +57,10 @@ def stmt_is_assignment_to_count(stmt):
                     return True
 
 def type_is_pyobjptr(t):
-    assert t is None or isinstance(t, gcc.Type)
-    if str(t) == 'struct PyObject *':
-        return True
+    return classify_type(t).is_pyobjptr
 
 def type_is_pyobjptr_subclass(t):
-    assert t is None or isinstance(t, gcc.Type)
-    # It must be a pointer:
-    if not isinstance(t, gcc.PointerType):
-        return False
-
-    # ...to a struct:
-    if not isinstance(t.dereference, gcc.RecordType):
-        return False
-
-    # Obtain the fields of the struct/class
-    # For C++ "fields" will also contain a gcc.TypeDecl for the
-    # type itself, and for any nested types (e.g. typedefs), so filter them
-    # out.  This avoids an infinite recursion for classes with no data, where
-    # the initial decl of the type otherwise would make it appear that there's
-    # a nested copy of the struct inside itself.
-    fields = [field for field in t.dereference.fields
-              if isinstance(field, gcc.FieldDecl)]
-
-    if len(fields) == 0:
-        # Opaque struct: there's nothing we can do.
-        # Assume it's *not* a PyObject subclass:
-        return False
-
-    # if first field is a PyObject subclass, then we're good:
-    if type_is_pyobjptr_subclass(fields[0].type.pointer):
-        return True
-
-    fieldnames = [f.name for f in fields]
-
-    if is_py3k():
-        # For Python 3, the first field must be "ob_base", or it must be "PyObject":
-        if str(t) == 'struct PyObject *':
-            return True
-        if fieldnames[0] != 'ob_base':
-            return False
-    else:
-        # For Python 2, the first two fields must be "ob_refcnt" and "ob_type".
-        # (In a debug build, these are preceded by _ob_next and _ob_prev)
-        # FIXME: debug builds!
-        if is_debug_build():
-            if fieldnames[:4] != ['_ob_next', '_ob_prev',
-                                  'ob_refcnt', 'ob_type']:
-                return False
-        else:
-            if fieldnames[:2] != ['ob_refcnt', 'ob_type']:
-                return False
-
-    # Passed all tests:
-    return True
+    return classify_type(t).is_pyobjptr_subclass
 
 def stmt_is_assignment_to_objptr(stmt):
     if hasattr(stmt, 'lhs'):
@@ -269,6 +224,7 @@ class Outcome:
 
 ############################################################################
 
+@add_metaclass(InternedValueType)
 class RefcountValue(AbstractValue):
     """
     Value for an ob_refcnt field.
@@ -294,6 +250,14 @@ class RefcountValue(AbstractValue):
     """
     __slots__ = ('r_obj', 'relvalue', 'external')
 
+    @classmethod
+    def get_intern_key(cls, loc, r_obj, relvalue, external):
+        # "external" is a WithinRange, which isn't interned, so use its
+        # bounds:
+        return (loc, r_obj, relvalue,
+                external.gcctype, external.loc,
+                external.minvalue, external.maxvalue)
+
     def __init__(self, loc, r_obj, relvalue, external):
         if loc:
             check_isinstance(loc, gcc.Location)
@@ -418,12 +382,42 @@ class RefcountValue(AbstractValue):
                 if self.get_min_value() > rhs.value:
                     return True
 
+    def union(self, v_other):
+        check_isinstance(v_other, RefcountValue)
+        if v_other.relvalue != self.relvalue:
+            raise NotImplementedError('%s.union(%s)'
+                                      % (self.__class__.__name__, v_other))
+        if (v_other.external.minvalue >= self.external.minvalue
+            and v_other.external.maxvalue <= self.external.maxvalue):
+            return self
+        # (build the WithinRange directly, rather than via
+        # WithinRange.make, as "external" must not become a ConcreteValue)
+        external = WithinRange(self.external.gcctype, self.external.loc,
+                               self.external.minvalue, self.external.maxvalue,
+                               v_other.external.minvalue,
+                               v_other.external.maxvalue)
+        return RefcountValue(self.loc, self.r_obj, self.relvalue, external)
+
+    def get_merge_key(self):
+        # Only merge refcounts for which we own the same number of
+        # references, so that leaks are still detected along every path:
+        return ('refcount', self.r_obj, self.relvalue)
+
+    def is_equivalent(self, v_other):
+        if isinstance(v_other, RefcountValue):
+            return (self.r_obj == v_other.r_obj
+                    and self.relvalue == v_other.relvalue
+                    and self.external.is_equivalent(v_other.external))
+        return False
+
 
 class GenericTpDealloc(AbstractValue):
     """
     A function pointer that points to a "typical" tp_dealloc callback
     i.e. one that frees up the underlying memory
     """
+    __slots__ = ()
+
     def get_transitions_for_function_call(self, state, stmt):
         check_isinstance(state, State)
         check_isinstance(stmt, gcc.GimpleCall)
@@ -508,6 +502,9 @@ class CPython(Facet):
                         self.has_gil)
         return f_new
 
+    def get_merge_key(self):
+        return (self.exception_rvalue.get_merge_key(), self.has_gil)
+
     def init_for_function(self, fun):
         log('CPython.init_for_function(%r)', fun)
 
@@ -785,16 +782,19 @@ class CPython(Facet):
         # Claim a Region for the object:
         r_nonnull = self.state.make_heap_region(name, stmt)
 
+        # If the RefcountValue doesn't have a Region yet, associate it
+        # with that of the new object (RefcountValue instances are interned,
+        # so make a new one, rather than modifying it):
+        if not v_refcount.r_obj:
+            v_refcount = RefcountValue(v_refcount.loc, r_nonnull,
+                                       v_refcount.relvalue,
+                                       v_refcount.external)
+
         # Set up ob_refcnt to the given value:
         r_ob_refcnt = self.state.make_field_region(r_nonnull,
                                              'ob_refcnt') # FIXME: this should be a memref and fieldref
         self.state.value_for_region[r_ob_refcnt] = v_refcount
 
-        # If the RefcountValue doesn't have a Region yet, associate it
-        # with that of the new object:
-        if not v_refcount.r_obj:
-            v_refcount.r_obj = r_nonnull
-
         # Ensure that the new object has a sane ob_type:
         if r_typeobj is None:
             # If no specific type object provided by caller, supply one:
@@ -2505,6 +2505,7 @@ class CPython(Facet):
             for k, v in region.fields.items():
                 if v in s_new.value_for_region:
                     del s_new.value_for_region[v]
+            s_new.array_contents.pop(region, None)
             # Set the default value for the whole region to be "DeallocatedMemory"
             s_new.region_for_var[region] = region
             s_new.value_for_region[region] = DeallocatedMemory(None, stmt.loc)
@@ -2739,15 +2740,15 @@ class CPython(Facet):
                 loc = v_arg.loc
                 if not loc:
                     loc = stmt.loc
-                gcc.warning(loc,
-                            ('argument %i had type %s but was expecting a PyObject* (or subclass)'
-                             % (i + base_idx + 1, v_arg.gcctype)))
+                emit_warning(loc,
+                             ('argument %i had type %s but was expecting a PyObject* (or subclass)'
+                              % (i + base_idx + 1, v_arg.gcctype)))
 
         # check NULL-termination:
         if not args or not args[-1].is_null_ptr():
-            gcc.warning(stmt.loc,
-                        ('arguments to %s were not NULL-terminated'
-                         % fnmeta.name))
+            emit_warning(stmt.loc,
+                         ('arguments to %s were not NULL-terminated'
+                          % fnmeta.name))
 
     def impl_PyObject_CallFunctionObjArgs(self, stmt, v_callable, *args):
         fnmeta = FnMeta(name='PyObject_CallFunctionObjArgs',
@@ -4152,7 +4153,7 @@ def warn_about_NULL_without_exception(v_return,
     if not trace.err:
         if (isinstance(v_return, ConcreteValue)
             and v_return.value == 0
-            and str(v_return.gcctype)=='struct PyObject *'):
+            and type_is_pyobjptr(v_return.gcctype)):
 
             if (isinstance(endstate.cpython.exception_rvalue,
                           ConcreteValue)
@@ -4201,13 +4202,91 @@ def warn_about_NULL_without_exception(v_return,
                        % v_return.value))
                 w.add_trace(trace, ExceptionStateAnnotator())
 
+# Inner loop of impl_check_refcounts() below, split out so that it can
+# be run on each trace as it is explored.
+# Adds any problems found within a single Trace to the Reporter
+def check_one_trace(i, trace, fun, rep, show_possible_null_derefs):
+    if log.is_enabled():
+        trace.log(log, 'TRACE %i' % i)
+    if trace.err:
+        # This trace bails early with a fatal error; it probably doesn't
+        # have a return value
+        log('trace.err: %s %r', trace.err, trace.err)
+
+        # Unless explicitly enabled, don't report on NULL pointer
+        # dereferences that are only possible, not definite: it may be
+        # that there are invariants that we know nothing about that mean
+        # that they can't happen:
+        # (similarly for arithmetic issues e.g. negative shift, divide by
+        # zero, etc)
+        if isinstance(trace.err, (NullPtrDereference, NullPtrArgument,
+                                  PredictedArithmeticError)):
+            if not trace.err.isdefinite:
+                if not show_possible_null_derefs:
+                    return
+
+        w = rep.make_warning(fun, trace.err.loc, str(trace.err))
+        w.add_trace(trace)
+        if hasattr(trace.err, 'why'):
+            if trace.err.why:
+                w.add_note(trace.err.loc,
+                           trace.err.why)
+        # FIXME: in our example this ought to mention where the values came from
+        return
+    # Otherwise, the trace proceeds normally
+    v_return = trace.return_value()
+    log('trace.return_value(): %s', Lazy(trace.return_value))
+
+    # Ideally, we should "own" exactly one reference, and it should be
+    # the return value.  Anything else is an error (and there are other
+    # kinds of error...)
+
+    # Locate all PyObject that we touched
+    endstate = trace.states[-1]
+    endstate.log(log)
+    log('return_value: %r', v_return)
+    log('endstate.region_for_var: %r', endstate.region_for_var)
+    log('endstate.value_for_region: %r', endstate.value_for_region)
+
+    if endstate.not_returning:
+        # We have a function that calls exit() or abort() or similar
+        # Don't bother reporting reference leaks etc: the process is
+        # going away
+        return
+
+    # Check the refcount of all Python objects we know about:
+    if hasattr(endstate, 'cpython'):
+        for r_obj, v_ob_refcnt in endstate.cpython.iter_python_refcounts():
+            check_refcount_for_one_object(r_obj, v_ob_refcnt, v_return,
+                                          trace, endstate, fun, rep)
+
+    # Detect returning a deallocated object:
+    if v_return:
+        if isinstance(v_return, PointerToRegion):
+            rvalue = endstate.value_for_region.get(v_return.region, None)
+            if isinstance(rvalue, DeallocatedMemory):
+                w = rep.make_warning(fun,
+                                     endstate.get_gcc_loc(fun),
+                                     'returning pointer to deallocated memory')
+                w.add_trace(trace)
+                w.add_note(rvalue.loc,
+                           'memory deallocated here')
+
+    warn_about_NULL_without_exception(v_return,
+                                      trace, endstate, fun, rep)
+
 def make_stmt_graph(fun):
     stmtgraph = StmtGraph(fun, False, omit_complex_edges=True)
     return stmtgraph
 
 def impl_check_refcounts(fun, dump_traces=False,
                          show_possible_null_derefs=False,
-                         maxtrans=256):
+                         maxtrans=256,
+                         merge_states=False,
+                         interprocedural=False,
+                         suppress_duplicates=False,
+                         stats=None,
+                         limits=None):
     """
     Inner implementation of the refcount checker, checking the refcounting
     behavior of a function, returning a Reporter instance.
@@ -4219,6 +4298,21 @@ def impl_check_refcounts(fun, dump_traces=False,
 
     dump_traces: bool: if True, dump information about the traces through
     the function to stdout (for self tests)
+
+    merge_states: bool: if True, merge similar states at join points in the
+    function, rather than exploring every path separately
+
+    interprocedural: bool: if True, record a summary of the function's
+    behavior, for use when checking functions that call it
+
+    suppress_duplicates: bool: if True, only count warnings that duplicate an
+    earlier one, rather than building a full report for each (which is all
+    that Reporter.remove_duplicates() would keep of them anyway)
+
+    stats: a libcpychecker.stats.FunctionStats to be updated, or None
+
+    limits: the Limits to use (e.g. with time and memory budgets), or None for
+    just the maxtrans limit
     """
     # Abstract interpretation:
     # Walk the CFG, gathering the information we're interested in
@@ -4234,7 +4328,8 @@ def impl_check_refcounts(fun, dump_traces=False,
     if get_PyObject():
         facets['cpython'] = CPython
 
-    limits=Limits(maxtrans=maxtrans)
+    if limits is None:
+        limits = Limits(maxtrans=maxtrans)
 
     stmtgraph = make_stmt_graph(fun)
     if 0:
@@ -4242,22 +4337,42 @@ def impl_check_refcounts(fun, dump_traces=False,
         from gccutils import invoke_dot
         invoke_dot(dot)
 
-    try:
-        traces = iter_traces(stmtgraph,
-                             facets,
-                             limits=limits)
-    except TooComplicated:
-        err = sys.exc_info()[1]
-        gcc.inform(fun.start,
-                   'this function is too complicated for the reference-count checker to fully analyze: not all paths were analyzed')
-        traces = err.complete_traces
+    def on_too_complicated(err):
+        if stats:
+            stats.too_complicated = True
+        if err.reason:
+            emit_inform(fun.start,
+                        ('this function used up %s of the reference-count checker: not all paths were analyzed'
+                         % err.reason))
+        else:
+            emit_inform(fun.start,
+                        'this function is too complicated for the reference-count checker to fully analyze: not all paths were analyzed')
 
     if dump_traces:
-        traces = list(traces)
+        # The selftests need the full list of traces up-front:
+        try:
+            traces = iter_traces(stmtgraph,
+                                 facets,
+                                 limits=limits,
+                                 merge_states=merge_states,
+                                 stats=stats)
+        except TooComplicated:
+            err = sys.exc_info()[1]
+            on_too_complicated(err)
+            traces = err.complete_traces
         dump_traces_to_stdout(traces)
+    else:
+        # Otherwise, check each trace as soon as it has been explored, so
+        # that we don't need to hold all of the traces in memory at once:
+        traces = explore_traces(stmtgraph,
+                                facets,
+                                limits=limits,
+                                merge_states=merge_states,
+                                stats=stats)
 
     # Debug dump of all traces in HTML form:
     if 0:
+        traces = list(traces)
         filename = ('%s.%s-refcount-traces.html'
                     % (gcc.get_dump_base_name(), fun.decl.name))
         rep = Reporter()
@@ -4273,88 +4388,97 @@ def impl_check_refcounts(fun, dump_traces=False,
                    ('graphical debug report for function %r written out to %r'
                     % (fun.decl.name, filename)))
 
-    rep = Reporter()
+    rep = Reporter(suppress_duplicates=suppress_duplicates)
 
-    # Iterate through all traces, adding reports to the Reporter:
-    for i, trace in enumerate(traces):
-        trace.log(log, 'TRACE %i' % i)
-        if trace.err:
-            # This trace bails early with a fatal error; it probably doesn't
-            # have a return value
-            log('trace.err: %s %r', trace.err, trace.err)
-
-            # Unless explicitly enabled, don't report on NULL pointer
-            # dereferences that are only possible, not definite: it may be
-            # that there are invariants that we know nothing about that mean
-            # that they can't happen:
-            # (similarly for arithmetic issues e.g. negative shift, divide by
-            # zero, etc)
-            if isinstance(trace.err, (NullPtrDereference, NullPtrArgument,
-                                      PredictedArithmeticError)):
-                if not trace.err.isdefinite:
-                    if not show_possible_null_derefs:
-                        continue
-
-            w = rep.make_warning(fun, trace.err.loc, str(trace.err))
-            w.add_trace(trace)
-            if hasattr(trace.err, 'why'):
-                if trace.err.why:
-                    w.add_note(trace.err.loc,
-                               trace.err.why)
-            # FIXME: in our example this ought to mention where the values came from
-            continue
-        # Otherwise, the trace proceeds normally
-        v_return = trace.return_value()
-        log('trace.return_value(): %s', trace.return_value())
-
-        # Ideally, we should "own" exactly one reference, and it should be
-        # the return value.  Anything else is an error (and there are other
-        # kinds of error...)
-
-        # Locate all PyObject that we touched
-        endstate = trace.states[-1]
-        endstate.log(log)
-        log('return_value: %r', v_return)
-        log('endstate.region_for_var: %r', endstate.region_for_var)
-        log('endstate.value_for_region: %r', endstate.value_for_region)
-
-        if endstate.not_returning:
-            # We have a function that calls exit() or abort() or similar
-            # Don't bother reporting reference leaks etc: the process is
-            # going away
-            continue
-
-        # Check the refcount of all Python objects we know about:
-        if hasattr(endstate, 'cpython'):
-            for r_obj, v_ob_refcnt in endstate.cpython.iter_python_refcounts():
-                check_refcount_for_one_object(r_obj, v_ob_refcnt, v_return,
-                                              trace, endstate, fun, rep)
+    if interprocedural:
+        from libcpychecker.summaries import SummaryBuilder, record_summary
+        summary_builder = SummaryBuilder(fun)
 
-        # Detect returning a deallocated object:
-        if v_return:
-            if isinstance(v_return, PointerToRegion):
-                rvalue = endstate.value_for_region.get(v_return.region, None)
-                if isinstance(rvalue, DeallocatedMemory):
-                    w = rep.make_warning(fun,
-                                         endstate.get_gcc_loc(fun),
-                                         'returning pointer to deallocated memory')
-                    w.add_trace(trace)
-                    w.add_note(rvalue.loc,
-                               'memory deallocated here')
-
-        warn_about_NULL_without_exception(v_return,
-                                          trace, endstate, fun, rep)
+    # Iterate through all traces, adding reports to the Reporter:
+    try:
+        for i, trace in enumerate(traces):
+            check_one_trace(i, trace, fun, rep, show_possible_null_derefs)
+            if interprocedural:
+                summary_builder.add_trace(trace)
+            if stats:
+                stats.traces += 1
+    except TooComplicated:
+        err = sys.exc_info()[1]
+        on_too_complicated(err)
+        # The traces were checked in depth-first order; put the reports into
+        # the order in which an interrupted traversal finds them (as per
+        # iter_traces), before any duplicates are removed:
+        rep.sort_reports(err.get_trace_order_key())
+    else:
+        # Only summarize functions for which we saw every trace (a summary
+        # that omitted the paths through a loop would be unsound):
+        if (interprocedural
+            and not limits.is_exhausted()
+            and not limits.loops_dropped):
+            summary = summary_builder.get_summary()
+            if summary:
+                record_summary(summary)
+
+    if stats:
+        stats.transitions = limits.trans_seen
+        stats.budget_exceeded = limits.budget_exceeded
+        stats.loops_dropped = limits.loops_dropped
+        stats.degraded = limits.degraded
 
     # (all traces analysed)
 
     return rep
 
 
+# The time spent so far by check_refcounts on the current translation unit,
+# for the total_time_budget:
+_time_spent_on_unit = 0.0
+
+def _reset_time_spent_on_unit(*args):
+    global _time_spent_on_unit
+    _time_spent_on_unit = 0.0
+
+gcc.register_callback(gcc.PLUGIN_FINISH_UNIT,
+                      _reset_time_spent_on_unit)
+
+def make_limits(maxtrans, time_budget, memory_budget, total_time_budget):
+    """
+    Create the Limits for checking a function, with the given budgets (see
+    check_refcounts)
+    """
+    if total_time_budget is not None:
+        remaining = max(total_time_budget - _time_spent_on_unit, 0.0)
+        if time_budget is None or remaining < time_budget:
+            time_budget = remaining
+    if memory_budget is not None:
+        memory_budget = memory_budget * 1024 * 1024
+    return Limits(maxtrans=maxtrans,
+                  time_budget=time_budget,
+                  memory_budget=memory_budget)
+
+def on_limits_finished(limits):
+    global _time_spent_on_unit
+    _time_spent_on_unit += time.time() - limits.start_time
+
+def write_report_files(report_files):
+    for filename, text in report_files:
+        with open(filename, 'w') as f:
+            f.write(text)
+
 def check_refcounts(fun, dump_traces=False, show_traces=False,
                     show_possible_null_derefs=False,
                     show_timings=False,
                     maxtrans=256,
-                    dump_json=False):
+                    dump_json=False,
+                    merge_states=False,
+                    interprocedural=False,
+                    cache=False,
+                    stats=False,
+                    stats_memory=False,
+                    time_budget=None,
+                    memory_budget=None,
+                    total_time_budget=None,
+                    bundle_reports=False):
     """
     The top-level function of the refcount checker, checking the refcounting
     behavior of a function
@@ -4367,17 +4491,82 @@ def check_refcounts(fun, dump_traces=False, show_traces=False,
     show_traces: bool: if True, display a diagram of the state transition graph
 
     show_timings: bool: if True, add timing information to stderr
+
+    merge_states: bool: if True, merge similar states at join points in the
+    function, rather than exploring every path separately
+
+    interprocedural: bool: if True, record a summary of the function's
+    behavior, for use when checking functions that call it
+
+    cache: bool: if True, look up the results in the on-disk cache (see
+    libcpychecker/cache.py), replaying them rather than re-analyzing the
+    function if they are found there, and adding them otherwise
+
+    stats: bool: if True, append performance telemetry for the function to
+    the dump base name + ".cpychecker-stats.jsonl" (see
+    libcpychecker/stats.py)
+
+    stats_memory: bool: if True, include the peak memory allocated whilst
+    checking the function in the telemetry (this slows down the checker, and
+    so skews the timings)
+
+    time_budget: if not None, the number of seconds that the analysis of the
+    function may take (see Limits)
+
+    memory_budget: if not None, the number of megabytes by which the memory
+    usage may grow during the analysis of the function (see Limits)
+
+    total_time_budget: if not None, the number of seconds that the analysis
+    of all of the functions within the translation unit may take (within one
+    process), shared between them in the order in which they're checked
+
+    bundle_reports: bool: if True, rather than writing out HTML reports for
+    the function, add its data to a single report for the whole translation
+    unit (see libcpychecker/reportbundle.py)
+
+    Returns the Reporter instance, or None if the results came from the cache
     """
 
     log('check_refcounts(%r, %r, %r)', fun, dump_traces, show_traces)
 
     # show_timings = 1
 
+    if show_timings or stats:
+        from libcpychecker.stats import FunctionStats, write_function_stats
+        function_stats = FunctionStats(fun, trace_memory=stats_memory)
+        function_stats.start()
+    else:
+        function_stats = None
+
     if show_timings:
-        import time
-        start_cpusecs = time.clock()
         gcc.inform(fun.start, 'Analyzing reference-counting within %s' % fun.decl.name)
 
+    # The summaries used when checking interprocedurally depend on other
+    # functions, and so the results can't be cached by this function alone:
+    result_cache = None
+    if cache and not (dump_traces or show_traces or interprocedural):
+        from libcpychecker.cache import ResultCache, get_function_key
+        result_cache = ResultCache()
+        key = get_function_key(fun,
+                               maxtrans=maxtrans,
+                               show_possible_null_derefs=show_possible_null_derefs,
+                               dump_json=dump_json,
+                               merge_states=merge_states,
+                               bundle_reports=bundle_reports)
+        entry = result_cache.lookup(key)
+        if entry:
+            records, report_files, bundle_data = entry
+            write_report_files(report_files)
+            if bundle_data:
+                from libcpychecker.reportbundle import add_to_bundle
+                add_to_bundle(bundle_data, dump_json)
+            replay_diagnostics(fun, records)
+            if stats:
+                function_stats.cached = True
+                function_stats.finish()
+                write_function_stats(function_stats)
+            return None
+
     if show_traces:
         from libcpychecker.visualizations import StateGraphPrettyPrinter
         sg = StateGraph(fun, log, MyState)
@@ -4387,52 +4576,90 @@ def check_refcounts(fun, dump_traces=False, show_traces=False,
         # print(dot)
         invoke_dot(dot)
 
-    rep = impl_check_refcounts(fun,
-                               dump_traces,
-                               show_possible_null_derefs,
-                               maxtrans)
-
-    # Organize the Report instances into equivalence classes, simplifying
-    # the list of reports:
-    rep.remove_duplicates()
-
-    # Flush the reporter's messages, which will actually emit gcc errors and
-    # warnings (if any), for those Report instances that survived
-    # de-duplication
-    rep.flush()
-
-    if rep.got_warnings():
-        if dump_json:
-            # JSON output:
-            filename = ('%s.%s.json'
-                    % (gcc.get_dump_base_name(), fun.decl.name))
-            rep.dump_json(fun, filename)
-
-        filename = ('%s.%s-refcount-errors.html'
-                    % (gcc.get_dump_base_name(), fun.decl.name))
-        rep.dump_html(fun, filename)
-        gcc.inform(fun.start,
-                   ('graphical error report for function %r written out to %r'
-                    % (fun.decl.name, filename)))
-
-        filename_v2 = ('%s.%s-refcount-errors.v2.html'
-                       % (gcc.get_dump_base_name(), fun.decl.name))
-
-        from libcpychecker_html.make_html import HtmlPage
-        data = rep.to_json(fun)
-        srcfile = open(fun.start.file)
-        htmlfile = open(filename_v2, 'w')
-        htmlfile.write(str(HtmlPage(srcfile, data)))
-        htmlfile.close()
-        srcfile.close()
+    limits = make_limits(maxtrans, time_budget, memory_budget,
+                         total_time_budget)
+
+    # Capture the diagnostics (whilst still emitting them), for the cache:
+    with CapturedDiagnostics(passthrough=True) as captured:
+        rep = impl_check_refcounts(fun,
+                                   dump_traces,
+                                   show_possible_null_derefs,
+                                   maxtrans,
+                                   merge_states,
+                                   interprocedural,
+                                   suppress_duplicates=True,
+                                   stats=function_stats,
+                                   limits=limits)
+
+        # Organize the Report instances into equivalence classes, simplifying
+        # the list of reports:
+        rep.remove_duplicates()
+
+        # Flush the reporter's messages, which will actually emit gcc errors
+        # and warnings (if any), for those Report instances that survived
+        # de-duplication
+        rep.flush()
 
+        # A list of (filename, text) pairs:
+        report_files = []
+        bundle_data = None
+        if rep.got_warnings() and bundle_reports:
+            from libcpychecker.reportbundle import add_to_bundle, \
+                get_bundle_filename
+            bundle_data = rep.to_json(fun)
+            add_to_bundle(bundle_data, dump_json)
+            emit_inform(fun.start,
+                        ('graphical error report for function %r will be written out to %r'
+                         % (fun.decl.name, get_bundle_filename())))
+        elif rep.got_warnings():
+            if dump_json:
+                # JSON output:
+                filename = ('%s.%s.json'
+                        % (gcc.get_dump_base_name(), fun.decl.name))
+                from json import dumps
+                report_files.append((filename,
+                                     dumps(rep.to_json(fun),
+                                           sort_keys=True, indent=4)))
+
+            filename = ('%s.%s-refcount-errors.html'
+                        % (gcc.get_dump_base_name(), fun.decl.name))
+            report_files.append((filename, rep.to_html(fun)))
+            emit_inform(fun.start,
+                        ('graphical error report for function %r written out to %r'
+                         % (fun.decl.name, filename)))
+
+            filename_v2 = ('%s.%s-refcount-errors.v2.html'
+                           % (gcc.get_dump_base_name(), fun.decl.name))
+
+            from libcpychecker_html.make_html import HtmlPage
+            data = rep.to_json(fun)
+            srcfile = open(fun.start.file)
+            report_files.append((filename_v2, str(HtmlPage(srcfile, data))))
+            srcfile.close()
+
+            write_report_files(report_files)
+
+    # The interned values of this function are of no use when checking the
+    # next one:
+    clear_interned_values()
+
+    on_limits_finished(limits)
+
+    # Results affected by a time or memory budget aren't reproducible, so
+    # don't cache them:
+    if result_cache and not limits.budget_exceeded and not limits.degraded:
+        result_cache.store(key, captured.records, report_files, bundle_data)
+
+    if function_stats:
+        function_stats.finish()
+        if stats:
+            write_function_stats(function_stats)
 
     if show_timings:
-        end_cpusecs = time.clock()
         gcc.inform(fun.start, 'Finished analyzing reference-counting within %s' % fun.decl.name)
         gcc.inform(fun.start,
                    ('%i transitions, %fs CPU'
-                    % (limits.trans_seen, end_cpusecs - start_cpusecs)))
+                    % (function_stats.transitions, function_stats.cpu_secs)))
 
     if 0:
         dot = cfg_to_dot(fun.cfg, fun.decl.name)
@@ -0,0 +1,102 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+"""
+One report for the whole of a translation unit
+
+By default, the refcount checker writes out a set of HTML files for each
+function that it finds problems in, each of which embeds the same assets,
+and highlights the source file again.  When enabled (via gcc-with-cpychecker
+--bundle-reports), the data for each function (as generated by
+Reporter.to_json) is instead buffered here, and a single page covering every
+function is written out at the end of the translation unit, to:
+
+   <dump base name>.refcount-errors.html
+
+along with the combined data, to:
+
+   <dump base name>.refcount-errors.json
+
+if JSON output was requested.
+"""
+
+import json
+
+import gcc
+from gccutils import check_isinstance
+
+# A list of the data for each function, in the order in which they were
+# checked:
+_bundled_reports = []
+
+# Was JSON output requested for any of them?
+_dump_json = False
+
+def get_bundle_filename(ext='html'):
+    return '%s.refcount-errors.%s' % (gcc.get_dump_base_name(), ext)
+
+def add_to_bundle(data, dump_json=False):
+    """
+    Buffer the given data (from Reporter.to_json) for one function, until
+    the end of the translation unit
+    """
+    global _dump_json
+    check_isinstance(data, dict)
+    _bundled_reports.append(data)
+    if dump_json:
+        _dump_json = True
+
+def take_bundled_reports():
+    """
+    Get the list of (data, dump_json) pairs buffered so far, emptying the
+    buffer (used by the worker processes, to send them to the parent)
+    """
+    global _dump_json
+    result = [(data, _dump_json) for data in _bundled_reports]
+    del _bundled_reports[:]
+    _dump_json = False
+    return result
+
+def write_bundle():
+    """
+    Write out the report for everything buffered so far (if anything),
+    emptying the buffer
+    """
+    global _dump_json
+    if not _bundled_reports:
+        return
+    # (the functions may come from more than one source file, e.g. inline
+    # functions within headers; name the report after the first):
+    filename = _bundled_reports[0]['filename']
+
+    if _dump_json:
+        with open(get_bundle_filename('json'), 'w') as f:
+            json.dump(dict(filename=filename,
+                           functions=_bundled_reports),
+                      f, sort_keys=True, indent=4)
+
+    from libcpychecker_html.make_html import HtmlBundlePage
+    page = HtmlBundlePage(filename, _bundled_reports)
+    with open(get_bundle_filename(), 'w') as f:
+        f.write(str(page))
+
+    del _bundled_reports[:]
+    _dump_json = False
+
+def on_finish_unit(*args):
+    write_bundle()
+
+gcc.register_callback(gcc.PLUGIN_FINISH_UNIT, on_finish_unit)
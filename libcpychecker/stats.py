@@ -0,0 +1,199 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+"""
+Performance telemetry for the refcount checker
+
+When enabled (via gcc-with-cpychecker --stats), a FunctionStats instance
+gathers counters and timings whilst checking each function, and these are
+written out as one line of JSON per function to:
+
+   <dump base name>.cpychecker-stats.jsonl
+
+so that the functions that dominate the time taken by a build can be found
+with e.g.:
+
+   cat *.cpychecker-stats.jsonl | jq -s 'sort_by(-.cpu_secs) | .[:10]'
+"""
+
+import json
+import time
+
+import gcc
+from gccutils import check_isinstance
+
+try:
+    import tracemalloc
+except ImportError:
+    # (Python 2)
+    tracemalloc = None
+
+if hasattr(time, 'process_time'):
+    get_cpu_secs = time.process_time
+else:
+    # (Python 2)
+    get_cpu_secs = time.clock
+
+class FunctionStats(object):
+    """
+    The telemetry for checking one function:
+
+      - wall_secs, cpu_secs: the time taken
+
+      - transitions: the number of transitions explored
+
+      - traces: the number of complete traces checked
+
+      - states: the number of State instances created
+
+      - peak_memory: the peak size of the memory allocated by Python during
+        the check, in bytes (or None if this wasn't asked for, or can't be
+        measured).  This is measured using tracemalloc, which slows down the
+        check considerably, skewing the timings, and so is only done if
+        trace_memory is true
+
+      - secs_by_stmt_kind: a dict mapping from the kind of GIMPLE statement
+        (e.g. "GimpleCall") to the wall time spent calculating the transitions
+        from states at such statements; "None" is for the nodes of the
+        StmtGraph that don't have a statement, such as the entry node
+
+      - too_complicated: did the checker stop before exploring every path,
+        either by hitting the limit on the number of transitions, or by using
+        up a budget?
+
+      - budget_exceeded: the description of the budget that was used up
+        (e.g. "the time budget"), or None
+
+      - loops_dropped: the number of paths that were abandoned on going
+        around a loop again (so that not every path was followed, even if
+        too_complicated is False)
+
+      - degraded: did the checker switch to a cheaper mode part-way through,
+        due to the time or memory budgets (see absinterp.Limits)?
+
+      - cached: were the results taken from the on-disk cache?
+    """
+    __slots__ = ('funcname', 'filename', 'line',
+                 'wall_secs', 'cpu_secs',
+                 'transitions', 'traces', 'states',
+                 'peak_memory', 'secs_by_stmt_kind',
+                 'too_complicated', 'budget_exceeded', 'loops_dropped',
+                 'degraded', 'cached',
+                 '_start_wall', '_start_cpu', '_start_states',
+                 '_trace_memory', '_started_tracemalloc')
+
+    def __init__(self, fun, trace_memory=False):
+        check_isinstance(fun, gcc.Function)
+        self.funcname = fun.decl.name
+        self.filename = fun.start.file
+        self.line = fun.start.line
+        self.wall_secs = None
+        self.cpu_secs = None
+        self.transitions = 0
+        self.traces = 0
+        self.states = 0
+        self.peak_memory = None
+        self.secs_by_stmt_kind = {}
+        self.too_complicated = False
+        self.budget_exceeded = None
+        self.loops_dropped = 0
+        self.degraded = False
+        self.cached = False
+        self._trace_memory = trace_memory
+        self._started_tracemalloc = False
+
+    def start(self):
+        from libcpychecker.absinterp import State
+        if self._trace_memory and tracemalloc:
+            if tracemalloc.is_tracing():
+                if hasattr(tracemalloc, 'reset_peak'):
+                    tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self._started_tracemalloc = True
+        self._start_states = State.num_created
+        self._start_wall = time.time()
+        self._start_cpu = get_cpu_secs()
+
+    def finish(self):
+        from libcpychecker.absinterp import State
+        self.cpu_secs = get_cpu_secs() - self._start_cpu
+        self.wall_secs = time.time() - self._start_wall
+        self.states = State.num_created - self._start_states
+        if self._trace_memory and tracemalloc and tracemalloc.is_tracing():
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+    def on_stmt(self, stmtnode, start_wall):
+        """
+        Called by explore_traces after calculating the transitions from a
+        state at the given StmtNode, with the time at which it started
+        """
+        stmt = stmtnode.stmt
+        if stmt:
+            kind = stmt.__class__.__name__
+        else:
+            kind = 'None'
+        self.secs_by_stmt_kind[kind] = (self.secs_by_stmt_kind.get(kind, 0)
+                                        + time.time() - start_wall)
+
+    def as_json(self):
+        return dict(function=self.funcname,
+                    file=self.filename,
+                    line=self.line,
+                    wall_secs=self.wall_secs,
+                    cpu_secs=self.cpu_secs,
+                    transitions=self.transitions,
+                    traces=self.traces,
+                    states=self.states,
+                    peak_memory=self.peak_memory,
+                    secs_by_stmt_kind=self.secs_by_stmt_kind,
+                    too_complicated=self.too_complicated,
+                    budget_exceeded=self.budget_exceeded,
+                    loops_dropped=self.loops_dropped,
+                    degraded=self.degraded,
+                    cached=self.cached)
+
+def get_stats_filename():
+    return gcc.get_dump_base_name() + '.cpychecker-stats.jsonl'
+
+# Has this process already started the file for this compilation?
+_started_file = False
+
+def start_stats_file():
+    """
+    Create (or truncate) the file, so that subsequent calls to
+    write_function_stats append to it.  Called before forking worker
+    processes, so that they all append to the same file.
+    """
+    global _started_file
+    if not _started_file:
+        with open(get_stats_filename(), 'w'):
+            pass
+        _started_file = True
+
+def write_function_stats(stats):
+    """
+    Append a line of JSON for the given FunctionStats
+    """
+    check_isinstance(stats, FunctionStats)
+    start_stats_file()
+    line = json.dumps(stats.as_json(), sort_keys=True) + '\n'
+    # Write the line in a single call, so that the lines from concurrent
+    # worker processes don't get interleaved:
+    with open(get_stats_filename(), 'a') as f:
+        f.write(line)
@@ -0,0 +1,464 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+"""
+Interprocedural summaries for the refcount checker.
+
+Calls to functions without an impl_* handler are normally treated as calls
+to an unknown function.  When the called function is defined within the
+same translation unit and has already been checked, we can instead use a
+FunctionSummary derived from its traces: for each distinct way of returning,
+what it returns (and whether the caller owns a reference to it), how it
+changes the reference counts of its arguments and of global objects, and
+whether it sets an exception.
+
+The summaries are only as good as the order in which functions are checked:
+see CpyCheckerIpaPass, which checks callees before their callers.
+"""
+
+import gcc
+
+from gccutils import check_isinstance
+import libcpychecker.absinterp
+from libcpychecker.absinterp import AbstractValue, ConcreteValue, \
+    WithinRange, UnknownValue, PointerToRegion, RegionForGlobal, \
+    RegionForStaticLocal, State
+from libcpychecker.attributes import fnnames_returning_borrowed_refs
+from libcpychecker.types import get_PyObjectPtr
+from libcpychecker.utils import log
+
+# Give up on summarizing functions with more distinct outcomes than this,
+# treating calls to them as calls to an unknown function:
+MAX_OUTCOMES = 16
+
+# A dictionary mapping from fnname to FunctionSummary:
+summaries_by_fnname = {}
+
+def get_summary(fnname):
+    """
+    Get the FunctionSummary for the function with the given name, or None
+    """
+    return summaries_by_fnname.get(fnname)
+
+# Used by State._get_transitions_for_GimpleCall:
+libcpychecker.absinterp.get_function_summary = get_summary
+
+def _reset_summaries(*args):
+    # The summaries are for the functions within one translation unit:
+    summaries_by_fnname.clear()
+
+gcc.register_callback(gcc.PLUGIN_FINISH_UNIT,
+                      _reset_summaries)
+
+def is_global_object(region):
+    # (static locals are only meaningful within the function itself)
+    return (isinstance(region, RegionForGlobal)
+            and not isinstance(region, RegionForStaticLocal))
+
+def record_summary(summary):
+    check_isinstance(summary, FunctionSummary)
+    log('recording summary: %s', summary)
+    summaries_by_fnname[summary.fnname] = summary
+
+class RefcountDelta(object):
+    """
+    The net change to the ob_refcnt of an object that a function was passed
+    a borrowed reference to, split into the references that the function
+    owns at exit ("rel"), and the bounds on the change to the references
+    owned elsewhere ("extmin", "extmax")
+    """
+    __slots__ = ('rel', 'extmin', 'extmax')
+
+    def __init__(self, rel, extmin, extmax):
+        self.rel = rel
+        self.extmin = extmin
+        self.extmax = extmax
+
+    def __repr__(self):
+        return 'RefcountDelta(%r, %r, %r)' % (self.rel, self.extmin, self.extmax)
+
+    def _key(self):
+        return (self.rel, self.extmin, self.extmax)
+
+    def __eq__(self, other):
+        if isinstance(other, RefcountDelta):
+            return self._key() == other._key()
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, RefcountDelta):
+            return self._key() != other._key()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def is_identity(self):
+        return self.rel == 0 and self.extmin == 0 and self.extmax == 0
+
+    def apply(self, cpython, v_ptr, loc, returned):
+        """
+        Apply this change to the object that v_ptr points to, within the
+        caller's CPython facet.
+
+        The function's own references at exit are held "elsewhere" from the
+        caller's point of view, unless one of them was returned to the
+        caller.  References it consumed (a negative "rel") were the caller's.
+        """
+        from libcpychecker.refcounts import RefcountValue
+        check_isinstance(v_ptr, PointerToRegion)
+        if returned:
+            returned = 1
+        else:
+            returned = 0
+        rel = min(self.rel, 0) + returned
+        ext = max(self.rel, 0) - returned
+        def _apply_delta(v_old):
+            return RefcountValue(loc,
+                                 v_ptr.region,
+                                 v_old.relvalue + rel,
+                                 WithinRange(v_old.external.gcctype,
+                                             loc,
+                                             v_old.external.minvalue + ext + self.extmin,
+                                             v_old.external.maxvalue + ext + self.extmax))
+        cpython.change_refcount(v_ptr, loc, _apply_delta)
+
+class SummaryOutcome(object):
+    """
+    One of the distinct ways in which a summarized function can return.
+
+    'retkind' is a tuple describing the return value:
+      ('none',)            : no return value
+      ('null',)            : a NULL pointer
+      ('arg', idx)         : the 0-based argument idx
+      ('global', vardecl)  : a pointer to the given global
+      ('new-ref',)         : a new reference to a new object
+      ('borrowed-ref',)    : a borrowed reference to some other object
+      ('range', min, max)  : an integer within the given range
+      ('unknown',)         : anything else
+
+    'argdeltas' is a tuple of (idx, RefcountDelta) pairs, and 'globaldeltas'
+    a tuple of (gcc.VarDecl, RefcountDelta) pairs, for the objects whose
+    refcounts changed.
+
+    'exception' is None if the function doesn't set an exception, the
+    gcc.VarDecl of the exception (e.g. PyExc_TypeError) if known, or True if
+    it sets some other (unknown) exception.
+    """
+    __slots__ = ('retkind', 'argdeltas', 'globaldeltas', 'exception')
+
+    def __init__(self, retkind, argdeltas, globaldeltas, exception):
+        check_isinstance(retkind, tuple)
+        check_isinstance(argdeltas, tuple)
+        check_isinstance(globaldeltas, tuple)
+        self.retkind = retkind
+        self.argdeltas = argdeltas
+        self.globaldeltas = globaldeltas
+        self.exception = exception
+
+    def __repr__(self):
+        return ('SummaryOutcome(%r, %r, %r, %r)'
+                % (self.retkind, self.argdeltas, self.globaldeltas,
+                   self.exception))
+
+    def _key(self):
+        return (self.retkind, self.argdeltas, self.globaldeltas,
+                self.exception)
+
+    def __eq__(self, other):
+        if isinstance(other, SummaryOutcome):
+            return self._key() == other._key()
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, SummaryOutcome):
+            return self._key() != other._key()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def describe(self):
+        """
+        Get a partial description of the outcome, for use in a Transition
+        e.g. "returns NULL, setting an exception"
+        """
+        kind = self.retkind[0]
+        if kind == 'none':
+            desc = 'returns'
+        elif kind == 'null':
+            desc = 'returns NULL'
+        elif kind == 'arg':
+            desc = 'returns argument %i' % (self.retkind[1] + 1)
+        elif kind == 'global':
+            desc = 'returns &%s' % self.retkind[1].name
+        elif kind == 'new-ref':
+            desc = 'returns a new reference'
+        elif kind == 'borrowed-ref':
+            desc = 'returns a borrowed reference'
+        elif kind == 'range':
+            if self.retkind[1] == self.retkind[2]:
+                desc = 'returns %s' % self.retkind[1]
+            else:
+                desc = ('returns a value in the range %s to %s'
+                        % (self.retkind[1], self.retkind[2]))
+        else:
+            desc = 'returns'
+        if self.exception:
+            desc += ', setting an exception'
+        return desc
+
+class FunctionSummary(object):
+    """
+    A compact description of the refcount-related behavior of a function,
+    as a list of SummaryOutcome instances
+    """
+    __slots__ = ('fnname', 'outcomes')
+
+    def __init__(self, fnname, outcomes):
+        check_isinstance(fnname, str)
+        check_isinstance(outcomes, list)
+        self.fnname = fnname
+        self.outcomes = outcomes
+
+    def __repr__(self):
+        return 'FunctionSummary(%r, %r)' % (self.fnname, self.outcomes)
+
+    def get_transitions(self, state, stmt, args):
+        """
+        Generate the list of Transition instances for a call to the
+        summarized function at the given gcc.GimpleCall, one per outcome
+        """
+        check_isinstance(state, State)
+        check_isinstance(stmt, gcc.GimpleCall)
+        check_isinstance(args, list)
+        result = []
+        has_siblings = len(self.outcomes) > 1
+        for outcome in self.outcomes:
+            s_new = state.use_next_stmt_node()
+            self._apply_outcome(s_new, stmt, args, outcome)
+            result.append(state.mktrans_from_fncall_state(stmt, s_new,
+                                                          outcome.describe(),
+                                                          has_siblings))
+
+        # As per apply_fncall_side_effects, the function could have written
+        # an arbitrary r-value back into any pointer arguments:
+        for t_iter in result:
+            for v_arg in args:
+                if isinstance(v_arg, PointerToRegion):
+                    v_newval = UnknownValue.make(v_arg.gcctype, stmt.loc)
+                    t_iter.dest.value_for_region[v_arg.region] = v_newval
+        return result
+
+    def _apply_outcome(self, s_new, stmt, args, outcome):
+        from libcpychecker.refcounts import RefcountValue
+        loc = stmt.loc
+        returntype = stmt.fn.type.dereference.type
+        kind = outcome.retkind[0]
+
+        # Changes to the refcounts of arguments and globals:
+        for idx, delta in outcome.argdeltas:
+            if idx < len(args) and isinstance(args[idx], PointerToRegion):
+                returned = (kind == 'arg' and outcome.retkind[1] == idx)
+                delta.apply(s_new.cpython, args[idx], loc, returned)
+        for vardecl, delta in outcome.globaldeltas:
+            v_ptr = PointerToRegion(get_PyObjectPtr(), loc,
+                                    s_new.var_region(vardecl))
+            returned = (kind == 'global' and outcome.retkind[1] == vardecl)
+            delta.apply(s_new.cpython, v_ptr, loc, returned)
+
+        # The return value:
+        if kind == 'null':
+            v_return = ConcreteValue(returntype, loc, 0)
+        elif kind == 'arg':
+            v_return = args[outcome.retkind[1]]
+        elif kind == 'global':
+            v_return = PointerToRegion(returntype, loc,
+                                       s_new.var_region(outcome.retkind[1]))
+        elif kind in ('new-ref', 'borrowed-ref'):
+            if kind == 'new-ref':
+                v_refcount = RefcountValue.new_ref(loc, None)
+                name = 'new ref from call to %s' % self.fnname
+            else:
+                v_refcount = RefcountValue.borrowed_ref(loc, None)
+                name = 'borrowed reference returned by %s()' % self.fnname
+            r_nonnull = s_new.cpython.make_sane_object(stmt, name, v_refcount)
+            v_return = PointerToRegion(returntype, loc, r_nonnull)
+        elif kind == 'range':
+            v_return = WithinRange.make(returntype, loc,
+                                        outcome.retkind[1],
+                                        outcome.retkind[2])
+        elif kind == 'unknown':
+            v_return = UnknownValue.make(returntype, loc)
+        else:
+            v_return = None
+        if stmt.lhs and v_return:
+            s_new.assign(stmt.lhs, v_return, loc)
+
+        # The exception state:
+        if outcome.exception is True:
+            # An exception is set, but we don't know which:
+            s_new.cpython.exception_rvalue = \
+                UnknownValue.make(get_PyObjectPtr(), loc)
+        elif outcome.exception:
+            r_exception = s_new.var_region(outcome.exception)
+            s_new.cpython.exception_rvalue = \
+                PointerToRegion(get_PyObjectPtr(), loc, r_exception)
+
+class SummaryBuilder(object):
+    """
+    Accumulates the outcomes of the traces of a function as they are
+    generated, to build a FunctionSummary for it
+    """
+    def __init__(self, fun):
+        check_isinstance(fun, gcc.Function)
+        self.fun = fun
+        self.outcomes = []
+        self.seen = set()
+        # Set to False if we see a trace that we can't summarize:
+        self.ok = True
+
+    def add_trace(self, trace):
+        if not self.ok:
+            return
+        if trace.err:
+            # The trace doesn't return to the caller:
+            return
+        if not trace.transitions:
+            return
+        endstate = trace.states[-1]
+        if endstate.not_returning or not endstate.has_returned:
+            return
+        if not hasattr(endstate, 'cpython'):
+            self.ok = False
+            return
+        outcome = self._make_outcome(trace.transitions[0].src, endstate)
+        if outcome is None:
+            self.ok = False
+            return
+        if outcome not in self.seen:
+            self.seen.add(outcome)
+            self.outcomes.append(outcome)
+            if len(self.outcomes) > MAX_OUTCOMES:
+                self.ok = False
+
+    def get_summary(self):
+        """
+        Get the FunctionSummary, or None if the traces couldn't be
+        summarized
+        """
+        if not self.ok or not self.outcomes:
+            return None
+        return FunctionSummary(self.fun.decl.name, self.outcomes)
+
+    def _get_delta(self, endstate, r_obj):
+        """
+        Get the RefcountDelta for the object, relative to a borrowed
+        reference, or None if we don't know its ob_refcnt
+        """
+        from libcpychecker.refcounts import RefcountValue
+        v_ob_refcnt = endstate.get_value_of_field_by_region(r_obj, 'ob_refcnt')
+        if not isinstance(v_ob_refcnt, RefcountValue):
+            return None
+        return RefcountDelta(v_ob_refcnt.relvalue,
+                             v_ob_refcnt.external.minvalue - 1,
+                             v_ob_refcnt.external.maxvalue - 1)
+
+    def _make_outcome(self, initstate, endstate):
+        from libcpychecker.refcounts import type_is_pyobjptr_subclass
+
+        # Locate the objects that PyObject* arguments point to
+        # (see CPython.init_for_function):
+        r_args = {}
+        for idx, parm in enumerate(self.fun.decl.arguments):
+            if type_is_pyobjptr_subclass(parm.type):
+                r_parm = initstate.region_for_var.get(parm)
+                v_parm = initstate.value_for_region.get(r_parm)
+                if isinstance(v_parm, PointerToRegion):
+                    r_args[v_parm.region] = idx
+
+        retkind = self._get_retkind(endstate, r_args)
+        if retkind is None:
+            return None
+
+        # (deltas are recorded for objects that are returned, even if
+        # unchanged, so that the caller knows whether it owns a reference)
+        argdeltas = []
+        for r_obj, idx in sorted(r_args.items(), key=lambda item: item[1]):
+            delta = self._get_delta(endstate, r_obj)
+            if delta is None:
+                return None
+            if not delta.is_identity() or retkind == ('arg', idx):
+                argdeltas.append((idx, delta))
+
+        globaldeltas = []
+        for r_obj in endstate.region_for_var.values():
+            if is_global_object(r_obj) and 'ob_refcnt' in r_obj.fields:
+                delta = self._get_delta(endstate, r_obj)
+                if delta is None:
+                    continue
+                if (not delta.is_identity()
+                    or retkind == ('global', r_obj.vardecl)):
+                    globaldeltas.append((r_obj.vardecl, delta))
+
+        v_exc = endstate.cpython.exception_rvalue
+        if v_exc.is_null_ptr():
+            exception = None
+        elif (isinstance(v_exc, PointerToRegion)
+              and is_global_object(v_exc.region)):
+            exception = v_exc.region.vardecl
+        else:
+            exception = True
+
+        return SummaryOutcome(retkind, tuple(argdeltas), tuple(globaldeltas),
+                              exception)
+
+    def _get_retkind(self, endstate, r_args):
+        from libcpychecker.refcounts import type_is_pyobjptr_subclass, \
+            RefcountValue
+        returntype = self.fun.decl.type.type
+        v_return = endstate.return_rvalue
+        if v_return is None:
+            return ('none',)
+        check_isinstance(v_return, AbstractValue)
+        if v_return.is_null_ptr():
+            return ('null',)
+        if isinstance(v_return, PointerToRegion):
+            if v_return.region in r_args:
+                return ('arg', r_args[v_return.region])
+            if is_global_object(v_return.region):
+                return ('global', v_return.region.vardecl)
+            if type_is_pyobjptr_subclass(returntype):
+                v_ob_refcnt = endstate.get_value_of_field_by_region(v_return.region,
+                                                                    'ob_refcnt')
+                if not isinstance(v_ob_refcnt, RefcountValue):
+                    return None
+                if (v_ob_refcnt.relvalue > 0
+                    and self.fun.decl.name not in fnnames_returning_borrowed_refs):
+                    return ('new-ref',)
+                return ('borrowed-ref',)
+            return ('unknown',)
+        if isinstance(v_return, ConcreteValue):
+            if isinstance(v_return.gcctype, gcc.IntegerType):
+                return ('range', v_return.value, v_return.value)
+        if isinstance(v_return, WithinRange):
+            if isinstance(v_return.gcctype, gcc.IntegerType):
+                return ('range', v_return.minvalue, v_return.maxvalue)
+        if isinstance(v_return, UnknownValue):
+            if type_is_pyobjptr_subclass(returntype):
+                # We don't know who owns it:
+                return None
+        return ('unknown',)
@@ -111,3 +111,117 @@ def get_type_for_typeobject(typeobject):
 def register_type_object(typeobject, typedef):
     check_isinstance(typeobject, gcc.VarDecl)
     type_dict[typeobject.name] = typedef
+    # (this may change the type object for a type we've already classified):
+    invalidate_type_classifications()
+
+class TypeClassification(object):
+    """
+    What the refcount checker needs to know about a gcc.Type, computed once
+    per type (see classify_type)
+    """
+    __slots__ = ('gcctype',
+                 'is_pyobject', # is it "struct PyObject"?
+                 'is_pyobjptr', # is it "struct PyObject *"?
+                 'is_pyobjptr_subclass', # is it a pointer to a PyObject subclass?
+                 '_typeobject_name',
+                 )
+
+    def __init__(self, gcctype):
+        self.gcctype = gcctype
+        typename = str(gcctype)
+        self.is_pyobject = (typename == 'struct PyObject')
+        self.is_pyobjptr = (typename == 'struct PyObject *')
+        self.is_pyobjptr_subclass = _is_pyobjptr_subclass(gcctype, typename)
+        self._typeobject_name = self
+
+    @property
+    def typeobject_name(self):
+        """
+        For a pointer to a PyObject subclass, the name of the PyTypeObject
+        global for that subclass (e.g. "PyList_Type" for "PyListObject *"),
+        or None if unknown
+        """
+        if self._typeobject_name is self:
+            self._typeobject_name = None
+            if self.is_pyobjptr_subclass:
+                for name, typedef_name in type_dict.items():
+                    typedef = get_global_typedef(typedef_name)
+                    if typedef and typedef.type == self.gcctype.dereference:
+                        self._typeobject_name = name
+                        break
+        return self._typeobject_name
+
+def _is_pyobjptr_subclass(t, typename):
+    # It must be a pointer:
+    if not isinstance(t, gcc.PointerType):
+        return False
+
+    # ...to a struct:
+    if not isinstance(t.dereference, gcc.RecordType):
+        return False
+
+    # Obtain the fields of the struct/class
+    # For C++ "fields" will also contain a gcc.TypeDecl for the
+    # type itself, and for any nested types (e.g. typedefs), so filter them
+    # out.  This avoids an infinite recursion for classes with no data, where
+    # the initial decl of the type otherwise would make it appear that there's
+    # a nested copy of the struct inside itself.
+    fields = [field for field in t.dereference.fields
+              if isinstance(field, gcc.FieldDecl)]
+
+    if len(fields) == 0:
+        # Opaque struct: there's nothing we can do.
+        # Assume it's *not* a PyObject subclass:
+        return False
+
+    # if first field is a PyObject subclass, then we're good:
+    if classify_type(fields[0].type.pointer).is_pyobjptr_subclass:
+        return True
+
+    fieldnames = [f.name for f in fields]
+
+    if is_py3k():
+        # For Python 3, the first field must be "ob_base", or it must be "PyObject":
+        if typename == 'struct PyObject *':
+            return True
+        if fieldnames[0] != 'ob_base':
+            return False
+    else:
+        # For Python 2, the first two fields must be "ob_refcnt" and "ob_type".
+        # (In a debug build, these are preceded by _ob_next and _ob_prev)
+        # FIXME: debug builds!
+        if is_debug_build():
+            if fieldnames[:4] != ['_ob_next', '_ob_prev',
+                                  'ob_refcnt', 'ob_type']:
+                return False
+        else:
+            if fieldnames[:2] != ['ob_refcnt', 'ob_type']:
+                return False
+
+    # Passed all tests:
+    return True
+
+# A cache of TypeClassification instances, keyed by gcc.Type (which compare
+# and hash by the identity of the underlying tree), shared by all of the
+# functions within the translation unit:
+_type_classifications = {}
+
+def classify_type(t):
+    """
+    Get the TypeClassification for the given gcc.Type (or None)
+    """
+    tc = _type_classifications.get(t)
+    if tc is None:
+        assert t is None or isinstance(t, gcc.Type)
+        tc = TypeClassification(t)
+        _type_classifications[t] = tc
+    return tc
+
+def invalidate_type_classifications(*args):
+    _type_classifications.clear()
+
+# The types (and the global typedefs and type objects that the
+# classifications depend on) are those of one translation unit, and are only
+# classified by the passes run once it has all been parsed:
+gcc.register_callback(gcc.PLUGIN_FINISH_UNIT,
+                      invalidate_type_classifications)
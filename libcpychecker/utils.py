@@ -16,25 +16,138 @@
 #   <http://www.gnu.org/licenses/>.
 
 # Logging
+#
+# Logging is organized by subsystem (e.g. "absinterp", "refcounts"), each
+# with a Logger that only emits messages at or above its level.  Loggers are
+# called with a format string and its arguments, so that when a message is
+# filtered out, the work of formatting it is never done; arguments that are
+# themselves expensive to compute can be wrapped in a Lazy, so that they are
+# only computed if the message is actually formatted, e.g.:
+#
+#    log('dir(stmt): %s', Lazy(dir, stmt))
+#
+# Logging is disabled by default.  Set the CPYCHECKER_LOG environment variable
+# to a comma-separated list of subsystems, optionally with levels, e.g.
+# "absinterp=info,refcounts" (or "*" for everything), or call set_log_level()
+# at any time, e.g. set_log_level(DEBUG) to log everything
+import os
 import sys
 
 import gcc
 
 logfile = None
 
-logging_enabled = False
-
-def log(msg, *args):
-    if logging_enabled:
-        # Only do the work of expanding the message if logging is enabled:
-        expanded_msg = msg % args
-        if 1:
-            global logfile
-            if not logfile:
-                filename = gcc.get_dump_base_name() + '.cpychecker-log.txt'
-                logfile = open(filename, 'w')
-            logfile.write(expanded_msg)
-            logfile.write('\n')
-        if 0:
-            sys.stderr.write(expanded_msg)
-            sys.stderr.write('\n')
+# Logging levels, as per the standard library's "logging" module:
+DEBUG = 10
+INFO = 20
+DISABLED = 100
+
+_level_names = {'debug': DEBUG,
+                'info': INFO,
+                'disabled': DISABLED}
+
+def _parse_log_levels(text):
+    """
+    Parse the value of CPYCHECKER_LOG into a dict mapping from subsystem to
+    level (with "*" for the default)
+    """
+    result = {}
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if '=' in item:
+            subsystem, levelname = item.split('=', 1)
+            level = _level_names.get(levelname.strip().lower(), DEBUG)
+        else:
+            subsystem, level = item, DEBUG
+        result[subsystem.strip()] = level
+    return result
+
+_levels = _parse_log_levels(os.environ.get('CPYCHECKER_LOG', ''))
+
+def _write_log(msg, args):
+    global logfile
+    # Only do the work of expanding the message if logging is enabled:
+    expanded_msg = msg % args
+    if 1:
+        if not logfile:
+            filename = gcc.get_dump_base_name() + '.cpychecker-log.txt'
+            logfile = open(filename, 'w')
+        logfile.write(expanded_msg)
+        logfile.write('\n')
+    if 0:
+        sys.stderr.write(expanded_msg)
+        sys.stderr.write('\n')
+
+class Lazy(object):
+    """
+    A deferred argument for a log message: the callable is only invoked if
+    the message is formatted (via %s or %r)
+    """
+    __slots__ = ('fn', 'args')
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self):
+        return str(self.fn(*self.args))
+
+    def __repr__(self):
+        return repr(self.fn(*self.args))
+
+class Logger(object):
+    """
+    The logger for one subsystem.  Calling it logs a message at DEBUG level
+    """
+    __slots__ = ('subsystem', 'level')
+
+    def __init__(self, subsystem):
+        self.subsystem = subsystem
+        self.level = _levels.get(subsystem, _levels.get('*', DISABLED))
+
+    def is_enabled(self, level=DEBUG):
+        """
+        Would a message at the given level be logged?  Use this to guard
+        blocks of code that exist only to generate log messages
+        """
+        return level >= self.level
+
+    def __call__(self, msg, *args):
+        if DEBUG >= self.level:
+            _write_log(msg, args)
+
+    debug = __call__
+
+    def info(self, msg, *args):
+        if INFO >= self.level:
+            _write_log(msg, args)
+
+_loggers = {}
+
+def get_logger(subsystem):
+    """
+    Get the Logger for the given subsystem
+    """
+    logger = _loggers.get(subsystem)
+    if logger is None:
+        logger = _loggers[subsystem] = Logger(subsystem)
+    return logger
+
+def set_log_level(level, subsystem=None):
+    """
+    Set the level of the given subsystem's Logger, or, if subsystem is None,
+    the default level, and that of every subsystem
+    """
+    if subsystem is None:
+        _levels.clear()
+        _levels['*'] = level
+        for logger in _loggers.values():
+            logger.level = level
+    else:
+        _levels[subsystem] = level
+        get_logger(subsystem).level = level
+
+# The logger for everything not (yet) in its own subsystem:
+log = get_logger('libcpychecker')
@@ -33,13 +33,13 @@ from lxml.html import (
     tostring, fragment_fromstring as parse, builder as E
 )
 
-from pygments import highlight
+from pygments import format as format_tokens
 from pygments.lexers.compiled import CLexer
 from pygments.formatters.html import HtmlFormatter
+from pygments.token import Token
 
 import base64
 from copy import deepcopy
-from itertools import islice
 
 
 def open(filename, mode='r'):  # pylint:disable=redefined-builtin
@@ -51,11 +51,67 @@ def open(filename, mode='r'):  # pylint:disable=redefined-builtin
         return io.open(filename, mode, encoding='UTF-8')
 
 
+class SourceHighlighter(object):
+    """The syntax-highlighted lines of one source file.
+
+    The file is lexed once, so that any number of functions within it can
+    be shown without highlighting it again.
+    """
+    def __init__(self, codefile):
+        # (don't let pygments strip leading blank lines, or the line numbers
+        # would be off):
+        lexer = CLexer(stripnl=False)
+        self.lines = [[]]
+        for ttype, value in lexer.get_tokens(codefile.read()):
+            for i, part in enumerate(value.split('\n')):
+                if i > 0:
+                    self.lines.append([])
+                if part:
+                    self.lines[-1].append((ttype, part))
+        # (the source, as lexed, ends with a newline, which isn't the start
+        # of another line):
+        if len(self.lines) > 1 and not self.lines[-1]:
+            self.lines.pop()
+        self._cache = {}
+
+    def tokens(self, first, last):
+        """The tokens of the given range of lines"""
+        # Line numbers are ONE-based (and the range of a function can end
+        # beyond the last line of the file):
+        last = min(last, len(self.lines))
+        for line in self.lines[first - 1:last]:
+            for token in line:
+                yield token
+            yield Token.Text, '\n'
+
+    def code(self, first, last):
+        """The html for the given range of lines"""
+        if (first, last) not in self._cache:
+            formatter = CodeHtmlFormatter(
+                style='default',
+                cssclass='source',
+                linenostart=first,
+            )
+            code = parse(format_tokens(self.tokens(first, last), formatter))
+
+            # linkify the python C-API functions
+            for name in code.xpath('//span[@class="n"]'):
+                url = capi.get_url(name.text)
+                if url is not None:
+                    link = E.A(name.text, href=url)
+                    name.text = None
+                    name.append(link)
+
+            self._cache[first, last] = code
+        return deepcopy(self._cache[first, last])
+
+
 class HtmlPage(object):
     """Represent one html page."""
-    def __init__(self, codefile, data):
+    def __init__(self, codefile, data, highlighter=None):
         self.codefile = codefile
         self.data = data
+        self.highlighter = highlighter
 
     def __str__(self):
         html = tostring(self.__html__())
@@ -83,37 +139,29 @@ class HtmlPage(object):
         )
         return head
 
-    def raw_code(self):
-        """Get the correct lines from the code file"""
-        first, last = self.data['function']['lines']
-        # Line numbers are ONE-based
-        return ''.join(islice(self.codefile, first - 1, last))
-
     def code(self):
         """generate the contents of the #code section"""
-        # Get ready to use Pygments:
-        formatter = CodeHtmlFormatter(
-            style='default',
-            cssclass='source',
-            linenostart=self.data['function']['lines'][0],
+        if self.highlighter is None:
+            self.highlighter = SourceHighlighter(self.codefile)
+        first, last = self.data['function']['lines']
+        return self.highlighter.code(first, last)
+
+    def info(self):
+        """What the page is about"""
+        return E.DIV(
+            E.ATTR(id='info'),
+            E.SPAN(
+                E.CLASS('label'),
+                'Filename: ',
+            ),
+            self.data['filename'],
+            E.SPAN(
+                E.CLASS('label'),
+                'Function: ',
+            ),
+            self.data['function']['name'],
         )
 
-        # <link rel="stylesheet", href="pygments_c.css", type="text/css">
-        open('pygments_c.css', 'w').write(formatter.get_style_defs())
-
-        # Use pygments to convert it all to HTML:
-        code = parse(highlight(self.raw_code(), CLexer(), formatter))
-
-        # linkify the python C-API functions
-        for name in code.xpath('//span[@class="n"]'):
-            url = capi.get_url(name.text)
-            if url is not None:
-                link = E.A(name.text, href=url)
-                name.text = None
-                name.append(link)
-
-        return code
-
     def header(self):
         """Make the header bar of the webpage"""
 
@@ -127,19 +175,7 @@ class HtmlPage(object):
                         href='http://gcc-python-plugin.readthedocs.org/',
                     ),
                 ),
-                E.DIV(
-                    E.ATTR(id='info'),
-                    E.SPAN(
-                        E.CLASS('label'),
-                        'Filename: ',
-                    ),
-                    self.data['filename'],
-                    E.SPAN(
-                        E.CLASS('label'),
-                        'Function: ',
-                    ),
-                    self.data['function']['name'],
-                ),
+                self.info(),
                 E.DIV(
                     E.ATTR(id='report-pagination'),
                     E.SPAN(
@@ -185,9 +221,11 @@ class HtmlPage(object):
             ),
         )
 
-    def states(self):
+    def states(self, reports=None):
         """Return an ordered-list of states, for each report."""
-        for report in self.data['reports']:
+        if reports is None:
+            reports = self.data['reports']
+        for report in reports:
             annotations = E.OL({'class': 'states'})
 
             prevline = None
@@ -231,36 +269,120 @@ class HtmlPage(object):
 
             yield annotations, report['message']
 
+    @staticmethod
+    def report(i, state_html, state_problem, code, funcname=None):
+        """One item of the #reports list"""
+        problem = E.DIV(E.CLASS('error'))
+        if funcname is not None:
+            problem.append(E.SPAN(E.CLASS('label'), funcname + ': '))
+            problem[-1].tail = state_problem
+        else:
+            problem.text = state_problem
+        return E.LI(
+            E.ATTR(id="state{0}".format(i)),
+            E.E.header(
+                problem,
+                E.DIV(
+                    E.CLASS('report-count'),
+                    E.H3('Report'),
+                    str(i),
+                ),
+            ),
+            E.DIV(
+                E.CLASS('body'),
+                E.DIV(
+                    E.CLASS('source'),
+                    code,
+                ),
+                state_html,
+            ),
+        )
+
     def body(self):
         """The BODY of the html document"""
         reports = E.OL(id='reports')
-        code = self.code()
 
         for i, (state_html, state_problem) in enumerate(self.states(), 1):
             reports.append(
+                self.report(i, state_html, state_problem, self.code())
+            )
+
+        return E.BODY(
+            self.header(),
+            reports,
+            self.footer(),
+        )
+
+
+class HtmlBundlePage(HtmlPage):
+    """Represent one html page for every function within a translation unit.
+
+    "functions" is a list of the data for each function (as for HtmlPage),
+    in the order in which they should be shown.  The reports are numbered
+    consecutively across the whole page, and the header has an index of the
+    functions.  Each source file is only read and highlighted once.
+    """
+    def __init__(self, filename, functions):
+        reports = []
+        for data in functions:
+            reports.extend(data['reports'])
+        HtmlPage.__init__(self, None, dict(filename=filename,
+                                           reports=reports))
+        self.functions = functions
+        self.highlighters = {}
+
+    def function_code(self, data):
+        """the highlighted source of the given function"""
+        filename = data['filename']
+        if filename not in self.highlighters:
+            with open(filename) as codefile:
+                self.highlighters[filename] = SourceHighlighter(codefile)
+        first, last = data['function']['lines']
+        return self.highlighters[filename].code(first, last)
+
+    def index(self):
+        """Links to the first report of each function"""
+        index = E.UL(id='index')
+        i = 1
+        for data in self.functions:
+            count = len(data['reports'])
+            index.append(
                 E.LI(
-                    E.ATTR(id="state{0}".format(i)),
-                    E.E.header(
-                        E.DIV(
-                            E.CLASS('error'),
-                            state_problem,
-                        ),
-                        E.DIV(
-                            E.CLASS('report-count'),
-                            E.H3('Report'),
-                            str(i),
-                        ),
-                    ),
-                    E.DIV(
-                        E.CLASS('body'),
-                        E.DIV(
-                            E.CLASS('source'),
-                            deepcopy(code),
-                        ),
-                        state_html,
-                    ),
-                ),
+                    E.A(data['function']['name'],
+                        href="#state{0}".format(i)),
+                    ' (%i report%s)' % (count, '' if count == 1 else 's'),
+                )
             )
+            i += count
+        return index
+
+    def info(self):
+        return E.DIV(
+            E.ATTR(id='info'),
+            E.SPAN(
+                E.CLASS('label'),
+                'Filename: ',
+            ),
+            self.data['filename'],
+            E.SPAN(
+                E.CLASS('label'),
+                'Functions: ',
+            ),
+            self.index(),
+        )
+
+    def body(self):
+        reports = E.OL(id='reports')
+
+        i = 1
+        for data in self.functions:
+            for state_html, state_problem in self.states(data['reports']):
+                reports.append(
+                    self.report(i, state_html, state_problem,
+                                self.function_code(data),
+                                data['function']['name'])
+                )
+                i += 1
 
         return E.BODY(
             self.header(),
@@ -0,0 +1,419 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+# Benchmarks for the performance of the refcount checker.
+#
+# This compiles a fixed corpus of C files using gcc-with-cpychecker --stats:
+#   - each input*.c below tests/cpychecker/refcounts that uses Python.h
+#   - a set of large extension modules, generated using cpybuilder
+#
+# For each file, the wall time and peak RSS of the compiler are recorded,
+# along with the per-function telemetry written by --stats.  These are then
+# summarized as:
+#   - transitions_per_sec: the number of transitions explored by the checker,
+#     per second of CPU time spent within the checker
+#   - latency_median, latency_p95, latency_max: the wall time taken to check
+#     a function, in seconds
+#   - peak_rss_kb: the largest peak RSS of the compiler, over all of the files
+#   - total_wall_secs: the total time taken to compile the corpus
+#
+# Usage:
+#   python run-benchmarks.py [options] [extra gcc-with-cpychecker options]
+#
+# The results can be saved as a baseline:
+#   python run-benchmarks.py --save-baseline=baseline.json
+# and a later run compared against it:
+#   python run-benchmarks.py --baseline=baseline.json
+# exiting with a non-zero status if any metric regressed by more than its
+# threshold (as a fraction of the baseline value; see --threshold).
+
+from __future__ import print_function
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+from distutils.sysconfig import get_python_inc
+from subprocess import Popen
+
+from cpybuilder import SimpleModule, PyMethodTable
+
+srcdir = os.path.abspath(os.path.dirname(__file__))
+
+############################################################################
+# The corpus
+############################################################################
+
+def get_test_inputs():
+    """
+    Get the paths of the C files within the refcount tests that use Python.h
+    """
+    result = []
+    for dirpath, dirnames, filenames in os.walk(os.path.join(srcdir, 'tests',
+                                                             'cpychecker',
+                                                             'refcounts')):
+        for filename in sorted(filenames):
+            if filename.startswith('input') and filename.endswith('.c'):
+                path = os.path.join(dirpath, filename)
+                with open(path) as f:
+                    if '#include <Python.h>' in f.read():
+                        result.append(path)
+    return sorted(result)
+
+def make_build_tuple_fn(fnname, size):
+    return ('static PyObject *\n'
+            '%(fnname)s(PyObject *self, PyObject *args)\n'
+            '{\n'
+            '    PyObject *result;\n'
+            '    int i;\n'
+            '\n'
+            '    result = PyTuple_New(%(size)i);\n'
+            '    if (!result) {\n'
+            '        return NULL;\n'
+            '    }\n'
+            '    for (i = 0; i < %(size)i; i++) {\n'
+            '        PyObject *item = PyLong_FromLong(i);\n'
+            '        if (!item) {\n'
+            '            Py_DECREF(result);\n'
+            '            return NULL;\n'
+            '        }\n'
+            '        PyTuple_SET_ITEM(result, i, item);\n'
+            '    }\n'
+            '    return result;\n'
+            '}\n\n') % locals()
+
+def make_build_list_fn(fnname, numitems):
+    result = ('static PyObject *\n'
+              '%(fnname)s(PyObject *self, PyObject *args)\n'
+              '{\n'
+              '    PyObject *list;\n'
+              '    PyObject *item;\n'
+              '\n'
+              '    list = PyList_New(0);\n'
+              '    if (!list) {\n'
+              '        return NULL;\n'
+              '    }\n') % locals()
+    for i in range(numitems):
+        result += ('    item = PyLong_FromLong(%(i)i);\n'
+                   '    if (!item) {\n'
+                   '        goto error;\n'
+                   '    }\n'
+                   '    if (PyList_Append(list, item) < 0) {\n'
+                   '        Py_DECREF(item);\n'
+                   '        goto error;\n'
+                   '    }\n'
+                   '    Py_DECREF(item);\n') % locals()
+    result += ('    return list;\n'
+               '\n'
+               'error:\n'
+               '    Py_DECREF(list);\n'
+               '    return NULL;\n'
+               '}\n\n')
+    return result
+
+def make_build_dict_fn(fnname, numitems):
+    result = ('static PyObject *\n'
+              '%(fnname)s(PyObject *self, PyObject *args)\n'
+              '{\n'
+              '    PyObject *dict;\n'
+              '    PyObject *value;\n'
+              '\n'
+              '    dict = PyDict_New();\n'
+              '    if (!dict) {\n'
+              '        return NULL;\n'
+              '    }\n') % locals()
+    for i in range(numitems):
+        result += ('    value = PyLong_FromLong(%(i)i);\n'
+                   '    if (!value) {\n'
+                   '        goto error;\n'
+                   '    }\n'
+                   '    if (PyDict_SetItemString(dict, "key%(i)i", value) < 0) {\n'
+                   '        Py_DECREF(value);\n'
+                   '        goto error;\n'
+                   '    }\n'
+                   '    Py_DECREF(value);\n') % locals()
+    result += ('    return dict;\n'
+               '\n'
+               'error:\n'
+               '    Py_DECREF(dict);\n'
+               '    return NULL;\n'
+               '}\n\n')
+    return result
+
+def make_parse_args_fn(fnname):
+    return ('static PyObject *\n'
+            '%(fnname)s(PyObject *self, PyObject *args)\n'
+            '{\n'
+            '    int i;\n'
+            '    const char *s;\n'
+            '    PyObject *obj;\n'
+            '\n'
+            '    if (!PyArg_ParseTuple(args, "isO", &i, &s, &obj)) {\n'
+            '        return NULL;\n'
+            '    }\n'
+            '    return Py_BuildValue("(isO)", i, s, obj);\n'
+            '}\n\n') % locals()
+
+def make_generated_module(modname, numgroups, numitems):
+    """
+    Generate a SimpleModule with "numgroups" groups of functions, each group
+    containing one function of each of the shapes above
+    """
+    sm = SimpleModule()
+    methods = PyMethodTable('%s_methods' % modname, [])
+    for i in range(numgroups):
+        for kind, defn in [('build_tuple',
+                            make_build_tuple_fn('%s_build_tuple_%i' % (modname, i),
+                                                numitems)),
+                           ('build_list',
+                            make_build_list_fn('%s_build_list_%i' % (modname, i),
+                                               numitems)),
+                           ('build_dict',
+                            make_build_dict_fn('%s_build_dict_%i' % (modname, i),
+                                               numitems)),
+                           ('parse_args',
+                            make_parse_args_fn('%s_parse_args_%i' % (modname, i)))]:
+            fnname = '%s_%s_%i' % (modname, kind, i)
+            sm.cu.add_defn(defn)
+            methods.add_method('%s_%i' % (kind, i), fnname,
+                               'METH_VARARGS', '')
+    sm.cu.add_defn(methods.c_defn())
+    sm.add_module_init(modname, methods, 'Generated benchmark module')
+    return sm
+
+# The generated part of the corpus: (modname, numgroups, numitems):
+GENERATED_MODULES = [('bench_small', 10, 4),
+                     ('bench_medium', 40, 6),
+                     ('bench_large', 100, 8)]
+
+def write_generated_modules(builddir):
+    result = []
+    for modname, numgroups, numitems in GENERATED_MODULES:
+        path = os.path.join(builddir, '%s.c' % modname)
+        with open(path, 'w') as f:
+            f.write(make_generated_module(modname, numgroups,
+                                          numitems).cu.as_str())
+        result.append(path)
+    return result
+
+############################################################################
+# Running the benchmarks
+############################################################################
+
+def compile_one(path, extra_args):
+    """
+    Compile the given C file through gcc-with-cpychecker --stats, returning
+    a (fileresult, functions) pair, where "fileresult" is a dict describing
+    the compilation, and "functions" a list of dicts, one per function, as
+    written by --stats
+    """
+    # Compile within a temporary directory, so that the dump files for the
+    # source file (including the telemetry) are easy to find:
+    tmpdir = tempfile.mkdtemp()
+    try:
+        args = [sys.executable, os.path.join(srcdir, 'gcc-with-cpychecker'),
+                '--stats']
+        args += extra_args
+        args += ['-c', '-fPIC',
+                 '-I' + get_python_inc(),
+                 '-o', os.path.join(tmpdir, 'output.o'),
+                 path]
+        env = dict(os.environ)
+        env['LC_ALL'] = 'C'
+        with open(os.devnull, 'w') as devnull:
+            start = os.times()[4]
+            p = Popen(args, env=env, cwd=tmpdir, stdout=devnull, stderr=devnull)
+            # Use wait4 rather than p.wait(), to get the resource usage of
+            # the compiler (including the cc1 subprocess):
+            pid, status, rusage = os.wait4(p.pid, 0)
+            wall_secs = os.times()[4] - start
+
+        functions = []
+        for statsfile in glob.glob(os.path.join(tmpdir,
+                                                '*.cpychecker-stats.jsonl')):
+            with open(statsfile) as f:
+                for line in f:
+                    functions.append(json.loads(line))
+    finally:
+        shutil.rmtree(tmpdir)
+
+    fileresult = dict(wall_secs=wall_secs,
+                      # (ru_maxrss is in kilobytes on Linux)
+                      peak_rss_kb=rusage.ru_maxrss,
+                      exitstatus=(os.WEXITSTATUS(status)
+                                  if os.WIFEXITED(status) else None),
+                      num_functions=len(functions))
+    return fileresult, functions
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def summarize(files, functions):
+    analyzed = [js for js in functions if not js['cached']]
+    transitions = sum([js['transitions'] for js in analyzed])
+    cpu_secs = sum([js['cpu_secs'] for js in analyzed])
+    latencies = [js['wall_secs'] for js in analyzed]
+    if cpu_secs > 0:
+        transitions_per_sec = transitions / cpu_secs
+    else:
+        transitions_per_sec = None
+    return dict(transitions_per_sec=transitions_per_sec,
+                latency_median=percentile(latencies, 0.5),
+                latency_p95=percentile(latencies, 0.95),
+                latency_max=percentile(latencies, 1.0),
+                peak_rss_kb=max([f['peak_rss_kb'] for f in files.values()]),
+                total_wall_secs=sum([f['wall_secs'] for f in files.values()]),
+                num_functions=len(analyzed),
+                num_too_complicated=len([js for js in analyzed
+                                         if js['too_complicated']]))
+
+def run_benchmarks(extra_args, verbose):
+    builddir = tempfile.mkdtemp()
+    try:
+        paths = get_test_inputs() + write_generated_modules(builddir)
+        files = {}
+        functions = []
+        for path in paths:
+            if path.startswith(builddir):
+                name = os.path.relpath(path, builddir)
+            else:
+                name = os.path.relpath(path, srcdir)
+            fileresult, file_functions = compile_one(path, extra_args)
+            for js in file_functions:
+                js['source'] = name
+            files[name] = fileresult
+            functions += file_functions
+            if verbose:
+                print('%s: %.2fs, %i functions, peak RSS %ikB'
+                      % (name, fileresult['wall_secs'],
+                         fileresult['num_functions'],
+                         fileresult['peak_rss_kb']))
+    finally:
+        shutil.rmtree(builddir)
+    return dict(summary=summarize(files, functions),
+                files=files,
+                functions=functions)
+
+############################################################################
+# Comparing against a baseline
+############################################################################
+
+# For each metric within the summary: is a higher value better?
+METRICS = [('transitions_per_sec', True),
+           ('latency_median', False),
+           ('latency_p95', False),
+           ('latency_max', False),
+           ('peak_rss_kb', False),
+           ('total_wall_secs', False)]
+
+def compare(baseline, current, thresholds, default_threshold):
+    """
+    Compare the summaries, printing a table, and returning the list of names
+    of the metrics that regressed by more than their thresholds
+    """
+    regressions = []
+    print('%-20s %14s %14s %8s' % ('metric', 'baseline', 'current', 'change'))
+    for name, higher_is_better in METRICS:
+        old = baseline['summary'].get(name)
+        new = current['summary'].get(name)
+        if not old or new is None:
+            print('%-20s %14s %14s' % (name, old, new))
+            continue
+        change = (new - old) / float(old)
+        threshold = thresholds.get(name, default_threshold)
+        if higher_is_better:
+            regressed = change < -threshold
+        else:
+            regressed = change > threshold
+        print('%-20s %14.4g %14.4g %+7.1f%%%s'
+              % (name, old, new, change * 100,
+                 ' REGRESSION' if regressed else ''))
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def parse_thresholds(items):
+    result = {}
+    for item in items or []:
+        name, value = item.split('=', 1)
+        if name not in dict(METRICS):
+            raise ValueError('unknown metric: %r' % name)
+        result[name] = float(value)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage='%(prog)s [options] [gcc-with-cpychecker options]')
+    parser.add_argument('--baseline',
+                        dest='baseline',
+                        help='compare the results against those in FILE',
+                        metavar='FILE')
+    parser.add_argument('--save-baseline',
+                        dest='save_baseline',
+                        help='save the results to FILE, for use as a baseline',
+                        metavar='FILE')
+    parser.add_argument('--threshold',
+                        action='append',
+                        dest='thresholds',
+                        help=('the largest acceptable regression for the given'
+                              ' metric, as a fraction of the baseline value'
+                              ' e.g. "latency_p95=0.25"'),
+                        metavar='METRIC=FRACTION')
+    parser.add_argument('--default-threshold',
+                        type=float,
+                        dest='default_threshold',
+                        default=0.10,
+                        help=('the largest acceptable regression for metrics'
+                              ' without a --threshold (default: 0.10)'),
+                        metavar='FRACTION')
+    parser.add_argument('-v', '--verbose',
+                        action='store_true',
+                        dest='verbose',
+                        default=False,
+                        help='show the results for each file')
+    # Pass any other options through to gcc-with-cpychecker (e.g.
+    # --merge-states), so that configurations can be compared:
+    options, extra_args = parser.parse_known_args()
+    thresholds = parse_thresholds(options.thresholds)
+
+    current = run_benchmarks(extra_args, options.verbose)
+    for name, value in sorted(current['summary'].items()):
+        print('%s: %s' % (name, value))
+    if not current['summary']['num_functions']:
+        print('warning: no functions were analyzed by the refcount checker'
+              ' (is it disabled for this version of GCC?)')
+
+    if options.save_baseline:
+        with open(options.save_baseline, 'w') as f:
+            json.dump(current, f, sort_keys=True, indent=4)
+
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, thresholds,
+                              options.default_threshold)
+        if regressions:
+            print('Regressions: %s' % ', '.join(regressions))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
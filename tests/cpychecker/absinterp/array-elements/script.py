@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that the contents of an array region are tracked as an interval map
+# of runs of indices within each state, so that writing to a range of
+# indices costs the same however large the range is
+
+import gcc
+from libcpychecker.absinterp import iter_traces, Limits, Region, \
+    ConcreteValue, WithinRange
+from libcpychecker.refcounts import make_stmt_graph
+
+from gccutils.selftests import assertEqual, run_on_each_function
+
+def get_runs(state, r_array):
+    # The (start, end, value) of each run of the array within the state:
+    return [(region.index, region.lastindex,
+             state.value_for_region[region].value)
+            for region in state.array_contents[r_array].regions]
+
+def check_array_contents(fun):
+    stmtgraph = make_stmt_graph(fun)
+    traces = iter_traces(stmtgraph, {}, limits=Limits(maxtrans=1000))
+    state = traces[0].states[0].copy()
+    inttype = gcc.Type.int()
+    def value(i):
+        return ConcreteValue(inttype, None, i)
+
+    # Writing larger and larger ranges uses a single region for the run,
+    # rather than one per index:
+    for size in (10, 1000, 1000000, 0x7fffffffffffffff):
+        r_array = Region('arr', None)
+        state.set_array_range(r_array, 0, size - 1, value(0))
+        assertEqual(len(r_array.children), 1)
+        assertEqual(get_runs(state, r_array), [(0, size - 1, 0)])
+
+    # Writing within a run splits it:
+    r_array = Region('arr', None)
+    state.set_array_range(r_array, 0, 999999, value(0))
+    state.set_array_range(r_array, 10, 19, value(1))
+    assertEqual(get_runs(state, r_array),
+                [(0, 9, 0), (10, 19, 1), (20, 999999, 0)])
+
+    # ...and indexing an element gives it a run of its own, with the value
+    # of the run it was split from:
+    r_element = state._array_region(r_array, 500)
+    assertEqual(r_element.index, 500)
+    assertEqual(get_runs(state, r_array),
+                [(0, 9, 0), (10, 19, 1), (20, 499, 0), (500, 500, 0),
+                 (501, 999999, 0)])
+    assert state._array_region(r_array, 500) is r_element
+    state.value_for_region[r_element] = value(2)
+
+    # Ranges are summarized from the runs that cover them, without visiting
+    # every index:
+    def summarize(minvalue, maxvalue):
+        v_range = WithinRange(inttype, None, minvalue, maxvalue)
+        return state.summarize_array(r_array, v_range, inttype, None)
+    assertEqual(summarize(0, 9).value, 0)
+    v_summary = summarize(0, 999999)
+    assertEqual((v_summary.minvalue, v_summary.maxvalue), (0, 2))
+    assert summarize(0, 1000000) is None
+
+    # Writing back the surrounding value coalesces the adjacent runs:
+    state.set_array_range(r_array, 500, 500, value(0))
+    state.set_array_range(r_array, 10, 19, value(0))
+    assertEqual(get_runs(state, r_array), [(0, 999999, 0)])
+    # (the old element region takes its value from the run now covering it):
+    assertEqual(state.get_store(r_element, inttype, None).value, 0)
+
+    # The runs are per-state; a copy is unaffected by later writes:
+    s_copy = state.copy()
+    state.set_array_range(r_array, 0, 4, value(3))
+    assertEqual(get_runs(s_copy, r_array), [(0, 999999, 0)])
+    assertEqual(get_runs(state, r_array), [(0, 4, 3), (5, 999999, 0)])
+
+    # Writing over a whole array leaves the region count constant:
+    num_regions = len(r_array.children)
+    for i in range(10):
+        state.set_array_range(r_array, 0, 999999, value(i))
+        assertEqual(get_runs(state, r_array), [(0, 999999, i)])
+    assertEqual(len(r_array.children), num_regions)
+
+run_on_each_function(check_array_contents)
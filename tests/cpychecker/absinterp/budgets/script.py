@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that Limits degrades gracefully when its budgets are used, and that
+# when a budget runs out, the refcount checker notes that not all paths were
+# analyzed, and doesn't cache the incomplete results
+
+import os
+import sys
+import time
+
+from libcpychecker.absinterp import Limits, TooComplicated
+from libcpychecker.diagnostics import CapturedDiagnostics
+from libcpychecker.refcounts import check_refcounts, make_limits
+
+from gccutils.selftests import assertEqual, run_on_each_function, \
+    temporary_directory, environment_variable
+
+def expect_too_complicated(limits, reason):
+    try:
+        limits.on_transition(None, [])
+    except TooComplicated:
+        err = sys.exc_info()[1]
+        assertEqual(err.reason, reason)
+        assertEqual(limits.budget_exceeded, reason)
+        assert limits.is_exhausted()
+        return
+    raise AssertionError('expected TooComplicated')
+
+def verify_limits():
+    # No budgets; only maxtrans applies:
+    limits = Limits(maxtrans=2)
+    assert not limits.has_budgets()
+    limits.on_transition(None, [])
+    limits.on_transition(None, [])
+    assert not limits.is_exhausted()
+    expect_too_complicated(limits, None)
+
+    # Plenty of budget left:
+    limits = Limits(maxtrans=1000, time_budget=3600,
+                    memory_budget=1024 * 1024 * 1024)
+    limits.on_transition(None, [])
+    assert not limits.degraded
+    assert not limits.is_exhausted()
+
+    # More than half of the time budget used: switch to the cheaper mode,
+    # but keep going:
+    limits = Limits(maxtrans=1000, time_budget=100)
+    limits.start_time = time.time() - 60
+    limits.on_transition(None, [])
+    assert limits.degraded
+    assertEqual(limits.budget_exceeded, None)
+
+    # All of it used:
+    limits.start_time = time.time() - 100
+    limits.trans_seen = Limits.CHECK_INTERVAL - 1
+    expect_too_complicated(limits, 'the time budget')
+
+    # A budget of zero stops at the first transition:
+    expect_too_complicated(Limits(maxtrans=1000, time_budget=0),
+                           'the time budget')
+    expect_too_complicated(Limits(maxtrans=1000, memory_budget=0),
+                           'the memory budget')
+
+    # The budgets given to the checker; the memory budget is in megabytes, and
+    # the total budget caps the per-function one:
+    limits = make_limits(256, None, 2, None)
+    assertEqual(limits.time_budget, None)
+    assertEqual(limits.memory_budget, 2 * 1024 * 1024)
+    assertEqual(make_limits(256, 3600, None, 0).time_budget, 0)
+    assert make_limits(256, 1, None, 3600).time_budget == 1
+
+TOO_COMPLICATED = ('this function used up the time budget of the'
+                   ' reference-count checker: not all paths were analyzed')
+
+def get_messages(records):
+    return [(kind, msg) for kind, loc, msg in records]
+
+def verify_checker(fun):
+    # With plenty of budget, the leak is reported:
+    with CapturedDiagnostics() as captured:
+        check_refcounts(fun, time_budget=3600)
+    messages = get_messages(captured.records)
+    assert [msg for kind, msg in messages
+            if kind == 'warning' and "ob_refcnt of '*obj' is 1 too high" in msg]
+    assert ('inform', TOO_COMPLICATED) not in messages
+
+    # With none, no paths are analyzed, and the checker says so rather than
+    # reporting nothing:
+    with CapturedDiagnostics() as captured:
+        check_refcounts(fun, time_budget=0)
+    assertEqual(get_messages(captured.records), [('inform', TOO_COMPLICATED)])
+
+    # ...likewise once the budget for the whole translation unit has been
+    # used up:
+    with CapturedDiagnostics() as captured:
+        check_refcounts(fun, total_time_budget=0)
+    assertEqual(get_messages(captured.records), [('inform', TOO_COMPLICATED)])
+
+    # Incomplete results aren't cached:
+    with temporary_directory() as tmpdir:
+        with environment_variable('XDG_CACHE_HOME', tmpdir):
+            with CapturedDiagnostics():
+                check_refcounts(fun, cache=True, time_budget=0)
+        for dirpath, dirnames, filenames in os.walk(tmpdir):
+            assertEqual(filenames, [])
+
+def verify_budgets(fun):
+    verify_limits()
+    verify_checker(fun)
+
+run_on_each_function(verify_budgets)
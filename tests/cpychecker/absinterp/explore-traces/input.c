@@ -0,0 +1,59 @@
+/*
+   Copyright 2026 Red Hat, Inc.
+
+   This is free software: you can redistribute it and/or modify it
+   under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful, but
+   WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+   General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see
+   <http://www.gnu.org/licenses/>.
+*/
+
+#include <Python.h>
+
+/*
+  Test of explore_traces: a function with branches and a loop, for which
+  the traces (and the partial results when the limits are hit) should be
+  the same as those of a recursive traversal of the state tree
+*/
+
+int
+test(int i, int n)
+{
+    int total = 0;
+    int j;
+
+    if (i > 0) {
+        total = 1;
+    } else if (i < 0) {
+        total = -1;
+    }
+
+    for (j = 0; j < n; j++) {
+        total += j;
+    }
+
+    switch (i) {
+    case 1:
+        return total;
+    case 2:
+        return -total;
+    default:
+        return 0;
+    }
+}
+
+/*
+  PEP-7
+Local variables:
+c-basic-offset: 4
+indent-tabs-mode: nil
+End:
+*/
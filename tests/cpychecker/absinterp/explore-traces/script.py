@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that explore_traces finds the same traces, in the same order, as a
+# recursive depth-first traversal of the state tree (as iter_traces used to
+# be), both when it runs to completion and when it hits the limits
+
+import sys
+
+from libcpychecker.absinterp import explore_traces, iter_traces, Limits, \
+    PredictedError, SplitValue, State, Trace, TooComplicated
+from libcpychecker.refcounts import make_stmt_graph
+
+from gccutils.selftests import assertEqual, run_on_each_function
+
+def recursive_traces(stmtgraph, limits, prefix=None):
+    """
+    The reference implementation: a recursive traversal, as per the old
+    iter_traces, returning a list of Trace instances
+    """
+    fun = stmtgraph.fun
+    if prefix is None:
+        prefix = Trace()
+        curstate = State(stmtgraph, stmtgraph.get_entry_nodes()[0],
+                         None, {}, None, None, None)
+        curstate.init_for_function(fun)
+    else:
+        curstate = prefix.states[-1]
+        if curstate.has_returned or curstate.not_returning:
+            return [prefix]
+        if prefix.has_looped():
+            return []
+
+    try:
+        transitions = curstate.get_transitions()
+    except PredictedError:
+        err = sys.exc_info()[1]
+        trace_with_err = prefix.copy()
+        trace_with_err.add_error(err)
+        return [trace_with_err]
+    except SplitValue:
+        err = sys.exc_info()[1]
+        transitions = err.split(curstate)
+
+    if not transitions:
+        return [prefix]
+    result = []
+    for transition in transitions:
+        transition.dest.verify()
+        limits.on_transition(transition, result)
+        newprefix = prefix.copy().add(transition)
+        try:
+            result += recursive_traces(stmtgraph, limits, newprefix)
+        except TooComplicated:
+            # The innermost traces come first:
+            err = sys.exc_info()[1]
+            raise TooComplicated(err.complete_traces + result)
+    return result
+
+def describe_trace(trace):
+    # Something comparable between separate runs, which each have their own
+    # State and Transition instances:
+    def describe_state(state):
+        return (state.stmtnode.bb.index, str(state.stmtnode))
+    return ([(describe_state(t.src), describe_state(t.dest), t.desc)
+             for t in trace.transitions],
+            str(trace.err))
+
+def describe_traces(traces):
+    return [describe_trace(trace) for trace in traces]
+
+def get_traces(fn, stmtgraph, maxtrans):
+    """
+    Get a (traces, limits, complete) triple
+    """
+    limits = Limits(maxtrans=maxtrans)
+    try:
+        traces = fn(stmtgraph, limits)
+    except TooComplicated:
+        err = sys.exc_info()[1]
+        return err.complete_traces, limits, False
+    return traces, limits, True
+
+def get_new_traces(stmtgraph, limits):
+    return iter_traces(stmtgraph, {}, limits=limits)
+
+def verify_explore_traces(fun):
+    stmtgraph = make_stmt_graph(fun)
+
+    # Running to completion:
+    expected, limits, complete = get_traces(recursive_traces, stmtgraph,
+                                            1000)
+    assert complete
+    num_transitions = limits.trans_seen
+    # (one for each combination of the branches and the loop):
+    assert len(expected) > 3
+    assert limits.loops_dropped == 0
+
+    actual, limits, complete = get_traces(get_new_traces, stmtgraph, 1000)
+    assert complete
+    assertEqual(describe_traces(actual), describe_traces(expected))
+    assertEqual(limits.trans_seen, num_transitions)
+    # (whereas explore_traces counts the paths it abandons at the loop):
+    assert limits.loops_dropped > 0
+
+    # The streaming version yields the same traces, one at a time:
+    limits = Limits(maxtrans=1000)
+    gen = explore_traces(stmtgraph, {}, limits=limits)
+    assertEqual(describe_trace(next(gen)), describe_trace(expected[0]))
+    assertEqual(describe_traces(gen), describe_traces(expected[1:]))
+
+    # Hitting the limit part-way through gives the same partial list of
+    # traces, in the same order (see TooComplicated.get_trace_order_key):
+    for maxtrans in (1, 2, num_transitions // 4, num_transitions // 2,
+                     num_transitions - 1):
+        expected, limits, complete = get_traces(recursive_traces, stmtgraph,
+                                                maxtrans)
+        assert not complete
+        actual, limits, complete = get_traces(get_new_traces, stmtgraph,
+                                              maxtrans)
+        assert not complete
+        assertEqual(describe_traces(actual), describe_traces(expected))
+        assertEqual(limits.trans_seen, maxtrans + 1)
+    assert expected
+
+    # explore_traces itself will already have yielded the traces by then:
+    limits = Limits(maxtrans=num_transitions // 2)
+    yielded = []
+    try:
+        for trace in explore_traces(stmtgraph, {}, limits=limits):
+            yielded.append(trace)
+    except TooComplicated:
+        err = sys.exc_info()[1]
+        assertEqual(err.complete_traces, [])
+        assert err.interrupted_at
+        assertEqual(err.reason, None)
+    else:
+        raise AssertionError('expected TooComplicated')
+    assert yielded
+    assert limits.is_exhausted()
+
+run_on_each_function(verify_explore_traces)
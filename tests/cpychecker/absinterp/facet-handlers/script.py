@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that a Facet can have handlers for C functions registered on it,
+# without defining "impl_" methods
+
+import gcc
+from libcpychecker.absinterp import Facet, ConcreteValue, iter_traces
+from libcpychecker.refcounts import make_stmt_graph
+
+from gccutils.selftests import assertEqual
+
+class MyLibrary(Facet):
+    __slots__ = ()
+
+    def __init__(self, state, fun=None):
+        Facet.__init__(self, state)
+
+    def copy(self, newstate):
+        return MyLibrary(newstate)
+
+    def init_for_function(self, fun):
+        pass
+
+@MyLibrary.register_impl('get_answer')
+def handle_get_answer(facet, stmt):
+    s_new = facet.state.mkstate_concrete_return_of(stmt, 42)
+    return [facet.state.mktrans_from_fncall_state(stmt, s_new,
+                                                  'returns 42', False)]
+
+def verify_handlers(optpass, fun):
+    if optpass.name == '*warn_function_return':
+        if fun and fun.decl.name == 'test':
+            assertEqual(MyLibrary.get_impl('get_answer'), handle_get_answer)
+            assertEqual(Facet.get_impl('get_answer'), None)
+
+            stmtgraph = make_stmt_graph(fun)
+            traces = iter_traces(stmtgraph, {'mylib': MyLibrary})
+            assertEqual(len(traces), 1)
+            v_return = traces[0].states[-1].return_rvalue
+            assert isinstance(v_return, ConcreteValue)
+            assertEqual(v_return.value, 42)
+
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      verify_handlers)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that the immutable kinds of AbstractValue are interned, and that
+# those which must keep their identity aren't
+
+import gcc
+from libcpychecker.absinterp import ConcreteValue, PointerToRegion, \
+    UnknownValue, WithinRange, Region, clear_interned_values
+
+from gccutils.selftests import assertEqual
+
+def verify_interning(optpass, fun):
+    if optpass.name == '*warn_function_return':
+        if fun and fun.decl.name == 'test':
+            loc = fun.start
+            inttype = gcc.Type.int()
+            ptrtype = inttype.pointer
+
+            v_zero = ConcreteValue(inttype, loc, 0)
+            assert ConcreteValue(inttype, loc, 0) is v_zero
+            assert ConcreteValue(inttype, None, 0) is not v_zero
+            assert ConcreteValue(inttype, loc, 1) is not v_zero
+            assert ConcreteValue(inttype, loc, 0.0) is not v_zero
+            assertEqual(ConcreteValue.from_int(3).value, 3)
+
+            region = Region('some-region', None)
+            v_ptr = PointerToRegion(ptrtype, loc, region)
+            assert PointerToRegion(ptrtype, loc, region) is v_ptr
+            assert (PointerToRegion(ptrtype, loc, Region('another-region', None))
+                    is not v_ptr)
+
+            # Values whose identity matters must not be interned:
+            assert UnknownValue(ptrtype, loc) is not UnknownValue(ptrtype, loc)
+            assert (WithinRange(inttype, loc, 0, 10)
+                    is not WithinRange(inttype, loc, 0, 10))
+
+            # Interned values are slot-based:
+            assert not hasattr(v_zero, '__dict__')
+            assert not hasattr(UnknownValue(ptrtype, loc), '__dict__')
+            assert not hasattr(region, '__dict__')
+
+            # Splitting gives copies marked as "fromsplit", leaving the shared
+            # instances untouched:
+            v_split = v_zero.copy_from_split()
+            assert v_split is not v_zero
+            assertEqual(v_split.value, 0)
+            assertEqual(v_split.loc, loc)
+            assert hasattr(v_split, 'fromsplit')
+            assert not hasattr(v_zero, 'fromsplit')
+            assert not hasattr(ConcreteValue(inttype, loc, 0), 'fromsplit')
+
+            clear_interned_values()
+            assert ConcreteValue(inttype, loc, 0) is not v_zero
+
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      verify_interning)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that log messages are filtered by subsystem and level, that the
+# arguments of filtered-out messages are never computed, and that changes
+# to the levels take effect immediately
+
+from six import StringIO
+
+import libcpychecker.utils
+from libcpychecker.utils import get_logger, set_log_level, Lazy, \
+    _parse_log_levels, DEBUG, INFO, DISABLED
+
+from gccutils.selftests import assertEqual, run_on_whole_unit
+
+class Counter(object):
+    # A Lazy-wrapped function that records how often it was called:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return text
+
+def check_logging():
+    assertEqual(_parse_log_levels('absinterp=info, refcounts,*=disabled,'),
+                {'absinterp': INFO, 'refcounts': DEBUG, '*': DISABLED})
+
+    logfile = StringIO()
+    libcpychecker.utils.logfile = logfile
+    try:
+        # Disabled by default; the argument is never computed:
+        log = get_logger('selftest')
+        assert get_logger('selftest') is log
+        assert not log.is_enabled()
+        counter = Counter()
+        log('never %s', Lazy(counter, 'written'))
+        log.info('never %s', Lazy(counter, 'written'))
+        assertEqual(counter.calls, 0)
+
+        # Enabling one subsystem at INFO takes effect for the existing
+        # logger, without enabling DEBUG messages, or other subsystems:
+        set_log_level(INFO, 'selftest')
+        assert log.is_enabled(INFO)
+        assert not log.is_enabled(DEBUG)
+        log('not at debug level: %s', Lazy(counter, 'debug'))
+        log.info('at info level: %s', Lazy(counter, 'info'))
+        get_logger('selftest-other').info('other: %s', Lazy(counter, 'other'))
+        assertEqual(counter.calls, 1)
+        assertEqual(logfile.getvalue(), 'at info level: info\n')
+
+        # Enabling everything also covers subsystems created later:
+        set_log_level(DEBUG)
+        get_logger('selftest-later')('later: %r', Lazy(counter, 'debug'))
+        assertEqual(counter.calls, 2)
+        assertEqual(logfile.getvalue(),
+                    "at info level: info\nlater: 'debug'\n")
+
+        # ...and disabling it again takes effect straight away:
+        set_log_level(DISABLED)
+        log.info('never %s', Lazy(counter, 'written'))
+        assertEqual(counter.calls, 2)
+    finally:
+        set_log_level(DISABLED)
+        libcpychecker.utils.logfile = None
+
+run_on_whole_unit(check_logging)
@@ -0,0 +1,48 @@
+/*
+   Copyright 2026 Red Hat, Inc.
+
+   This is free software: you can redistribute it and/or modify it
+   under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful, but
+   WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+   General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see
+   <http://www.gnu.org/licenses/>.
+*/
+
+
+/*
+  Test of merging states at join points: each "if" doubles the number of
+  paths through the function, but only widens the range of "count"
+*/
+int
+test(int i)
+{
+    int count = 0;
+
+    if (i & 1)
+        count++;
+    if (i & 2)
+        count++;
+    if (i & 4)
+        count++;
+    if (i & 8)
+        count++;
+    if (i & 16)
+        count++;
+    if (i & 32)
+        count++;
+
+    return count;
+}
+
+/*
+  PLEASE KEEP THIS FILE AS IS:
+  The test script expects the function to be named "test"
+*/
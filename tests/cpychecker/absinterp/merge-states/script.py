@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+# Verify that merging states at join points reduces the number of traces
+# through a function with many independent branches, whilst still covering
+# all of the possible return values
+
+import gcc
+from libcpychecker.absinterp import iter_traces, Limits, WithinRange
+from libcpychecker.refcounts import make_stmt_graph
+
+from gccutils.selftests import assertEqual
+
+def get_traces(fun, merge_states):
+    stmtgraph = make_stmt_graph(fun)
+    return iter_traces(stmtgraph, {},
+                       limits=Limits(maxtrans=100000),
+                       merge_states=merge_states)
+
+def verify_merging(optpass, fun):
+    if optpass.name == '*warn_function_return':
+        if fun and fun.decl.name == 'test':
+            unmerged = get_traces(fun, False)
+            assertEqual(len(unmerged), 64)
+
+            merged = get_traces(fun, True)
+            assert len(merged) < len(unmerged) // 2
+
+            # Every trace returns, and between them, the merged traces
+            # cover all of the values that "count" could be returned with:
+            minvalue = None
+            maxvalue = None
+            for trace in merged:
+                assert trace.err is None
+                endstate = trace.states[-1]
+                assert endstate.has_returned
+                v_return = endstate.return_rvalue
+                if isinstance(v_return, WithinRange):
+                    lower, upper = v_return.minvalue, v_return.maxvalue
+                else:
+                    lower = upper = v_return.value
+                if minvalue is None or lower < minvalue:
+                    minvalue = lower
+                if maxvalue is None or upper > maxvalue:
+                    maxvalue = upper
+            assertEqual(minvalue, 0)
+            assertEqual(maxvalue, 6)
+
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      verify_merging)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that the counts of the edges followed (Trace.paths_taken and
+# TraceNode.paths_taken) stop a trace the second time that it follows an
+# edge between blocks, and that they aren't shared between sibling traces
+
+from libcpychecker.absinterp import iter_traces, Limits, TraceNode
+from libcpychecker.refcounts import make_stmt_graph
+
+from gccutils.selftests import assertEqual, run_on_each_function
+
+def count_edges(transitions):
+    # The expected counts, from scratch:
+    counts = {}
+    for t in transitions:
+        pathedge = (t.src.stmtnode.bb, t.dest.stmtnode.bb)
+        if pathedge[0] != pathedge[1]:
+            counts[pathedge] = counts.get(pathedge, 0) + 1
+    return counts
+
+def get_counts(paths_taken):
+    return dict(paths_taken.unordered_items())
+
+def get_back_edges(trace):
+    # The edges between blocks leading back to a block already visited:
+    result = []
+    seen = set()
+    for t in trace.transitions:
+        seen.add(t.src.stmtnode.bb)
+        if t.src.stmtnode.bb != t.dest.stmtnode.bb:
+            if t.dest.stmtnode.bb in seen:
+                result.append(t)
+    return result
+
+def make_nodes(root, trace, start=0):
+    # A list of TraceNode for the transitions of the trace from "start"
+    # onwards, the first of them a child of "root":
+    nodes = []
+    node = root
+    for t in trace.transitions[start:]:
+        node = TraceNode(node, t)
+        nodes.append(node)
+    return nodes
+
+def verify_paths_taken(fun):
+    traces = iter_traces(make_stmt_graph(fun), {},
+                         limits=Limits(maxtrans=1000))
+
+    # Each trace only counts its own edges, and follows each of them at most
+    # once:
+    for trace in traces:
+        counts = count_edges(trace.transitions)
+        assertEqual(get_counts(trace.paths_taken), counts)
+        assertEqual(max(counts.values()), 1)
+        assert not trace.has_looped()
+
+    # Some go around the loop once (and no more):
+    looping = [trace for trace in traces if get_back_edges(trace)]
+    assert looping
+    for trace in looping:
+        assertEqual(len(get_back_edges(trace)), 1)
+
+    # Copying a trace doesn't share the counts:
+    trace = looping[0]
+    t_back = get_back_edges(trace)[0]
+    pathedge = (t_back.src.stmtnode.bb, t_back.dest.stmtnode.bb)
+    copied = trace.copy().add(t_back)
+    assertEqual(copied.paths_taken[pathedge], 2)
+    assert copied.has_looped()
+    assertEqual(trace.paths_taken[pathedge], 1)
+
+    # Likewise for TraceNode: following the back edge once is permitted, but
+    # following it again is a loop:
+    root = TraceNode(None, None, trace.transitions[0].src)
+    nodes = make_nodes(root, trace)
+    assertEqual(get_counts(nodes[-1].paths_taken),
+                count_edges(trace.transitions))
+    assert not [node for node in nodes if node.has_looped()]
+    again = TraceNode(nodes[-1], t_back)
+    assertEqual(again.paths_taken[pathedge], 2)
+    assert again.has_looped()
+    assertEqual(nodes[-1].paths_taken[pathedge], 1)
+
+    # Sibling branches share the nodes for their common prefix, but not the
+    # counts after they diverge:
+    others = [other for other in traces
+              if other is not trace
+              and 0 < other.get_common_prefix_length(trace)]
+    assert others
+    for other in others:
+        start = other.get_common_prefix_length(trace)
+        other_nodes = make_nodes(nodes[start - 1], other, start)
+        assertEqual(get_counts(other_nodes[-1].paths_taken),
+                    count_edges(other.transitions))
+        assert not [node for node in other_nodes if node.has_looped()]
+    assertEqual(get_counts(nodes[-1].paths_taken),
+                count_edges(trace.transitions))
+
+run_on_each_function(verify_paths_taken)
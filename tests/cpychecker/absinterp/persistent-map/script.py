@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+# Verify that the persistent mapping used for State's stores behaves like
+# an OrderedDict, and that copies are isolated from each other
+from libcpychecker.persistent import PersistentMap
+
+from gccutils.selftests import assertEqual
+
+class CollidingKey(object):
+    # Keys that all share a hash, to exercise the collision nodes:
+    def __init__(self, name):
+        self.name = name
+    def __hash__(self):
+        return 42
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and self.name == other.name
+
+def selftest():
+    m = PersistentMap()
+    for i in range(1000):
+        m[i] = str(i)
+    assert len(m) == 1000
+    assert list(m) == list(range(1000))
+
+    # Copies share structure, but writes to one don't affect the other:
+    m2 = m.copy()
+    m2[5] = 'five'
+    del m2[6]
+    m2[1000] = '1000'
+    assert m[5] == '5'
+    assert 6 in m
+    assert 6 not in m2
+    assert 1000 not in m
+    assert len(m) == 1000
+    assert len(m2) == 1000
+
+    # Overwriting keeps the position; deleting and re-adding moves to the end:
+    assert list(m2)[5] == 5
+    m2[6] = 'six'
+    assert list(m2)[-1] == 6
+
+    # Unordered iteration sees the same entries, without building the
+    # ordered snapshot:
+    m3 = m2.copy()
+    m3[2000] = '2000'
+    del m3[0]
+    assert m3._ordered is None
+    assert (sorted(m3.unordered_items())
+            == sorted(m3.items(), key=lambda item: item[0]))
+    assert m3._ordered is not None
+    m3[2001] = '2001'
+    assertEqual(len(list(m3.unordered_items())), len(m3))
+    assert m3._ordered is None
+    assertEqual(list(PersistentMap().unordered_items()), [])
+
+    # Modification during iteration is safe:
+    for k in m2:
+        m2[k] = None
+    assert m2.values() == [None] * 1001
+
+    # Colliding hashes:
+    c = PersistentMap()
+    for name in 'abcde':
+        c[CollidingKey(name)] = name
+    c2 = c.copy()
+    del c2[CollidingKey('c')]
+    assert c[CollidingKey('c')] == 'c'
+    assert c2.get(CollidingKey('c')) is None
+    assert [k.name for k in c2] == ['a', 'b', 'd', 'e']
+
+selftest()
@@ -0,0 +1,62 @@
+/*
+   Copyright 2026 Red Hat, Inc.
+
+   This is free software: you can redistribute it and/or modify it
+   under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful, but
+   WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+   General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see
+   <http://www.gnu.org/licenses/>.
+*/
+
+
+#include <Python.h>
+
+/*
+  Test of the on-disk result cache: this function has a reference leak, and
+  the warning should be replayed from the cache when it's checked again
+*/
+
+PyObject *
+leak(PyObject *self, PyObject *args)
+{
+    PyObject *obj = PyLong_FromLong(1);
+    Py_RETURN_NONE;
+}
+
+/*
+  Structs with the same field names, but different layouts, for testing
+  that the cache key depends on the layouts of the types that are used
+*/
+typedef struct narrow_pair {
+    int first;
+    int second;
+} narrow_pair;
+
+typedef struct wide_pair {
+    int first;
+    long second;
+} wide_pair;
+
+typedef narrow_pair also_narrow_pair;
+
+long
+get_second(narrow_pair *pair)
+{
+    return pair->second;
+}
+
+/*
+  PEP-7
+Local variables:
+c-basic-offset: 4
+indent-tabs-mode: nil
+End:
+*/
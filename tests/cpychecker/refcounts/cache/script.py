@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that the results of the refcount checker are stored in the on-disk
+# cache, and replayed from it when an unchanged function is checked again;
+# that the cache key covers the layouts of the types used; and that failed
+# writes don't leave temporary files behind
+
+import os
+
+import gcc
+from gccutils import get_global_typedef
+from gccutils.selftests import assertEqual, run_on_each_function, \
+    temporary_directory, environment_variable
+import libcpychecker.cache
+from libcpychecker.cache import get_cache_dir, get_function_key, ResultCache
+from libcpychecker.diagnostics import CapturedDiagnostics
+from libcpychecker.refcounts import check_refcounts
+
+def describe_layout(typename):
+    return libcpychecker.cache._describe_type_layout(
+        get_global_typedef(typename).type)
+
+def verify_type_layouts(fun):
+    # Structs with the same field names, but different field types, are
+    # described differently, as are typedefs of them:
+    assert describe_layout('narrow_pair') != describe_layout('wide_pair')
+    assertEqual(describe_layout('also_narrow_pair'),
+                describe_layout('narrow_pair'))
+
+    # If the layout of a struct used by the function changes, so does the
+    # key, even though its name (and the source of the function) doesn't:
+    key = get_function_key(fun)
+    original = libcpychecker.cache._describe_type_layout
+    def changed_layout(t):
+        result = original(t)
+        if str(t) == 'narrow_pair':
+            result.append('int extra')
+        return result
+    libcpychecker.cache._describe_type_layout = changed_layout
+    try:
+        assert get_function_key(fun) != key
+    finally:
+        libcpychecker.cache._describe_type_layout = original
+    assertEqual(get_function_key(fun), key)
+
+def verify_failed_writes(cachedir):
+    cache = ResultCache(cachedir)
+    key = 'f' * 40
+    def get_leftovers():
+        dirname = os.path.join(cachedir, key[:2])
+        return [name for name in os.listdir(dirname)
+                if name.endswith('.tmp')]
+
+    # A record that can't be written out:
+    try:
+        cache.store(key, [('warning', ('input.c', 1, 1), object())], [])
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('expected a TypeError')
+    assertEqual(get_leftovers(), [])
+    assertEqual(cache.lookup(key), None)
+
+    # An entry that can't be renamed into place:
+    os.mkdir(cache._get_filename(key))
+    cache.store(key, [], [])
+    assertEqual(get_leftovers(), [])
+
+def verify_cache(fun):
+    if fun.decl.name == 'get_second':
+        verify_type_layouts(fun)
+        return
+
+    # The key depends on the options:
+    key = get_function_key(fun, maxtrans=256)
+    assertEqual(get_function_key(fun, maxtrans=256), key)
+    assert get_function_key(fun, maxtrans=512) != key
+
+    with temporary_directory() as tmpdir:
+        with environment_variable('XDG_CACHE_HOME', tmpdir):
+            assertEqual(get_cache_dir(),
+                        os.path.join(tmpdir, 'cpychecker'))
+
+            # A cache miss; the function is analyzed:
+            with CapturedDiagnostics() as first:
+                rep = check_refcounts(fun, cache=True)
+            assert rep.got_warnings()
+            assert first.records
+
+            # A cache hit; the diagnostics are replayed:
+            with CapturedDiagnostics() as second:
+                rep = check_refcounts(fun, cache=True)
+            assertEqual(rep, None)
+            assertEqual(second.records, first.records)
+
+        verify_failed_writes(os.path.join(tmpdir, 'failures'))
+
+run_on_each_function(verify_cache)
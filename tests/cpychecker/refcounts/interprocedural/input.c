@@ -0,0 +1,91 @@
+/*
+   Copyright 2026 Red Hat, Inc.
+
+   This is free software: you can redistribute it and/or modify it
+   under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful, but
+   WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+   General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see
+   <http://www.gnu.org/licenses/>.
+*/
+
+
+#include <Python.h>
+
+/*
+  Test of interprocedural summaries: the checker should summarize the
+  static helper functions, and use the summaries when checking "test"
+*/
+
+static PyObject *
+get_none(void)
+{
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyObject *
+passthrough(PyObject *obj)
+{
+    Py_INCREF(obj);
+    return obj;
+}
+
+static int
+check_positive(long value)
+{
+    if (value < 0) {
+        PyErr_SetString(PyExc_ValueError, "negative value");
+        return -1;
+    }
+    return 0;
+}
+
+static long
+sum_to(long n)
+{
+    long i;
+    long total = 0;
+
+    /* The paths around this loop are abandoned, so it isn't summarized: */
+    for (i = 0; i < n; i++) {
+        total += i;
+    }
+    return total;
+}
+
+PyObject *
+test(PyObject *self, PyObject *args)
+{
+    PyObject *obj;
+
+    if (check_positive(PyTuple_Size(args)) < 0) {
+        return NULL;
+    }
+
+    if (sum_to(PyTuple_Size(args)) < 0) {
+        return NULL;
+    }
+
+    /*
+      Without a summary, passthrough() would be treated as an unknown
+      function that could return NULL, and this would be reported as a
+      NULL pointer dereference:
+    */
+    obj = passthrough(args);
+    Py_DECREF(obj);
+
+    return get_none();
+}
+
+/*
+  PLEASE KEEP THIS FILE AS IS:
+  The test script expects the functions to have these names
+*/
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+# Verify the interprocedural summaries generated by the refcount checker,
+# and that they are used when checking callers
+
+import gcc
+from gccutils import sorted_callgraph
+from gccutils.selftests import assertEqual, run_on_whole_unit
+from libcpychecker.refcounts import impl_check_refcounts
+from libcpychecker.summaries import get_summary, RefcountDelta
+
+def check_summaries():
+    # Check callees before callers:
+    reps = {}
+    for node in reversed(sorted_callgraph()):
+        fun = node.decl.function
+        if fun:
+            reps[fun.decl.name] = impl_check_refcounts(fun,
+                                                       interprocedural=True)
+
+    # get_none() always returns a new reference to Py_None:
+    summary = get_summary('get_none')
+    assertEqual(len(summary.outcomes), 1)
+    outcome = summary.outcomes[0]
+    assertEqual(outcome.retkind[0], 'global')
+    assertEqual(outcome.retkind[1].name, '_Py_NoneStruct')
+    assertEqual(len(outcome.globaldeltas), 1)
+    assertEqual(outcome.globaldeltas[0][1], RefcountDelta(1, 0, 0))
+    assertEqual(outcome.exception, None)
+
+    # passthrough() always returns a new reference to its argument:
+    summary = get_summary('passthrough')
+    assertEqual(len(summary.outcomes), 1)
+    outcome = summary.outcomes[0]
+    assertEqual(outcome.retkind, ('arg', 0))
+    assertEqual(outcome.argdeltas, ((0, RefcountDelta(1, 0, 0)), ))
+
+    # check_positive() either returns 0, or returns -1 with an exception:
+    summary = get_summary('check_positive')
+    outcomes = dict([(outcome.retkind, outcome)
+                     for outcome in summary.outcomes])
+    assertEqual(len(outcomes), 2)
+    assertEqual(outcomes[('range', 0, 0)].exception, None)
+    assert outcomes[('range', -1, -1)].exception
+
+    # sum_to() has a loop, and so its summary would be incomplete:
+    assertEqual(get_summary('sum_to'), None)
+
+    # ...and the caller is checked using the summaries, without any
+    # false positives:
+    assert not reps['test'].got_warnings()
+
+run_on_whole_unit(check_summaries)
@@ -0,0 +1,55 @@
+/*
+   Copyright 2026 Red Hat, Inc.
+
+   This is free software: you can redistribute it and/or modify it
+   under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful, but
+   WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+   General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see
+   <http://www.gnu.org/licenses/>.
+*/
+
+
+#include <Python.h>
+
+/*
+  Test of checking functions in parallel: each of these functions has a
+  reference leak, and the diagnostics should be the same (and in the same
+  order) as when checking the functions one at a time
+*/
+
+PyObject *
+leak_one(PyObject *self, PyObject *args)
+{
+    PyObject *obj = PyLong_FromLong(1);
+    Py_RETURN_NONE;
+}
+
+PyObject *
+leak_two(PyObject *self, PyObject *args)
+{
+    PyObject *obj = PyLong_FromLong(2);
+    Py_RETURN_NONE;
+}
+
+PyObject *
+leak_three(PyObject *self, PyObject *args)
+{
+    PyObject *obj = PyLong_FromLong(3);
+    Py_RETURN_NONE;
+}
+
+/*
+  PEP-7
+Local variables:
+c-basic-offset: 4
+indent-tabs-mode: nil
+End:
+*/
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that checking functions in a pool of worker processes gives the
+# same diagnostics, in the same order, as checking them one at a time
+
+import gcc
+from gccutils.selftests import assertEqual, \
+    run_on_each_function, run_on_whole_unit
+from libcpychecker import CpyCheckerGimplePass
+from libcpychecker.diagnostics import CapturedDiagnostics
+import libcpychecker.parallel
+from libcpychecker.parallel import check_refcounts_in_parallel
+from libcpychecker.refcounts import check_refcounts
+
+def check_parallel(optpass, fun):
+    if optpass.name == '*free_lang_data':
+        funs = sorted([node.decl.function
+                       for node in gcc.get_callgraph_nodes()
+                       if node.decl.function],
+                      key=lambda fun: fun.decl.name)
+        assertEqual([fun.decl.name for fun in funs],
+                    ['leak_one', 'leak_three', 'leak_two'])
+
+        with CapturedDiagnostics() as sequential:
+            for fun in funs:
+                check_refcounts(fun)
+
+        with CapturedDiagnostics() as parallel:
+            check_refcounts_in_parallel(funs, 3)
+
+        assert sequential.records
+        assertEqual(parallel.records, sequential.records)
+
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      check_parallel)
+
+# Likewise when going through the pass itself, as with --jobs: the functions
+# are deferred as they are seen, and then checked by a pool of workers at the
+# end of the translation unit.  Each pass gets its own capture:
+
+def make_pass(**kwargs):
+    ps = CpyCheckerGimplePass(verify_pyargs=False, **kwargs)
+    # (the pass disables the refcount checker for GCC 7 onwards, but it's
+    # still usable when driven directly, as here):
+    ps.verify_refcounting = True
+    return ps
+
+passes = dict(serial=make_pass(),
+              parallel=make_pass(jobs=3),
+              interprocedural=make_pass(interprocedural=True, jobs=3),
+              # Only given a single function, so there's no need for a pool:
+              single=make_pass(jobs=3))
+captured = dict([(name, CapturedDiagnostics()) for name in passes])
+seen = []
+
+def on_function(fun):
+    seen.append(fun.decl.name)
+    for name, ps in passes.items():
+        if name == 'single' and fun.decl.name != 'leak_two':
+            continue
+        with captured[name]:
+            ps.execute(fun)
+
+def on_whole_unit():
+    assertEqual(sorted(seen), ['leak_one', 'leak_three', 'leak_two'])
+
+    # Only the serial pass checks functions as it sees them:
+    assert captured['serial'].records
+    assertEqual(passes['serial'].deferred_functions, [])
+    for name in ('parallel', 'interprocedural', 'single'):
+        assertEqual(captured[name].records, [])
+    assertEqual(passes['interprocedural'].jobs, 1)
+    assertEqual([fun.decl.name
+                 for fun in passes['parallel'].deferred_functions],
+                seen)
+    assertEqual([fun.decl.name
+                 for fun in passes['single'].deferred_functions],
+                ['leak_two'])
+
+    # Record which of the deferred checks use a pool of workers:
+    pools = []
+    orig_make_pool = libcpychecker.parallel._make_pool
+    def make_pool(jobs):
+        pools.append(jobs)
+        return orig_make_pool(jobs)
+    libcpychecker.parallel._make_pool = make_pool
+    try:
+        for name in ('parallel', 'interprocedural', 'single'):
+            with captured[name]:
+                passes[name].check_deferred_functions()
+            assertEqual(passes[name].deferred_functions, [])
+            assertEqual(pools, [3] if name == 'parallel' else [])
+            del pools[:]
+    finally:
+        libcpychecker.parallel._make_pool = orig_make_pool
+
+    # The diagnostics are emitted one function at a time, in the order in
+    # which the functions were seen, exactly as when checked one at a time:
+    assertEqual(captured['parallel'].records, captured['serial'].records)
+    # (whereas the interprocedural order follows the callgraph, which puts
+    # no constraints on these functions):
+    assertEqual(sorted(captured['interprocedural'].records),
+                sorted(captured['serial'].records))
+    assert captured['single'].records
+    assertEqual(captured['single'].records,
+                [record for record in captured['serial'].records
+                 if record in captured['single'].records])
+
+run_on_each_function(on_function)
+run_on_whole_unit(on_whole_unit)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that Reporter.remove_duplicates groups equivalent reports, keeping
+# the first of each group in the original order, and noting how many similar
+# traces each one had
+
+from libcpychecker.diagnostics import Reporter, SuppressedReport
+
+from gccutils.selftests import assertEqual, run_on_each_function
+
+def get_notes(report):
+    return [note.msg for note in report.notes]
+
+def make_reports(rep, fun):
+    # (fresh gcc.Location instances each time, as per the real checker):
+    return [rep.make_warning(fun, fun.start, 'leak'),
+            rep.make_warning(fun, fun.end, 'bad return'),
+            rep.make_warning(fun, fun.start, 'leak'),
+            rep.make_warning(fun, fun.start, 'leak'),
+            rep.make_warning(fun, fun.end, 'bad return'),
+            rep.make_warning(fun, fun.start, 'bad return')]
+
+def verify_remove_duplicates(fun):
+    rep = Reporter()
+    reports = make_reports(rep, fun)
+    rep.remove_duplicates()
+
+    # The first of each (function, location, message), in order:
+    assertEqual(rep.reports, [reports[0], reports[1], reports[5]])
+    assertEqual(reports[0].duplicates, [reports[2], reports[3]])
+    assertEqual(reports[1].duplicates, [reports[4]])
+    assertEqual([r.is_duplicate for r in reports],
+                [False, False, True, True, True, False])
+
+    # Only those with duplicates get a note:
+    assertEqual(get_notes(reports[0]), ['found 2 similar trace(s) to this'])
+    assertEqual(get_notes(reports[1]), ['found 1 similar trace(s) to this'])
+    assertEqual(get_notes(reports[5]), [])
+
+    # A custom key, here grouping by location alone:
+    rep = Reporter()
+    reports = make_reports(rep, fun)
+    rep.remove_duplicates(lambda report: report.loc.line)
+    assertEqual(rep.reports, [reports[0], reports[1]])
+    assertEqual(reports[0].duplicates, [reports[2], reports[3], reports[5]])
+    assertEqual(get_notes(reports[0]), ['found 3 similar trace(s) to this'])
+
+    # When duplicates are suppressed as they are made, the count of similar
+    # traces still includes them:
+    rep = Reporter(suppress_duplicates=True)
+    reports = make_reports(rep, fun)
+    assertEqual([isinstance(r, SuppressedReport) for r in reports],
+                [False, False, True, True, True, False])
+    assertEqual(rep.reports, [reports[0], reports[1], reports[5]])
+    rep.remove_duplicates()
+    assertEqual(rep.reports, [reports[0], reports[1], reports[5]])
+    assertEqual(get_notes(reports[0]), ['found 2 similar trace(s) to this'])
+    assertEqual(get_notes(reports[1]), ['found 1 similar trace(s) to this'])
+    assertEqual(get_notes(reports[5]), [])
+
+run_on_each_function(verify_remove_duplicates)
@@ -0,0 +1,47 @@
+/*
+   Copyright 2026 Red Hat, Inc.
+
+   This is free software: you can redistribute it and/or modify it
+   under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful, but
+   WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+   General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see
+   <http://www.gnu.org/licenses/>.
+*/
+
+
+#include <Python.h>
+
+/*
+  Test of the report bundle: both of these functions have a reference leak,
+  so that both appear within the report for the translation unit
+*/
+
+PyObject *
+leak_long(PyObject *self, PyObject *args)
+{
+    PyObject *obj = PyLong_FromLong(1);
+    Py_RETURN_NONE;
+}
+
+PyObject *
+leak_list(PyObject *self, PyObject *args)
+{
+    PyObject *obj = PyList_New(0);
+    Py_RETURN_NONE;
+}
+
+/*
+  PEP-7
+Local variables:
+c-basic-offset: 4
+indent-tabs-mode: nil
+End:
+*/
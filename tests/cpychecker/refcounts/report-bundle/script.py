@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that the refcount checker can write a single report for the whole
+# translation unit
+
+import json
+import os
+
+import gcc
+from gccutils.selftests import assertEqual
+from libcpychecker.diagnostics import CapturedDiagnostics
+from libcpychecker.refcounts import check_refcounts
+from libcpychecker.reportbundle import get_bundle_filename, write_bundle
+
+funcnames = []
+
+def verify_report_bundle(optpass, fun):
+    if optpass.name == '*warn_function_return':
+        if fun:
+            with CapturedDiagnostics():
+                check_refcounts(fun, dump_json=True, bundle_reports=True)
+            funcnames.append(fun.decl.name)
+
+            # No per-function reports:
+            assert not os.path.exists('%s.%s-refcount-errors.html'
+                                      % (gcc.get_dump_base_name(),
+                                         fun.decl.name))
+
+def verify_written_bundle(*args):
+    htmlname = get_bundle_filename()
+    jsonname = get_bundle_filename('json')
+    try:
+        write_bundle()
+        with open(htmlname) as f:
+            html = f.read()
+        with open(jsonname) as f:
+            js = json.load(f)
+    finally:
+        for filename in (htmlname, jsonname):
+            if os.path.exists(filename):
+                os.unlink(filename)
+
+    assertEqual(funcnames, ['leak_long', 'leak_list'])
+    assertEqual([data['function']['name'] for data in js['functions']],
+                funcnames)
+    # One page, with an index of both functions, and the reports numbered
+    # across the whole of it:
+    assertEqual(html.count('<!DOCTYPE html>'), 1)
+    assertEqual(html.count('id="index"'), 1)
+    for funcname in funcnames:
+        assert ('href="#state' in html) and (funcname in html)
+    assert 'id="state1"' in html
+    assert 'id="state2"' in html
+
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      verify_report_bundle)
+gcc.register_callback(gcc.PLUGIN_FINISH_UNIT,
+                      verify_written_bundle)
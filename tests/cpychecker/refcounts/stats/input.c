@@ -0,0 +1,56 @@
+/*
+   Copyright 2026 Red Hat, Inc.
+
+   This is free software: you can redistribute it and/or modify it
+   under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful, but
+   WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+   General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see
+   <http://www.gnu.org/licenses/>.
+*/
+
+
+#include <Python.h>
+
+/*
+  Test of the per-function telemetry: this function has a reference leak,
+  so that there is at least one trace to be counted
+*/
+
+PyObject *
+leak(PyObject *self, PyObject *args)
+{
+    PyObject *obj = PyLong_FromLong(1);
+    Py_RETURN_NONE;
+}
+
+/*
+  ...and this function has a loop, so that some paths through it are
+  abandoned
+*/
+
+long
+sum_to(long n)
+{
+    long i;
+    long total = 0;
+    for (i = 0; i < n; i++) {
+        total += i;
+    }
+    return total;
+}
+
+/*
+  PEP-7
+Local variables:
+c-basic-offset: 4
+indent-tabs-mode: nil
+End:
+*/
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that the refcount checker can write per-function telemetry as
+# JSON-lines, including why the analysis didn't cover every path
+
+import json
+
+from gccutils.selftests import assertEqual, run_on_each_function, \
+    removing_file
+from libcpychecker.diagnostics import CapturedDiagnostics
+from libcpychecker.refcounts import check_refcounts
+from libcpychecker.stats import get_stats_filename
+
+def get_stats(fun, **kwargs):
+    # Check the function, returning the line of telemetry written for it:
+    with removing_file(get_stats_filename()) as filename:
+        with CapturedDiagnostics():
+            check_refcounts(fun, stats=True, **kwargs)
+        with open(filename) as f:
+            lines = f.readlines()
+    assertEqual(len(lines), 1)
+    return json.loads(lines[0])
+
+def verify_leak(fun):
+    js = get_stats(fun)
+    assertEqual(js['function'], 'leak')
+    assertEqual(js['file'], fun.start.file)
+    assertEqual(js['line'], fun.start.line)
+    assert js['wall_secs'] >= 0
+    assert js['cpu_secs'] >= 0
+    # (the call to PyLong_FromLong can succeed or fail):
+    assertEqual(js['traces'], 2)
+    assert js['transitions'] > js['traces']
+    assert js['states'] > 0
+    assert 'GimpleCall' in js['secs_by_stmt_kind']
+    assertEqual(js['cached'], False)
+    # (only measured with stats_memory):
+    assertEqual(js['peak_memory'], None)
+
+    # Every path was analyzed:
+    assertEqual(js['too_complicated'], False)
+    assertEqual(js['budget_exceeded'], None)
+    assertEqual(js['loops_dropped'], 0)
+    assertEqual(js['degraded'], False)
+
+    # Hitting the limit on transitions:
+    js = get_stats(fun, maxtrans=2)
+    assertEqual(js['too_complicated'], True)
+    assertEqual(js['budget_exceeded'], None)
+    assertEqual(js['transitions'], 3)
+
+    # Using up a budget:
+    js = get_stats(fun, time_budget=0)
+    assertEqual(js['too_complicated'], True)
+    assertEqual(js['budget_exceeded'], 'the time budget')
+    assertEqual(js['traces'], 0)
+
+def verify_loop(fun):
+    # Paths around the loop are abandoned, without the function being
+    # "too complicated":
+    js = get_stats(fun)
+    assertEqual(js['function'], 'sum_to')
+    assertEqual(js['too_complicated'], False)
+    assertEqual(js['budget_exceeded'], None)
+    assert js['loops_dropped'] > 0
+    assert js['traces'] > 0
+
+def verify_stats(fun):
+    if fun.decl.name == 'leak':
+        verify_leak(fun)
+    elif fun.decl.name == 'sum_to':
+        verify_loop(fun)
+
+run_on_each_function(verify_stats)
@@ -0,0 +1,56 @@
+/*
+   Copyright 2026 Red Hat, Inc.
+
+   This is free software: you can redistribute it and/or modify it
+   under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful, but
+   WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+   General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see
+   <http://www.gnu.org/licenses/>.
+*/
+
+#include <Python.h>
+
+/*
+  Test of the memory used when suppressing duplicate reports: the leak is
+  reported on every one of the traces through the branches, with the same
+  location and message
+*/
+
+extern int flag_a;
+extern int flag_b;
+extern int flag_c;
+static int count;
+
+PyObject *
+test(PyObject *self, PyObject *args)
+{
+    PyObject *list = PyList_New(0);
+
+    if (flag_a) {
+        count++;
+    }
+    if (flag_b) {
+        count++;
+    }
+    if (flag_c) {
+        count++;
+    }
+
+    Py_RETURN_NONE;
+}
+
+/*
+  PEP-7
+Local variables:
+c-basic-offset: 4
+indent-tabs-mode: nil
+End:
+*/
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that when suppressing duplicate warnings, the traces of those that
+# can no longer be chosen to be reported are released, and that this
+# doesn't change which trace is reported when the limits are hit
+
+import gc
+import weakref
+
+from gccutils.selftests import assertEqual, run_on_each_function
+from libcpychecker.absinterp import Limits, Trace, explore_traces
+from libcpychecker.diagnostics import CapturedDiagnostics, Reporter, \
+    SuppressedReport
+from libcpychecker.refcounts import CPython, check_one_trace, \
+    impl_check_refcounts, make_stmt_graph
+
+def check_traces(fun):
+    rep = Reporter(suppress_duplicates=True)
+    suppressed = []
+    make_warning = rep.make_warning
+    def tracking_make_warning(fun, loc, msg):
+        w = make_warning(fun, loc, msg)
+        if isinstance(w, SuppressedReport):
+            suppressed.append(weakref.ref(w))
+        return w
+    rep.make_warning = tracking_make_warning
+
+    traces = explore_traces(make_stmt_graph(fun), {'cpython': CPython},
+                            limits=Limits(maxtrans=256))
+    for i, trace in enumerate(traces):
+        check_one_trace(i, trace, fun, rep, False)
+    del trace
+    gc.collect()
+    return rep, suppressed
+
+def summarize(rep):
+    # The reports, and the descriptions of the traces that they chose:
+    return [(report.msg,
+             [(d.loc, d.msg) for d in report._saved_diagnostics])
+            for report in rep.reports]
+
+def verify_bounded(fun):
+    rep, suppressed = check_traces(fun)
+    assertEqual(len(rep.reports), 1)
+    num_suppressed = rep.reports[0].num_suppressed
+    assertEqual(len(suppressed), num_suppressed)
+    assert num_suppressed >= 7
+
+    # Only the duplicates that could still be chosen by sort_reports are
+    # kept alive:
+    candidates = list(rep._candidates_by_key.values())[0]
+    alive = [ref() for ref in suppressed if ref() is not None]
+    assertEqual(set(map(id, alive)), set(map(id, candidates[1:])))
+    assert len(alive) < num_suppressed
+
+    # ...and the traces of the others have been released:
+    traces = [obj for obj in gc.get_objects() if isinstance(obj, Trace)]
+    assertEqual(set(map(id, traces)),
+                set([id(report.trace) for report in candidates]))
+
+    # Whichever transition the limit is hit at, the same trace is reported
+    # for each warning as when every report is built in full:
+    for maxtrans in range(1, 40):
+        with CapturedDiagnostics():
+            full = impl_check_refcounts(fun, maxtrans=maxtrans)
+            suppressing = impl_check_refcounts(fun, maxtrans=maxtrans,
+                                               suppress_duplicates=True)
+        full.remove_duplicates()
+        suppressing.remove_duplicates()
+        assertEqual(summarize(suppressing), summarize(full))
+
+run_on_each_function(verify_bounded)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify that suppressing duplicate warnings as they are found gives the
+# same reports as removing the duplicates afterwards, without building the
+# reports for the duplicates
+
+import gcc
+from gccutils.selftests import assertEqual
+from libcpychecker.diagnostics import SuppressedReport
+from libcpychecker.refcounts import impl_check_refcounts
+
+def summarize(rep):
+    return [(report.msg, [note.msg for note in report.notes])
+            for report in rep.reports]
+
+def verify_suppression(optpass, fun):
+    if optpass.name == '*warn_function_return':
+        if fun:
+            rep = impl_check_refcounts(fun)
+            num_reports = len(rep.reports)
+            rep.remove_duplicates()
+
+            suppressing_rep = impl_check_refcounts(fun,
+                                                   suppress_duplicates=True)
+            assert len(suppressing_rep.reports) < num_reports
+            assertEqual(suppressing_rep.reports[0].num_suppressed,
+                        num_reports - len(suppressing_rep.reports))
+            suppressing_rep.remove_duplicates()
+
+            assertEqual(summarize(suppressing_rep), summarize(rep))
+            assert summarize(rep)[0][1][-1].endswith(
+                'similar trace(s) to this')
+
+            # Warnings that duplicate an earlier one get a stand-in:
+            report = suppressing_rep.reports[0]
+            w = suppressing_rep.make_warning(fun, report.loc, report.msg)
+            assert isinstance(w, SuppressedReport)
+            assertEqual(report.num_suppressed,
+                        num_reports - len(suppressing_rep.reports) + 1)
+
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      verify_suppression)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+# Verify the classification of types by the refcount checker, and that the
+# classifications are cached
+
+import gcc
+from gccutils import get_global_typedef
+from gccutils.selftests import assertEqual
+from libcpychecker.types import classify_type, get_PyObjectPtr
+
+def verify_classification(optpass, fun):
+    if optpass.name == '*warn_function_return':
+        if fun and fun.decl.name == 'test':
+            tc = classify_type(get_PyObjectPtr())
+            assert tc.is_pyobjptr
+            assert tc.is_pyobjptr_subclass
+            assert not tc.is_pyobject
+
+            # The classification is only computed once per type:
+            assert classify_type(get_PyObjectPtr()) is tc
+
+            obj, other = fun.decl.arguments
+            tc = classify_type(obj.type)
+            assert not tc.is_pyobjptr
+            assert tc.is_pyobjptr_subclass
+            assertEqual(tc.typeobject_name, None)
+
+            tc = classify_type(other.type)
+            assert not tc.is_pyobjptr_subclass
+
+            assert not classify_type(gcc.Type.int()).is_pyobjptr_subclass
+            assert not classify_type(None).is_pyobjptr_subclass
+
+            # The PyTypeObject for one of the built-in types:
+            tc = classify_type(get_global_typedef('PyListObject').type.pointer)
+            assert tc.is_pyobjptr_subclass
+            assertEqual(tc.typeobject_name, 'PyList_Type')
+
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      verify_classification)
@@ -90,7 +90,8 @@ def on_pass_execution(p, fn):
                         if stmts:
                             for stmt in stmts:
                                 stmt.walk_tree(sf.find_state_users,
-                                               stmt.loc)
+                                               stmt.loc,
+                                               only=gcc.VarDecl)
 
         # Flush the data that was found:
         sf.flush()
@@ -28,7 +28,11 @@ class SpellcheckingPass(gcc.GimplePass):
         for bb in fun.cfg.basic_blocks:
             if bb.gimple:
                 for stmt in bb.gimple:
-                    stmt.walk_tree(self.spellcheck_node, stmt.loc)
+                    # (only the string constants are passed to the
+                    # callback; the rest are skipped without entering
+                    # Python):
+                    stmt.walk_tree(self.spellcheck_node, stmt.loc,
+                                   only=gcc.StringCst)
 
     def spellcheck_node(self, node, loc):
         # Spellcheck any textual constants found within the node:
@@ -0,0 +1,36 @@
+/*
+   Copyright 2026 Red Hat, Inc.
+
+   This is free software: you can redistribute it and/or modify it
+   under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful, but
+   WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+   General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see
+   <http://www.gnu.org/licenses/>.
+*/
+
+
+/*
+   Verify that gccutils' index of global declarations works
+*/
+
+typedef int test_typedef;
+typedef struct test_struct {
+    int i;
+} test_struct_typedef;
+
+test_typedef test_var;
+int test_other_var;
+
+int
+test_fn(void)
+{
+    return test_var + test_other_var;
+}
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+# Verify that gccutils' index of global declarations works
+import gcc
+
+import gccutils
+from gccutils import get_global_typedef, get_global_vardecl_by_name
+from gccutils.selftests import assertEqual
+
+def on_pass_execution(p, fn):
+    if p.name == '*warn_function_return':
+        td = get_global_typedef('test_typedef')
+        assert isinstance(td, gcc.TypeDecl)
+        assertEqual(td.name, 'test_typedef')
+        assert isinstance(get_global_typedef('test_struct_typedef').type,
+                          gcc.RecordType)
+        assertEqual(get_global_typedef('not_a_typedef'), None)
+
+        var = get_global_vardecl_by_name('test_var')
+        assert isinstance(var, gcc.VarDecl)
+        assertEqual(var.name, 'test_var')
+        assertEqual(get_global_vardecl_by_name('test_other_var').name,
+                    'test_other_var')
+        assertEqual(get_global_vardecl_by_name('not_a_var'), None)
+
+        # Typedefs and variables are indexed separately:
+        assertEqual(get_global_vardecl_by_name('test_typedef'), None)
+        assertEqual(get_global_typedef('test_var'), None)
+
+        # The index is reused between lookups, until invalidated:
+        index = gccutils.get_global_decl_index()
+        assert gccutils.get_global_decl_index() is index
+        gccutils.invalidate_global_decl_index()
+        assert gccutils.get_global_decl_index() is not index
+        assertEqual(get_global_typedef('test_typedef'), td)
+
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      on_pass_execution)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+# Verify that the runtime self-checks can be disabled and re-enabled, including
+# within modules that have their own reference to check_isinstance
+import gcc
+import gccutils
+import libcpychecker.absinterp
+
+def expect_type_error(fn, *args):
+    try:
+        fn(*args)
+    except TypeError:
+        return
+    raise AssertionError('expected a TypeError from %r' % fn)
+
+def on_finish_unit():
+    # Enabled by default:
+    assert gccutils.self_checks
+    expect_type_error(gccutils.check_isinstance, 42, str)
+    expect_type_error(libcpychecker.absinterp.check_isinstance, 42, str)
+
+    gccutils.self_checks = False
+    gccutils.check_isinstance(42, str)
+    libcpychecker.absinterp.check_isinstance(42, str)
+
+    gccutils.self_checks = True
+    expect_type_error(gccutils.check_isinstance, 42, str)
+    expect_type_error(libcpychecker.absinterp.check_isinstance, 42, str)
+
+gcc.register_callback(gcc.PLUGIN_FINISH_UNIT, on_finish_unit)
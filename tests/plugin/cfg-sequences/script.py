@@ -0,0 +1,64 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+# Verify that the sequences given by gcc.Cfg.basic_blocks, and by
+# gcc.BasicBlock's preds, succs and gimple, are cached within a callback,
+# and rebuilt in the next one
+
+import gcc
+
+# The gcc.Cfg and its basic_blocks, as seen by the first invocation of the
+# callback for the pass:
+seen = {}
+
+def on_pass_execution(p, fn):
+    if p.name == '*warn_function_return':
+        assert fn
+        cfg = fn.cfg
+        blocks = cfg.basic_blocks
+        assert isinstance(blocks, tuple)
+        assert cfg.basic_blocks is blocks
+
+        for bb in blocks:
+            for attr in ('preds', 'succs', 'gimple'):
+                value = getattr(bb, attr)
+                assert isinstance(value, tuple)
+                assert getattr(bb, attr) is value
+        assert [stmt
+                for bb in blocks
+                for stmt in bb.gimple]
+
+        if p.name not in seen:
+            seen[p.name] = (cfg, blocks)
+        else:
+            # GCC had the chance to change the CFG in between, so it's
+            # rebuilt, but with the same contents:
+            oldcfg, oldblocks = seen[p.name]
+            assert cfg is oldcfg
+            assert blocks is not oldblocks
+            assert blocks == oldblocks
+
+# (register the callback twice, so that it's called twice per pass):
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      on_pass_execution)
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      on_pass_execution)
+
+def on_finish():
+    assert '*warn_function_return' in seen
+
+gcc.register_callback(gcc.PLUGIN_FINISH,
+                      on_finish)
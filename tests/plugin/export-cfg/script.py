@@ -0,0 +1,84 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+
+# Verify that gcc.Function.export_cfg() gives the same CFG as walking
+# gcc.Function.cfg, and that StmtGraph can be built from it
+
+import gcc
+from gccutils.graph.stmtgraph import StmtGraph
+
+def get_flags(edge):
+    flags = 0
+    for attr, flag in (('true_value', gcc.EDGE_TRUE_VALUE),
+                       ('false_value', gcc.EDGE_FALSE_VALUE),
+                       ('loop_exit', gcc.EDGE_LOOP_EXIT),
+                       ('can_fallthru', gcc.EDGE_CAN_FALLTHRU),
+                       ('complex', gcc.EDGE_COMPLEX),
+                       ('eh', gcc.EDGE_EH)):
+        if getattr(edge, attr):
+            flags |= flag
+    return flags
+
+class TestPass(gcc.GimplePass):
+    def execute(self, fun):
+        exported = fun.export_cfg()
+        cfg = fun.cfg
+
+        blocks = exported['blocks']
+        assert blocks == cfg.basic_blocks
+        assert blocks[exported['entry']] == cfg.entry
+        assert blocks[exported['exit']] == cfg.exit
+
+        stmts = exported['stmts']
+        stmt_starts = exported['stmt_starts']
+        phis = exported['phis']
+        phi_starts = exported['phi_starts']
+        assert len(stmt_starts) == len(blocks) + 1
+        assert len(phi_starts) == len(blocks) + 1
+        assert stmt_starts[-1] == len(stmts)
+        assert phi_starts[-1] == len(phis)
+        # (this is after the "ssa" pass, so the loop has phi nodes):
+        assert phis
+
+        expected_edges = []
+        for i, bb in enumerate(blocks):
+            assert (list(stmts[stmt_starts[i]:stmt_starts[i + 1]])
+                    == list(bb.gimple or []))
+            assert (list(phis[phi_starts[i]:phi_starts[i + 1]])
+                    == list(bb.phi_nodes or []))
+            for edge in bb.succs:
+                expected_edges.append((i,
+                                       blocks.index(edge.dest),
+                                       get_flags(edge)))
+        assert exported['edges'] == tuple(expected_edges)
+        assert (exported['cfg_edges']
+                == tuple(edge
+                         for bb in blocks
+                         for edge in bb.succs))
+
+        for split_phi_nodes in (False, True):
+            sg = StmtGraph(fun, split_phi_nodes)
+            assert sg.entry.bb == cfg.entry
+            assert sg.exit.bb == cfg.exit
+            assert set(sg.node_for_stmt) >= set(stmts)
+            if split_phi_nodes:
+                assert not set(sg.node_for_stmt) & set(phis)
+            else:
+                assert set(sg.node_for_stmt) >= set(phis)
+
+ps = TestPass(name='test-export-cfg')
+ps.register_after('ssa')
@@ -0,0 +1,58 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+# Verify that there's a 1-1 mapping between GCC objects and the live
+# wrapper objects for them, without the wrappers being kept alive by it
+
+import sys
+
+import gcc
+
+def on_pass_execution(p, fn):
+    if p.name == '*warn_function_return':
+        assert fn
+
+        # The same wrapper is reused whilst it's alive:
+        decl = fn.decl
+        assert fn.decl is decl
+        stmts = [stmt
+                 for bb in fn.cfg.basic_blocks
+                 for stmt in (bb.gimple or [])]
+        assert stmts
+        all_stmts = [stmt
+                     for bb in fn.cfg.basic_blocks
+                     for stmt in (bb.gimple or [])]
+        for a, b in zip(stmts, all_stmts):
+            assert a is b
+
+        # ...but isn't kept alive by the mapping (the only references being
+        # "decl" and the argument to getrefcount):
+        assert sys.getrefcount(decl) == 2
+
+        # Wrappers that are dropped are replaced by new ones on demand:
+        del decl
+        del stmts
+        del all_stmts
+        for i in range(1000):
+            for bb in fn.cfg.basic_blocks:
+                for stmt in bb.gimple or []:
+                    stmt.walk_tree(lambda node: None)
+        gcc._sweep_wrapper_caches()
+        assert fn.decl == fn.decl
+        assert fn.decl.name == 'test'
+
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      on_pass_execution)
@@ -0,0 +1,59 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+# Verify that only the wrappers of objects managed by GCC's garbage
+# collector are walked when marking, via gcc._get_wrapper_stats()
+
+import gcc
+
+# Keep these alive until the end:
+stmts = []
+locs = []
+
+def on_pass_execution(p, fn):
+    if p.name == '*warn_function_return':
+        assert fn
+        for bb in fn.cfg.basic_blocks:
+            stmts.extend(bb.gimple or [])
+        assert stmts
+
+        # gcc.Location doesn't wrap a GC-managed object:
+        before = gcc._get_wrapper_stats()
+        locs.extend([stmt.loc for stmt in stmts if stmt.loc])
+        assert locs
+        after = gcc._get_wrapper_stats()
+        assert after['unmarked_wrappers'] == (before['unmarked_wrappers']
+                                              + len(locs))
+        assert after['marked_wrappers'] == before['marked_wrappers']
+
+def on_finish():
+    before = gcc._get_wrapper_stats()
+    gcc._force_garbage_collection()
+    after = gcc._get_wrapper_stats()
+
+    # One walk, visiting every wrapper of a GC-managed object, but none of
+    # the others:
+    assert after['gc_walks'] == before['gc_walks'] + 1
+    assert after['last_marked'] == after['marked_wrappers']
+    assert after['marked_wrappers'] >= len(stmts)
+    assert after['total_marked'] == (before['total_marked']
+                                     + after['last_marked'])
+    assert after['unmarked_wrappers'] >= len(locs)
+
+gcc.register_callback(gcc.PLUGIN_PASS_EXECUTION,
+                      on_pass_execution)
+gcc.register_callback(gcc.PLUGIN_FINISH,
+                      on_finish)
@@ -0,0 +1,75 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This is free software: you can redistribute it and/or modify it
+#   under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful, but
+#   WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see
+#   <http://www.gnu.org/licenses/>.
+
+
+# Selftest for the "only" filter of gcc.Gimple.walk_tree, and for
+# gcc.Gimple.iter_tree
+import gcc
+
+class TestPass(gcc.GimplePass):
+    def execute(self, fun):
+        num_strings = 0
+        for bb in fun.cfg.basic_blocks:
+            for stmt in bb.gimple or []:
+                # Get every node, unfiltered:
+                def visit(node, nodes, extra=None):
+                    assert extra == 'extra'
+                    nodes.append(node)
+                allnodes = []
+                stmt.walk_tree(visit, allnodes, extra='extra')
+                assert list(stmt.iter_tree()) == allnodes
+                assert list(stmt.iter_tree(only=None)) == allnodes
+
+                # Filter them in C:
+                for only in (gcc.StringCst,
+                             (gcc.StringCst, gcc.VarDecl),
+                             gcc.Constant,
+                             ()):
+                    expected = [node for node in allnodes
+                                if isinstance(node, only)]
+                    nodes = []
+                    stmt.walk_tree(visit, nodes, extra='extra', only=only)
+                    assert nodes == expected
+                    assert list(stmt.iter_tree(only=only)) == expected
+
+                # Returning a true value still stops the walk, with that
+                # node as the result:
+                result = stmt.walk_tree(lambda node: True,
+                                        only=gcc.StringCst)
+                strings = list(stmt.iter_tree(only=gcc.StringCst))
+                if strings:
+                    assert result == strings[0]
+                    num_strings += 1
+                else:
+                    assert result is None
+
+                # "only" has to be a class, or a tuple of classes:
+                try:
+                    stmt.walk_tree(lambda node: None, only='StringCst')
+                except TypeError:
+                    pass
+                else:
+                    raise AssertionError('expected a TypeError')
+                try:
+                    stmt.iter_tree(only=42)
+                except TypeError:
+                    pass
+                else:
+                    raise AssertionError('expected a TypeError')
+        assert num_strings > 0
+
+ps = TestPass(name='test-walk-tree-only')
+ps.register_after('cfg')
@@ -27,10 +27,16 @@ class PyGccWrapperTypeObject(PyTypeObject):
     """
     A PyTypeObject that's also a PyGccWrapperTypeObject
     (with metaclass PyGccWrapperMeta_TypeObj)
+
+    Pass wraps_gc_object=False for types that wrap something that isn't
+    managed by GCC's garbage collector, so that the instances are skipped
+    when marking (their wrtp_mark is NULL)
     """
     def __init__(self, *args, **kwargs):
         PyTypeObject.__init__(self, *args, **kwargs)
         self.ob_type = '&PyGccWrapperMeta_TypeObj'
+        if not hasattr(self, 'wraps_gc_object'):
+            self.wraps_gc_object = True
 
     def c_defn(self):
         result = '\n'
@@ -38,9 +44,12 @@ class PyGccWrapperTypeObject(PyTypeObject):
         result += self.c_src_field_value('wrtp_base',
                                          '{\n        .ht_type = {\n%s}' % indent(indent(self.c_initializer())))
         result += '    },\n'
-        result += self.c_src_field_value('wrtp_mark',
-                                         'PyGcc_WrtpMarkFor%s' % self.struct_name,
-                                         cast='wrtp_marker')
+        if self.wraps_gc_object:
+            result += self.c_src_field_value('wrtp_mark',
+                                             'PyGcc_WrtpMarkFor%s' % self.struct_name,
+                                             cast='wrtp_marker')
+        else:
+            result += self.c_src_field_value('wrtp_mark', 'NULL')
         result += '};\n'
         result +='\n'
         return result